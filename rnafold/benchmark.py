@@ -0,0 +1,41 @@
+"""
+Benchmark of the TM-score backends, see `metrics.benchmark_backends`.
+"""
+
+from pathlib import Path
+from typing import Optional
+
+import typer
+
+from rnafold.dataset import read_table
+from rnafold.metrics import Engine, benchmark_backends
+
+app = typer.Typer()
+
+
+@app.command()
+def benchmark(
+    solution: Path,
+    submission: Path,
+    engine: Optional[list[Engine]] = typer.Option(
+        None, help="Engines to benchmark. Defaults to all the installed engines."
+    ),
+    cached: bool = typer.Option(True, help="Also benchmark the engines with a cache."),
+    output: Optional[Path] = typer.Option(None, help="Saves the results as CSV."),
+) -> None:
+    """
+    Benchmarks the TM-score backends on the same solution and submission.
+    """
+    results = benchmark_backends(
+        read_table(solution),
+        read_table(submission),
+        engines=engine or None,
+        cached=cached,
+    )
+    if output:
+        results.to_csv(output, index=False)
+    print(results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    app()
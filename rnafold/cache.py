@@ -0,0 +1,180 @@
+"""
+Persistent cache of TM-scores.
+
+Scores are stored in a SQLite database, keyed by a hash of the predicted coordinates,
+the native coordinates, the engine, the package version and the engine options. SQLite
+serializes the writes, so several processes can share the same cache file.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from rnafold import __version__
+from rnafold.tmscore import is_resolved
+
+# Seconds to wait for a lock held by another process
+LOCK_TIMEOUT = 60.0
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class TMScoreCache:
+    def __init__(self, path: str | Path, max_entries: int = 10_000_000):
+        """
+        Opens (or creates) a TM-score cache.
+
+        Args:
+            path (str | Path): SQLite database file.
+            max_entries (int, optional): Maximum number of scores kept. Least recently used
+                scores are evicted beyond it. Defaults to 10,000,000.
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def __getstate__(self) -> dict:
+        # Connections can not be sent to worker processes, they open their own
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            # Entries are counted by triggers, as a COUNT(*) scans the whole table. The
+            # count of a cache created before the counter is initialized once
+            self._connection.executescript(
+                """
+                BEGIN IMMEDIATE;
+                CREATE TABLE IF NOT EXISTS scores
+                    (key TEXT PRIMARY KEY, score REAL NOT NULL, last_access REAL NOT NULL);
+                CREATE INDEX IF NOT EXISTS scores_last_access ON scores (last_access);
+                CREATE TABLE IF NOT EXISTS entries
+                    (id INTEGER PRIMARY KEY CHECK (id = 0), count INTEGER NOT NULL);
+                CREATE TRIGGER IF NOT EXISTS scores_insert AFTER INSERT ON scores
+                    BEGIN UPDATE entries SET count = count + 1; END;
+                CREATE TRIGGER IF NOT EXISTS scores_delete AFTER DELETE ON scores
+                    BEGIN UPDATE entries SET count = count - 1; END;
+                INSERT OR IGNORE INTO entries VALUES (0, (SELECT COUNT(*) FROM scores));
+                COMMIT;
+                """
+            )
+        return self._connection
+
+    @staticmethod
+    def keys(
+        predicted: np.ndarray,
+        native: np.ndarray,
+        engine: str,
+        options: Optional[dict] = None,
+    ) -> np.ndarray:
+        """
+        Returns the cache keys of all (prediction, native) pairs of a target.
+
+        Unresolved residues are hashed the same way, whatever their sentinel value.
+
+        Args:
+            predicted (np.ndarray): Predicted coordinates, of shape (P, L, 3).
+            native (np.ndarray): Native coordinates, of shape (N, L, 3).
+            engine (str): TM-score engine.
+            options (Optional[dict], optional): Engine options changing the scores.
+
+        Returns:
+            np.ndarray: Keys of shape (P, N).
+        """
+        tag = json.dumps(
+            {"engine": engine, "version": __version__, "options": options or {}},
+            sort_keys=True,
+        ).encode()
+        predicted_digests = [_digest(coords) for coords in predicted]
+        native_digests = [_digest(coords) for coords in native]
+        return np.array(
+            [
+                [hashlib.sha256(tag + p + n).hexdigest() for n in native_digests]
+                for p in predicted_digests
+            ]
+        )
+
+    def get_many(self, keys: list[str]) -> dict[str, float]:
+        """
+        Looks up scores, and marks the ones found as recently used.
+
+        Args:
+            keys (list[str]): Cache keys.
+
+        Returns:
+            dict[str, float]: Cached scores, by key. Missing keys are absent.
+        """
+        found: dict[str, float] = {}
+        with self.connection as connection:
+            for begin in range(0, len(keys), 500):
+                chunk = keys[begin : begin + 500]
+                # Only "?" placeholders are formatted in the query, the keys are bound
+                placeholders = ",".join("?" * len(chunk))
+                rows = connection.execute(
+                    f"SELECT key, score FROM scores WHERE key IN ({placeholders})",  # nosec B608
+                    chunk,
+                )
+                found.update(rows)
+            connection.executemany(
+                "UPDATE scores SET last_access = ? WHERE key = ?",
+                [(time.time(), key) for key in found],
+            )
+        self.stats.hits += len(found)
+        self.stats.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, scores: dict[str, float]) -> None:
+        """
+        Stores scores, then evicts the least recently used ones beyond `max_entries`.
+
+        Args:
+            scores (dict[str, float]): Scores, by key.
+        """
+        now = time.time()
+        with self.connection as connection:
+            # An upsert, unlike a REPLACE, does not delete the previous row: the entries
+            # counted by the triggers stay exact
+            connection.executemany(
+                "INSERT INTO scores (key, score, last_access) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE "
+                "SET score = excluded.score, last_access = excluded.last_access",
+                [(key, float(score), now) for key, score in scores.items()],
+            )
+            (n_entries,) = connection.execute("SELECT count FROM entries").fetchone()
+            if n_entries > self.max_entries:
+                connection.execute(
+                    "DELETE FROM scores WHERE key IN "
+                    "(SELECT key FROM scores ORDER BY last_access LIMIT ?)",
+                    (n_entries - self.max_entries,),
+                )
+
+    def __len__(self) -> int:
+        (n_entries,) = self.connection.execute("SELECT count FROM entries").fetchone()
+        return n_entries
+
+
+def _digest(coords: np.ndarray) -> bytes:
+    """Hash of a structure, unresolved residues being replaced by NaNs."""
+    coords = np.where(is_resolved(coords)[:, None], coords, np.nan).astype(np.float64)
+    return hashlib.sha256(np.ascontiguousarray(coords).tobytes()).digest()
@@ -1,7 +1,7 @@
 import os
 import pathlib
+from functools import cache
 
-import yaml
 from pydantic import BaseModel
 
 # Define the mapping of environments to config files
@@ -54,6 +54,8 @@ class Config(BaseModel):
 
 def _load_yml_config(path: pathlib.Path):
     """Classmethod returns YAML config"""
+    import yaml
+
     try:
         return yaml.safe_load(path.read_text())
 
@@ -62,5 +64,21 @@ def _load_yml_config(path: pathlib.Path):
         raise FileNotFoundError(error, message) from error
 
 
-config_file = get_config_file()
-Settings = Config(**_load_yml_config(config_file))
+@cache
+def get_settings() -> Config:
+    """
+    Reads and validates the config file of the environment, once, on first use.
+
+    Returns:
+        Config: The settings.
+    """
+    return Config(**_load_yml_config(get_config_file()))
+
+
+def __getattr__(name: str):
+    # `config_file` and `Settings` are resolved on first access, not at import time
+    if name == "config_file":
+        return get_config_file()
+    if name == "Settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,304 @@
+"""
+Memory-mapped store of multi-conformer C1' coordinates.
+
+A store is a directory of raw binary arrays, opened with `np.memmap`:
+
+- `coords.bin`: float32 coordinates of shape (residues, conformers, 3), NaN if unresolved.
+- `resolved.bin`: bitmask of the resolved residues, of shape (residues, ceil(conformers / 8)).
+- `resid.bin` and `resname.bin`: residue numbers (int32) and names (3 bytes).
+- `meta.json`: number of residues and conformers, target ids and their row offsets.
+
+Rows of a target are contiguous, so getting a target is a zero-copy slice.
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from rnafold.tmscore import UNRESOLVED_THRESHOLD
+
+# Coordinates of unresolved residues in the labels files
+SENTINEL = -1e18
+RESNAME_DTYPE = np.dtype("S3")
+STORE_SUFFIX = ".coords"
+
+
+@dataclass
+class TargetCoordinates:
+    target_id: str
+    resname: np.ndarray  # (L,)
+    resid: np.ndarray  # (L,)
+    coords: np.ndarray  # (K, L, 3), NaN if unresolved
+    resolved: np.ndarray  # (K, L)
+
+
+class CoordinateStore:
+    def __init__(self, path: str | Path):
+        """
+        Opens a coordinate store, read-only and memory-mapped.
+
+        Args:
+            path (str | Path): Store directory, written by `CoordinateStoreWriter`.
+        """
+        self.path = Path(path)
+        meta = json.loads((self.path / "meta.json").read_text())
+        self.n_residues: int = meta["n_residues"]
+        self.n_conformers: int = meta["n_conformers"]
+        self.target_ids: list[str] = meta["target_ids"]
+        self.offsets = np.asarray(meta["offsets"], dtype=np.int64)
+        self._rows = {target_id: i for i, target_id in enumerate(self.target_ids)}
+
+        n_bytes = (self.n_conformers + 7) // 8
+        self.coords = self._memmap("coords", np.float32, (self.n_conformers, 3))
+        self.resolved_bits = self._memmap("resolved", np.uint8, (n_bytes,))
+        self.resid = self._memmap("resid", np.int32, ())
+        self.resname = self._memmap("resname", RESNAME_DTYPE, ())
+
+    def _memmap(self, name: str, dtype, shape: tuple) -> np.ndarray:
+        if self.n_residues == 0:
+            return np.zeros((0, *shape), dtype=dtype)
+        return np.memmap(
+            self.path / f"{name}.bin",
+            dtype=dtype,
+            mode="r",
+            shape=(self.n_residues, *shape),
+        )
+
+    def __len__(self) -> int:
+        return len(self.target_ids)
+
+    def __contains__(self, target_id: str) -> bool:
+        return target_id in self._rows
+
+    def __iter__(self) -> Iterator[TargetCoordinates]:
+        for target_id in self.target_ids:
+            yield self[target_id]
+
+    def __getitem__(self, target_id: str) -> TargetCoordinates:
+        """Returns the structures of a target, as views on the memory-mapped arrays."""
+        i = self._rows[target_id]
+        rows = slice(self.offsets[i], self.offsets[i + 1])
+        resolved = np.unpackbits(
+            self.resolved_bits[rows], axis=1, count=self.n_conformers
+        )
+        return TargetCoordinates(
+            target_id=target_id,
+            resname=self.resname[rows],
+            resid=self.resid[rows],
+            coords=self.coords[rows].transpose(1, 0, 2),
+            resolved=resolved.T.astype(bool),
+        )
+
+    def target_frame(self, target_id: str) -> pd.DataFrame:
+        """
+        Returns the structures of a target in the labels format.
+
+        Args:
+            target_id (str): Target id.
+
+        Returns:
+            pd.DataFrame: ID, resname, resid and x_i, y_i, z_i columns, -1e18 for unresolved residues.
+        """
+        return target_to_frame(self[target_id])
+
+    def to_frame(self, target_ids: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        Returns the structures of several targets in the labels format.
+
+        Args:
+            target_ids (Optional[Iterable[str]], optional): Targets. Defaults to all targets.
+
+        Returns:
+            pd.DataFrame: ID, resname, resid and x_i, y_i, z_i columns, -1e18 for unresolved residues.
+        """
+        target_ids = self.target_ids if target_ids is None else target_ids
+        frames = [self.target_frame(target_id) for target_id in target_ids]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    @classmethod
+    def from_frame(
+        cls, df: pd.DataFrame, path: str | Path, target_ids: Optional[pd.Series] = None
+    ) -> "CoordinateStore":
+        """
+        Writes a labels, submission or `pdb.parse_pdb_to_df` DataFrame into a new store.
+
+        Args:
+            df (pd.DataFrame): ID, resname, resid and x_i, y_i, z_i columns, rows grouped by target.
+            path (str | Path): Store directory.
+            target_ids (Optional[pd.Series], optional): target_id of each row. Defaults to
+                `extract_target_ids(df)`.
+
+        Returns:
+            CoordinateStore: The new store.
+        """
+        with CoordinateStoreWriter(path, count_structures(df)) as writer:
+            writer.add_frame(df, target_ids)
+        return cls(path)
+
+
+class CoordinateStoreWriter:
+    def __init__(self, path: str | Path, n_conformers: int):
+        """
+        Writes a coordinate store incrementally, target after target.
+
+        Args:
+            path (str | Path): Store directory.
+            n_conformers (int): Number of conformers of every residue.
+        """
+        self.path = Path(path)
+        self.n_conformers = n_conformers
+        self.target_ids: list[str] = []
+        self.offsets = [0]
+        self._seen: set[str] = set()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._files = {
+            name: open(self.path / f"{name}.bin", "wb")
+            for name in ("coords", "resolved", "resid", "resname")
+        }
+
+    def __enter__(self) -> "CoordinateStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add(
+        self,
+        target_id: str,
+        resname: np.ndarray,
+        resid: np.ndarray,
+        coords: np.ndarray,
+    ) -> None:
+        """
+        Appends residues of a target. Consecutive calls for the same target extend it.
+
+        Args:
+            target_id (str): Target id.
+            resname (np.ndarray): Residue names, of shape (L,).
+            resid (np.ndarray): Residue numbers, of shape (L,).
+            coords (np.ndarray): Coordinates of shape (L, K, 3), unresolved residues being NaNs
+                or sentinels.
+        """
+        if not self.target_ids or self.target_ids[-1] != target_id:
+            if target_id in self._seen:
+                raise ValueError(f"Rows of target {target_id} are not contiguous.")
+            self._seen.add(target_id)
+            self.target_ids.append(target_id)
+            self.offsets.append(self.offsets[-1])
+
+        coords = np.asarray(coords, dtype=np.float32).reshape(
+            len(resid), self.n_conformers, 3
+        )
+        resolved = np.all(coords > UNRESOLVED_THRESHOLD, axis=-1)
+        coords = np.where(resolved[..., None], coords, np.nan).astype(np.float32)
+
+        self._files["coords"].write(coords.tobytes())
+        self._files["resolved"].write(np.packbits(resolved, axis=1).tobytes())
+        self._files["resid"].write(np.asarray(resid, dtype=np.int32).tobytes())
+        self._files["resname"].write(np.asarray(resname, dtype=RESNAME_DTYPE).tobytes())
+        self.offsets[-1] += len(resid)
+
+    def add_frame(
+        self, df: pd.DataFrame, target_ids: Optional[pd.Series] = None
+    ) -> None:
+        """
+        Appends the rows of a labels, submission or `pdb.parse_pdb_to_df` DataFrame.
+
+        Args:
+            df (pd.DataFrame): ID, resname, resid and x_i, y_i, z_i columns, rows grouped by target.
+            target_ids (Optional[pd.Series], optional): target_id of each row. Defaults to
+                `extract_target_ids(df)`.
+        """
+        if target_ids is None:
+            target_ids = extract_target_ids(df)
+        target_ids = np.asarray(target_ids)
+        columns = [
+            f"{axis}_{i}" for i in range(1, self.n_conformers + 1) for axis in "xyz"
+        ]
+        coords = df[columns].to_numpy(dtype=np.float32)
+        resname = df["resname"].to_numpy().astype(str)
+        resid = df["resid"].to_numpy()
+
+        starts = np.flatnonzero(np.r_[True, target_ids[1:] != target_ids[:-1]])
+        for start, end in zip(starts, np.r_[starts[1:], len(df)]):
+            self.add(
+                target_ids[start],
+                resname[start:end],
+                resid[start:end],
+                coords[start:end],
+            )
+
+    def close(self) -> None:
+        """Finalizes the store: closes the files and writes its metadata."""
+        for file in self._files.values():
+            file.close()
+        meta = {
+            "n_residues": self.offsets[-1],
+            "n_conformers": self.n_conformers,
+            "target_ids": self.target_ids,
+            "offsets": self.offsets,
+        }
+        (self.path / "meta.json").write_text(json.dumps(meta))
+
+    def abort(self) -> None:
+        """Closes the files and removes the partial store, without metadata."""
+        for name, file in self._files.items():
+            file.close()
+            (self.path / f"{name}.bin").unlink(missing_ok=True)
+        (self.path / "meta.json").unlink(missing_ok=True)
+        if not any(self.path.iterdir()):
+            self.path.rmdir()
+
+
+def count_structures(df: pd.DataFrame) -> int:
+    """Returns the number of structures of a DataFrame, i.e. the number of x_i columns."""
+    return sum(1 for column in df.columns if re.fullmatch(r"x_\d+", column))
+
+
+def extract_target_ids(table: pd.DataFrame) -> pd.Series:
+    """
+    Returns the target_id of each row of a sequences or labels table.
+
+    Labels only have an `ID` column (target_resid), the target_id is everything before the last "_".
+    """
+    if "target_id" in table.columns:
+        return table["target_id"]
+    return table["ID"].str.rsplit("_", n=1).str[0]
+
+
+def is_store(path: str | Path) -> bool:
+    """Whether a path is a coordinate store directory, or is meant to be one (`.coords` suffix)."""
+    return Path(path).suffix == STORE_SUFFIX or (Path(path) / "meta.json").is_file()
+
+
+def target_to_frame(target: TargetCoordinates) -> pd.DataFrame:
+    """
+    Converts the structures of a target to the labels format.
+
+    Args:
+        target (TargetCoordinates): Structures of a target.
+
+    Returns:
+        pd.DataFrame: ID, resname, resid and x_i, y_i, z_i columns, -1e18 for unresolved residues.
+    """
+    resid = np.asarray(target.resid)
+    coords = np.where(
+        target.resolved[..., None], target.coords.astype(np.float64), SENTINEL
+    )
+    columns = {
+        "ID": [f"{target.target_id}_{i}" for i in resid.tolist()],
+        "resname": np.char.decode(np.asarray(target.resname)),
+        "resid": resid,
+    }
+    for i, structure in enumerate(coords, start=1):
+        columns[f"x_{i}"], columns[f"y_{i}"], columns[f"z_{i}"] = structure.T
+    return pd.DataFrame(columns)
@@ -1,37 +1,266 @@
+import itertools
+import json
 from io import StringIO
 from pathlib import Path
+from typing import Iterable, Iterator, Optional
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import typer
 from Bio import SeqIO
-from Bio.Seq import Seq
 from Bio.SeqRecord import SeqRecord
-from Bio.SeqUtils import gc_fraction
 
+from rnafold.coords import (
+    CoordinateStore,
+    CoordinateStoreWriter,
+    count_structures,
+    extract_target_ids,
+    is_store,
+)
+from rnafold.features import DEFAULT_FEATURES, compute_features
 
-def load_sequences(file: str | Path) -> pd.DataFrame:
-    sequences = pd.read_csv(file)
+app = typer.Typer()
+
+# Parquet metadata key of the target -> (row offset, number of rows) index
+TARGET_INDEX_KEY = b"rnafold.target_index"
+ROW_GROUP_SIZE = 65_536
+
+
+def load_sequences(
+    file: str | Path,
+    targets: Optional[list[str]] = None,
+    columns: Optional[list[str]] = None,
+    features: Iterable[str] = DEFAULT_FEATURES,
+) -> pd.DataFrame:
+    """
+    Reads a sequences table, with features of the sequences.
+
+    Args:
+        file (str | Path): CSV, Parquet or coordinate store (see `read_table`).
+        targets (Optional[list[str]], optional): Targets to read. Defaults to all targets.
+        columns (Optional[list[str]], optional): Columns to read. Defaults to all columns.
+        features (Iterable[str], optional): Features to add, see `rnafold.features`.
+            Defaults to sequence_length and GC_Content.
+
+    Returns:
+        pd.DataFrame: Sequences and their features.
+    """
+    sequences = read_table(file, targets=targets, columns=columns)
 
     if "sequence" not in sequences.columns:
         raise ValueError("Missing 'sequence' column.")
 
-    sequences["sequence_length"] = sequences["sequence"].apply(len)
-    sequences["GC_Content"] = sequences["sequence"].apply(get_gc_fraction)
+    values = compute_features(sequences["sequence"], features)
+    for column in values.columns:
+        sequences[column] = values[column].to_numpy()
 
     return sequences
 
 
-def load_labels(file: str | Path) -> pd.DataFrame:
-    return pd.read_csv(file)
-
-
-def get_gc_fraction(seq: str) -> float:
-    return gc_fraction(Seq(seq))
+def load_labels(
+    file: str | Path,
+    targets: Optional[list[str]] = None,
+    columns: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    return read_table(file, targets=targets, columns=columns)
 
 
 def load_extra_sequences(fasta_string: str) -> list[SeqRecord]:
+    # For large FASTA files, `rnafold.fasta.read_fasta` streams (id, sequence) records instead
     # Use StringIO to simulate a file
     fasta_handle = StringIO(fasta_string)
 
     # Parse the multi-record string
     records = list(SeqIO.parse(fasta_handle, "fasta"))
     return records
+
+
+def is_parquet(file: str | Path) -> bool:
+    return Path(file).suffix == ".parquet"
+
+
+def read_table(
+    file: str | Path,
+    targets: Optional[list[str]] = None,
+    columns: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    """
+    Reads a sequences or labels table, from a CSV file or from its Parquet conversion.
+
+    Parquet files only read the requested columns, and the row groups of the requested targets.
+    Labels can also be read from a coordinate store (see `rnafold.coords`).
+
+    Args:
+        file (str | Path): CSV, Parquet or coordinate store (see `convert`).
+        targets (Optional[list[str]], optional): Targets to read. Defaults to all targets.
+        columns (Optional[list[str]], optional): Columns to read. Defaults to all columns.
+
+    Returns:
+        pd.DataFrame: Rows of the requested targets.
+    """
+    if is_store(file):
+        table = CoordinateStore(file).to_frame(targets)
+        return table[columns] if columns is not None else table
+
+    if not is_parquet(file):
+        # The target ids are also read to filter the rows, and dropped if not requested
+        wanted = {*(columns or []), "target_id", "ID"}
+        table = pd.read_csv(
+            file, usecols=None if columns is None else lambda column: column in wanted
+        )
+        if targets is not None:
+            table = table[extract_target_ids(table).isin(targets)]
+        return table[columns] if columns is not None else table
+
+    parquet_file = pq.ParquetFile(file)
+    if targets is None:
+        return parquet_file.read(columns=columns).to_pandas()
+
+    # Read the row groups overlapping the targets, then keep the rows of the targets
+    index = read_target_index(file)
+    ranges = sorted(index[target] for target in targets if target in index)
+    rows = np.concatenate(
+        [
+            np.arange(offset, offset + length, dtype=np.int64)
+            for offset, length in ranges
+        ]
+        or [np.empty(0, dtype=np.int64)]
+    )
+    row_group_size = parquet_file.metadata.row_group(0).num_rows
+    row_groups = np.unique(rows // row_group_size)
+    table = parquet_file.read_row_groups(
+        row_groups.tolist(), columns=columns
+    ).to_pandas()
+
+    positions = (
+        np.searchsorted(row_groups, rows // row_group_size) * row_group_size
+        + rows % row_group_size
+    )
+    return table.iloc[positions].reset_index(drop=True)
+
+
+def read_target_index(file: str | Path) -> dict[str, tuple[int, int]]:
+    """
+    Reads the target index of a Parquet table.
+
+    Args:
+        file (str | Path): Parquet file written by `convert`.
+
+    Returns:
+        dict[str, tuple[int, int]]: Row offset and number of rows of each target.
+    """
+    metadata = pq.read_schema(file).metadata or {}
+    if TARGET_INDEX_KEY not in metadata:
+        raise ValueError(f"{file} has no target index, convert it with `convert`.")
+    return {
+        target: (offset, length)
+        for target, (offset, length) in json.loads(metadata[TARGET_INDEX_KEY]).items()
+    }
+
+
+def iter_table_chunks(file: str | Path, chunksize: int) -> Iterator[pd.DataFrame]:
+    """Reads a CSV or Parquet table by chunks of rows, or a coordinate store target by target."""
+    if is_store(file):
+        store = CoordinateStore(file)
+        for target_id in store.target_ids:
+            yield store.target_frame(target_id)
+        return
+    if not is_parquet(file):
+        yield from pd.read_csv(file, chunksize=chunksize)
+        return
+    for batch in pq.ParquetFile(file).iter_batches(batch_size=chunksize):
+        yield batch.to_pandas()
+
+
+def to_columnar(table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Prepares a sequences or labels table for the columnar format.
+
+    Adds the `target_id` column to labels, stores `resid` as int32 and coordinates as float32.
+    Rows are grouped by target, in order of first appearance.
+
+    Args:
+        table (pd.DataFrame): Sequences or labels, as in the competition CSV files.
+
+    Returns:
+        pd.DataFrame: Typed table.
+    """
+    table = table.copy()
+    table["target_id"] = extract_target_ids(table)
+    if "resid" in table.columns:
+        table["resid"] = table["resid"].astype(np.int32)
+    coords = [column for column in table.columns if column[:2] in ("x_", "y_", "z_")]
+    table[coords] = table[coords].astype(np.float32)
+
+    # Group the rows of each target together, the index needs contiguous rows
+    order = pd.factorize(table["target_id"])[0]
+    return table.iloc[np.argsort(order, kind="stable")].reset_index(drop=True)
+
+
+def write_columnar(table: pd.DataFrame, file: str | Path) -> None:
+    """
+    Writes a table prepared by `to_columnar` to Parquet, with its target index.
+
+    Args:
+        table (pd.DataFrame): Typed table, rows grouped by target.
+        file (str | Path): Output Parquet file.
+    """
+    target_ids = table["target_id"].to_numpy()
+    starts = np.flatnonzero(np.r_[len(table) > 0, target_ids[1:] != target_ids[:-1]])
+    lengths = np.diff(np.r_[starts, len(table)])
+    index = {
+        target_ids[start]: [int(start), int(length)]
+        for start, length in zip(starts, lengths)
+    }
+
+    arrow_table = pa.Table.from_pandas(table, preserve_index=False)
+    metadata = {
+        **(arrow_table.schema.metadata or {}),
+        TARGET_INDEX_KEY: json.dumps(index),
+    }
+    pq.write_table(
+        arrow_table.replace_schema_metadata(metadata),
+        file,
+        row_group_size=ROW_GROUP_SIZE,
+    )
+
+
+def write_store(
+    source: str | Path, destination: str | Path, chunksize: int = 100_000
+) -> None:
+    """
+    Writes a labels or submission table into a coordinate store, chunk by chunk.
+
+    Args:
+        source (str | Path): CSV or Parquet file, rows grouped by target.
+        destination (str | Path): Store directory.
+        chunksize (int, optional): Number of rows read at once. Defaults to 100,000.
+    """
+    chunks = iter_table_chunks(source, chunksize)
+    first = next(chunks, None)
+    if first is None:
+        return
+    with CoordinateStoreWriter(destination, count_structures(first)) as writer:
+        for chunk in itertools.chain([first], chunks):
+            writer.add_frame(chunk, extract_target_ids(chunk))
+
+
+@app.command()
+def convert(source: Path, destination: Path) -> None:
+    """
+    Converts a sequences or labels CSV file to the columnar (Parquet) format.
+
+    Labels and submissions can be converted to a memory-mapped coordinate store instead, with
+    a `.coords` destination.
+    """
+    if is_store(destination):
+        write_store(source, destination)
+    else:
+        write_columnar(to_columnar(pd.read_csv(source)), destination)
+    print(f"Table saved at {destination}")
+
+
+if __name__ == "__main__":
+    app()
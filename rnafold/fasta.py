@@ -0,0 +1,262 @@
+"""
+Streaming FASTA reader and writers.
+
+`read_fasta` yields (id, sequence) records one at a time, from a path, a gzip stream or
+stdin, so inputs of millions of records are read in constant memory. Records are written
+to one multi-record file (`write_fasta`), to shards of a fixed number of records
+(`write_fasta_shards`), or to a file per record (`write_fasta_files`), as RhoFold expects.
+"""
+
+import gzip
+import io
+import sys
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator
+
+import typer
+
+app = typer.Typer()
+
+# Path of stdin and stdout
+STDIO = "-"
+GZIP_MAGIC = b"\x1f\x8b"
+LINE_WIDTH = 80
+SHARD_SIZE = 10_000
+
+FastaRecord = tuple[str, str]
+
+
+@contextmanager
+def open_fasta(source: str | Path | IO) -> Iterator[IO[str]]:
+    """
+    Opens a FASTA file as text, decompressing it if it is gzipped (whatever its name).
+
+    Args:
+        source (str | Path | IO): Path, "-" for stdin, or a binary or text file object.
+
+    Yields:
+        IO[str]: Text stream. File objects given by the caller are left open.
+    """
+    if isinstance(source, io.TextIOBase):
+        yield source
+        return
+
+    with ExitStack() as stack:
+        binary: IO[bytes]
+        if not isinstance(source, (str, Path)):
+            binary = source
+        elif str(source) == STDIO:
+            binary = sys.stdin.buffer
+        else:
+            binary = stack.enter_context(open(source, "rb"))
+
+        # The magic number is read without consuming it, even from a pipe: peeked, or
+        # read then served again, by a wrapper that leaves the stream open
+        if isinstance(binary, io.BufferedReader):
+            magic = binary.peek(len(GZIP_MAGIC))[: len(GZIP_MAGIC)]
+        else:
+            magic = binary.read(len(GZIP_MAGIC))
+            binary = io.BufferedReader(_PrefixedStream(magic, binary))
+        if magic == GZIP_MAGIC:
+            gzipped = stack.enter_context(gzip.GzipFile(fileobj=binary))
+            text = io.TextIOWrapper(gzipped, encoding="utf-8")
+        else:
+            text = io.TextIOWrapper(binary, encoding="utf-8")
+        try:
+            yield text
+        finally:
+            # Closes only what was opened here, and not a stream of the caller
+            text.detach()
+
+
+class _PrefixedStream(io.RawIOBase):
+    def __init__(self, prefix: bytes, stream: IO[bytes]):
+        """
+        Reads bytes already read from a stream, then the rest of the stream.
+
+        Closing it leaves the stream open.
+
+        Args:
+            prefix (bytes): Bytes read from the stream.
+            stream (IO[bytes]): Rest of the stream.
+        """
+        self.prefix = prefix
+        self.stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        data = self.prefix[: len(buffer)] or self.stream.read(len(buffer))
+        self.prefix = self.prefix[len(data) :]
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def read_fasta(source: str | Path | IO) -> Iterator[FastaRecord]:
+    """
+    Reads the records of a FASTA file lazily.
+
+    Identifiers are the first word of the header lines, and sequences are the concatenation
+    of their lines, as in `Bio.SeqIO.parse(..., "fasta")`.
+
+    Args:
+        source (str | Path | IO): Path (possibly gzipped), "-" for stdin, or a file object.
+
+    Yields:
+        FastaRecord: (id, sequence) of each record.
+    """
+    with open_fasta(source) as lines:
+        record_id = None
+        chunks: list[str] = []
+        for line in lines:
+            if line.startswith(">"):
+                if record_id is not None:
+                    yield record_id, "".join(chunks)
+                words = line[1:].split(None, 1)
+                record_id = words[0] if words else ""
+                chunks = []
+            elif record_id is not None:
+                chunks.append(line.strip().replace(" ", ""))
+        if record_id is not None:
+            yield record_id, "".join(chunks)
+
+
+def read_fasta_batches(
+    source: str | Path | IO, batch_size: int
+) -> Iterator[list[FastaRecord]]:
+    """
+    Reads the records of a FASTA file by batches.
+
+    Args:
+        source (str | Path | IO): Path (possibly gzipped), "-" for stdin, or a file object.
+        batch_size (int): Number of records per batch, the last one may be smaller.
+
+    Yields:
+        list[FastaRecord]: (id, sequence) of the records of each batch.
+    """
+    records = read_fasta(source)
+    while batch := list(islice(records, batch_size)):
+        yield batch
+
+
+def format_record(record_id: str, sequence: str, line_width: int = LINE_WIDTH) -> str:
+    """Formats a FASTA record, sequence lines wrapped at line_width characters."""
+    lines = [f">{record_id}"]
+    lines += [sequence[i : i + line_width] for i in range(0, len(sequence), line_width)]
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def _create(destination: str | Path) -> Iterator[IO[str]]:
+    if str(destination) == STDIO:
+        yield sys.stdout
+        return
+    Path(destination).parent.mkdir(parents=True, exist_ok=True)
+    if Path(destination).suffix == ".gz":
+        handle = gzip.open(destination, "wt", compresslevel=6)
+    else:
+        handle = open(destination, "w", buffering=1 << 20)
+    with handle:
+        yield handle
+
+
+def write_fasta(
+    records: Iterable[FastaRecord],
+    destination: str | Path,
+    line_width: int = LINE_WIDTH,
+) -> int:
+    """
+    Writes records to one FASTA file.
+
+    Args:
+        records (Iterable[FastaRecord]): (id, sequence) records, consumed lazily.
+        destination (str | Path): FASTA file, gzipped if it ends with `.gz`, "-" for stdout.
+        line_width (int, optional): Length of the sequence lines. Defaults to 80.
+
+    Returns:
+        int: Number of records written.
+    """
+    count = 0
+    with _create(destination) as handle:
+        for record_id, sequence in records:
+            handle.write(format_record(record_id, sequence, line_width))
+            count += 1
+    return count
+
+
+def write_fasta_shards(
+    records: Iterable[FastaRecord],
+    directory: str | Path,
+    shard_size: int = SHARD_SIZE,
+    suffix: str = ".fasta",
+    line_width: int = LINE_WIDTH,
+) -> list[Path]:
+    """
+    Writes records to FASTA files of shard_size records each.
+
+    Args:
+        records (Iterable[FastaRecord]): (id, sequence) records, consumed lazily.
+        directory (str | Path): Directory of the shards, `shard-00000.fasta` and so on.
+        shard_size (int, optional): Number of records per shard. Defaults to 10,000.
+        suffix (str, optional): Suffix of the shards, ".fasta.gz" to compress them.
+        line_width (int, optional): Length of the sequence lines. Defaults to 80.
+
+    Returns:
+        list[Path]: Shards written.
+    """
+    records = iter(records)
+    shards: list[Path] = []
+    while batch := list(islice(records, shard_size)):
+        shard = Path(directory) / f"shard-{len(shards):05d}{suffix}"
+        write_fasta(batch, shard, line_width)
+        shards.append(shard)
+    return shards
+
+
+def write_fasta_files(
+    records: Iterable[FastaRecord],
+    directory: str | Path,
+    line_width: int = LINE_WIDTH,
+) -> int:
+    """
+    Writes each record to its own FASTA file, `<id>.fasta`.
+
+    Args:
+        records (Iterable[FastaRecord]): (id, sequence) records, consumed lazily.
+        directory (str | Path): Output directory.
+        line_width (int, optional): Length of the sequence lines. Defaults to 80.
+
+    Returns:
+        int: Number of files written.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for record_id, sequence in records:
+        (directory / f"{record_id}.fasta").write_text(
+            format_record(record_id, sequence, line_width)
+        )
+        count += 1
+    return count
+
+
+@app.command()
+def shard(
+    source: str,
+    directory: Path,
+    shard_size: int = SHARD_SIZE,
+    compress: bool = False,
+) -> None:
+    """
+    Splits a FASTA file ("-" for stdin, possibly gzipped) into shards of shard_size records.
+    """
+    suffix = ".fasta.gz" if compress else ".fasta"
+    shards = write_fasta_shards(read_fasta(source), directory, shard_size, suffix)
+    print(f"{len(shards)} shards saved in {directory}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,215 @@
+"""
+Vectorized sequence features.
+
+Sequences are encoded once into a flat array of bytes with offsets (`EncodedSequences`), and
+features are computed with NumPy over all sequences at once, instead of a Python call per
+sequence. Character counts are computed in one pass and shared by the features.
+
+Features are registered by name in `FEATURES`, each returning named columns:
+
+    @register_feature("AU_Content")
+    def au_content(encoded: EncodedSequences) -> dict[str, np.ndarray]:
+        return {"AU_Content": encoded.count("AUau") / np.maximum(encoded.lengths, 1)}
+"""
+
+from dataclasses import dataclass
+from functools import cached_property
+from itertools import product
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+NUCLEOTIDES = "ACGU"
+# IUPAC ambiguity codes
+AMBIGUITY_CODES = "RYSWKMBDHVN"
+KMER_SIZE = 2
+
+# Characters of `Bio.SeqUtils.gc_fraction` with ambiguous="remove"
+GC_CHARACTERS = "CGScgs"
+AT_CHARACTERS = "ATWUatwu"
+
+
+@dataclass
+class EncodedSequences:
+    codes: np.ndarray  # (total length,), uint8, the concatenated sequences
+    offsets: np.ndarray  # (n + 1,), int64, start of each sequence and total length
+
+    @classmethod
+    def from_sequences(cls, sequences: Iterable[str]) -> "EncodedSequences":
+        """
+        Encodes sequences into one array, a byte per character.
+
+        Args:
+            sequences (Iterable[str]): Sequences. Non-ASCII characters are encoded as "?".
+
+        Returns:
+            EncodedSequences: The encoded sequences.
+        """
+        sequences = list(sequences)
+        lengths = np.fromiter(map(len, sequences), dtype=np.int64, count=len(sequences))
+        joined = "".join(sequences).encode("ascii", errors="replace")
+        return cls(
+            codes=np.frombuffer(joined, dtype=np.uint8),
+            offsets=np.concatenate([[0], np.cumsum(lengths)]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @cached_property
+    def sequence_ids(self) -> np.ndarray:
+        """Index of the sequence of each character."""
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    @cached_property
+    def _character_counts(self) -> tuple[np.ndarray, np.ndarray]:
+        # Counts of the characters present only, (n, number of distinct characters)
+        present = np.flatnonzero(np.bincount(self.codes, minlength=256))
+        columns = np.zeros(256, dtype=np.int64)
+        columns[present] = np.arange(len(present))
+        counts = np.bincount(
+            self.sequence_ids * len(present) + columns[self.codes],
+            minlength=len(self) * len(present),
+        )
+        return present, counts.reshape(len(self), len(present))
+
+    def count(self, characters: str) -> np.ndarray:
+        """
+        Counts the occurrences of any of the characters, in each sequence.
+
+        Args:
+            characters (str): Characters to count, case-sensitive.
+
+        Returns:
+            np.ndarray: Counts, (n,).
+        """
+        present, counts = self._character_counts
+        codes = np.frombuffer(characters.encode("ascii"), dtype=np.uint8)
+        return counts[:, np.isin(present, codes)].sum(axis=1)
+
+
+Feature = Callable[[EncodedSequences], dict[str, np.ndarray]]
+
+# Features by name, see `register_feature`
+FEATURES: dict[str, Feature] = {}
+DEFAULT_FEATURES = ("sequence_length", "GC_Content")
+
+
+def register_feature(name: str) -> Callable[[Feature], Feature]:
+    """Registers a feature function under a name, for `compute_features`."""
+
+    def register(feature: Feature) -> Feature:
+        FEATURES[name] = feature
+        return feature
+
+    return register
+
+
+@register_feature("sequence_length")
+def sequence_length(encoded: EncodedSequences) -> dict[str, np.ndarray]:
+    return {"sequence_length": encoded.lengths}
+
+
+@register_feature("GC_Content")
+def gc_content(encoded: EncodedSequences) -> dict[str, np.ndarray]:
+    """GC fraction, as `Bio.SeqUtils.gc_fraction`: ambiguous characters are not counted."""
+    gc = encoded.count(GC_CHARACTERS)
+    length = gc + encoded.count(AT_CHARACTERS)
+    # 0 for sequences without any counted character
+    fraction = np.divide(gc, length, out=np.zeros(len(encoded)), where=length > 0)
+    return {"GC_Content": fraction}
+
+
+@register_feature("composition")
+def composition(encoded: EncodedSequences) -> dict[str, np.ndarray]:
+    """Fraction of each nucleotide in the sequence, case-insensitive."""
+    lengths = np.maximum(encoded.lengths, 1)
+    return {
+        f"{base}_Content": encoded.count(base + base.lower()) / lengths
+        for base in NUCLEOTIDES
+    }
+
+
+@register_feature("ambiguous_count")
+def ambiguous_count(encoded: EncodedSequences) -> dict[str, np.ndarray]:
+    """Number of IUPAC ambiguity codes, case-insensitive."""
+    return {"ambiguous_count": encoded.count(AMBIGUITY_CODES + AMBIGUITY_CODES.lower())}
+
+
+@register_feature("kmer_counts")
+def dinucleotide_counts(encoded: EncodedSequences) -> dict[str, np.ndarray]:
+    return kmer_counts(encoded, KMER_SIZE)
+
+
+def kmer_counts(encoded: EncodedSequences, k: int) -> dict[str, np.ndarray]:
+    """
+    Counts the k-mers of A/C/G/U nucleotides (case-insensitive) of each sequence.
+
+    K-mers with any other character are not counted.
+
+    Args:
+        encoded (EncodedSequences): Sequences.
+        k (int): K-mer size.
+
+    Returns:
+        dict[str, np.ndarray]: `kmer_<k-mer>` counts, (n,) each, k-mers in lexicographic order.
+    """
+    # Index of each nucleotide, -1 for other characters
+    indices = np.full(256, -1, dtype=np.int64)
+    for i, base in enumerate(NUCLEOTIDES):
+        indices[ord(base)] = indices[ord(base.lower())] = i
+    letters = indices[encoded.codes]
+
+    # K-mers starting at each position, in base 4, within their sequence
+    n_windows = max(len(letters) - k + 1, 0)
+    codes = np.zeros(n_windows, dtype=np.int64)
+    valid = np.ones(n_windows, dtype=bool)
+    for j in range(k):
+        window = letters[j : j + n_windows]
+        codes = codes * len(NUCLEOTIDES) + window
+        valid &= window >= 0
+    ends = encoded.offsets[1:][encoded.sequence_ids[:n_windows]]
+    valid &= np.arange(n_windows) + k <= ends
+
+    n_kmers = len(NUCLEOTIDES) ** k
+    counts = np.bincount(
+        encoded.sequence_ids[:n_windows][valid] * n_kmers + codes[valid],
+        minlength=len(encoded) * n_kmers,
+    ).reshape(len(encoded), n_kmers)
+    kmers = ("".join(kmer) for kmer in product(NUCLEOTIDES, repeat=k))
+    return {f"kmer_{kmer}": counts[:, i] for i, kmer in enumerate(kmers)}
+
+
+def compute_features(
+    sequences: Iterable[str] | EncodedSequences,
+    features: Optional[Iterable[str]] = None,
+) -> pd.DataFrame:
+    """
+    Computes features of sequences, vectorized over all sequences.
+
+    Args:
+        sequences (Iterable[str] | EncodedSequences): Sequences, or their encoding.
+        features (Optional[Iterable[str]], optional): Names of registered features. Defaults
+            to sequence_length and GC_Content.
+
+    Returns:
+        pd.DataFrame: A row per sequence, the columns of each feature.
+    """
+    encoded = (
+        sequences
+        if isinstance(sequences, EncodedSequences)
+        else EncodedSequences.from_sequences(sequences)
+    )
+    columns: dict[str, np.ndarray] = {}
+    for name in features if features is not None else DEFAULT_FEATURES:
+        if name not in FEATURES:
+            raise ValueError(
+                f"Unknown feature '{name}'. Available features: {', '.join(FEATURES)}."
+            )
+        columns.update(FEATURES[name](encoded))
+    return pd.DataFrame(columns, index=pd.RangeIndex(len(encoded)))
@@ -0,0 +1,336 @@
+"""
+Bulk ingestion of PDB and mmCIF files into training labels.
+
+`ingest` scans a directory or a tarball of structures with a process pool, and keeps
+the C1' atoms of the first model of each chain, a chain per target
+(`<structure>_<chain>`), residues numbered from 1. Chains whose sequence was already
+seen are dropped. Labels are written in the schema of `train_labels.csv` (ID, resname,
+resid, x_1, y_1, z_1) to one Parquet file, with a target index (see
+`dataset.write_columnar`).
+
+A manifest next to the labels records the size and modification time of each source
+file, and the chains it gave, so a re-run only parses the new or changed files.
+"""
+
+import gzip
+import io
+import json
+import logging
+import os
+import tarfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import typer
+
+from rnafold.dataset import read_table, to_columnar, write_columnar
+from rnafold.parallel import imap_ordered
+from rnafold.pdb import ChainCoordinates, is_mmcif, scan_c1_atoms, scan_c1_lines
+
+app = typer.Typer()
+
+logger = logging.getLogger(__name__)
+
+STRUCTURE_SUFFIXES = {".pdb", ".ent", ".cif", ".mmcif"}
+MANIFEST_SUFFIX = ".manifest.json"
+LABEL_COLUMNS = ["ID", "resname", "resid", "x_1", "y_1", "z_1"]
+
+
+@dataclass
+class Source:
+    # Path relative to the input directory, or name of the tarball member
+    key: str
+    size: int
+    mtime: int
+
+
+def is_structure_file(name: str) -> bool:
+    """Whether a file name is a PDB or mmCIF file, possibly gzipped."""
+    suffixes = Path(name).suffixes
+    if suffixes and suffixes[-1] == ".gz":
+        suffixes = suffixes[:-1]
+    return bool(suffixes) and suffixes[-1].lower() in STRUCTURE_SUFFIXES
+
+
+def structure_id(key: str) -> str:
+    """Returns the name of a structure file without its suffixes, e.g. 1abc for 1abc.cif.gz."""
+    name = Path(key).name
+    while Path(name).suffix.lower() in STRUCTURE_SUFFIXES | {".gz"}:
+        name = Path(name).stem
+    return name
+
+
+def list_sources(source: Path) -> list[Source]:
+    """
+    Lists the structure files of a directory (recursively) or of a tarball.
+
+    Args:
+        source (Path): Directory, or tar archive (possibly compressed).
+
+    Returns:
+        list[Source]: Structure files, sorted by path for a directory, in archive order for
+            a tarball.
+    """
+    source = Path(source)
+    if source.is_dir():
+        sources = []
+        for file in sorted(source.rglob("*")):
+            if file.is_file() and is_structure_file(file.name):
+                stat = file.stat()
+                key = file.relative_to(source).as_posix()
+                sources.append(Source(key, stat.st_size, stat.st_mtime_ns))
+        return sources
+    if source.is_file() and tarfile.is_tarfile(source):
+        with tarfile.open(source, "r:*") as tar:
+            return [
+                Source(member.name, member.size, int(member.mtime))
+                for member in tar.getmembers()
+                if member.isfile() and is_structure_file(member.name)
+            ]
+    raise ValueError(f"{source} is neither a directory nor a tarball.")
+
+
+def _read_sources(
+    source: Path, sources: list[Source]
+) -> Iterator[tuple[str, str | bytes]]:
+    """Yields the path of each file of a directory, or the content of each tarball member."""
+    source = Path(source)
+    if source.is_dir():
+        for file in sources:
+            yield file.key, str(source / file.key)
+        return
+    wanted = {file.key for file in sources}
+    # One pass over the archive, in the order of its members
+    with tarfile.open(source, "r:*") as tar:
+        for member in tar:
+            if member.name in wanted:
+                extracted = tar.extractfile(member)
+                if extracted is None:
+                    raise ValueError(
+                        f"{member.name} is not a regular file of {source}."
+                    )
+                yield member.name, extracted.read()
+
+
+def _scan_source(
+    task: tuple[str, str | bytes],
+) -> tuple[str, list[ChainCoordinates], Optional[str]]:
+    key, content = task
+    try:
+        if isinstance(content, bytes):
+            if key.endswith(".gz"):
+                content = gzip.decompress(content)
+            lines = io.StringIO(content.decode())
+            chains = scan_c1_lines(lines, is_mmcif(key))
+        else:
+            chains = scan_c1_atoms(content)
+    except (
+        OSError,
+        EOFError,
+        UnicodeDecodeError,
+        ValueError,
+        KeyError,
+        IndexError,
+    ) as e:
+        return key, [], f"{type(e).__name__}: {e}"
+    # First model only, as the training labels have a single conformer
+    return key, [chain for chain in chains if chain.model == 0], None
+
+
+def manifest_path(destination: Path) -> Path:
+    return Path(f"{destination}{MANIFEST_SUFFIX}")
+
+
+def load_manifest(destination: Path) -> dict[str, dict]:
+    """
+    Reads the manifest of a labels file.
+
+    Args:
+        destination (Path): Labels file written by `ingest_structures`.
+
+    Returns:
+        dict[str, dict]: Size, mtime, parsing error and chains (target_id, sequence, kept) of
+            each source file, or an empty manifest if there is none.
+    """
+    manifest = manifest_path(destination)
+    if not Path(destination).is_file() or not manifest.is_file():
+        return {}
+    return json.loads(manifest.read_text())["sources"]
+
+
+def _write_atomically(destination: Path, write) -> None:
+    partial = Path(f"{destination}.tmp")
+    write(partial)
+    os.replace(partial, destination)
+
+
+def ingest_structures(
+    source: Path, destination: Path, workers: int = 1, resume: bool = True
+) -> dict:
+    """
+    Converts a directory or a tarball of PDB/mmCIF files into training labels.
+
+    A chain is kept if its sequence was not seen before, in the order of the sources. With
+    `resume`, the chains kept by unchanged files stay kept, and only new or changed files are
+    parsed, along with the unchanged ones whose duplicate chains lost their kept copy.
+
+    Args:
+        source (Path): Directory (recursively) or tarball of `.pdb`, `.ent`, `.cif` or
+            `.mmcif` files, possibly gzipped.
+        destination (Path): Parquet labels file. Its manifest is saved next to it.
+        workers (int, optional): Number of parsing processes. Defaults to 1.
+        resume (bool, optional): Whether to reuse the previous run of the same destination.
+            Defaults to True.
+
+    Returns:
+        dict: Number of source files, files parsed, parsing errors, chains and kept chains.
+    """
+    sources = list_sources(source)
+    previous = load_manifest(destination) if resume else {}
+
+    unchanged = {
+        file.key: previous[file.key]
+        for file in sources
+        if file.key in previous
+        and (previous[file.key]["size"], previous[file.key]["mtime"])
+        == (file.size, file.mtime)
+    }
+    kept_sequences = {
+        chain["sequence"]
+        for entry in unchanged.values()
+        for chain in entry["chains"]
+        if chain["kept"]
+    }
+    # A duplicate whose kept copy came from a changed or removed file is parsed again
+    for key, entry in list(unchanged.items()):
+        if any(
+            not chain["kept"] and chain["sequence"] not in kept_sequences
+            for chain in entry["chains"]
+        ):
+            del unchanged[key]
+
+    kept_chains = [
+        chain
+        for entry in unchanged.values()
+        for chain in entry["chains"]
+        if chain["kept"]
+    ]
+    kept_sequences = {chain["sequence"] for chain in kept_chains}
+    target_ids = {chain["target_id"] for chain in kept_chains}
+    todo = [file for file in sources if file.key not in unchanged]
+    logger.info("%d files to parse, %d unchanged", len(todo), len(unchanged))
+
+    frames = []
+    if target_ids:
+        labels = read_table(destination, targets=sorted(target_ids))
+        frames.append(labels[LABEL_COLUMNS])
+
+    by_key = {file.key: file for file in todo}
+    entries = dict(unchanged)
+    new_chains: list[tuple[str, ChainCoordinates]] = []
+    results = imap_ordered(_scan_source, _read_sources(source, todo), workers=workers)
+    for key, chains, error in results:
+        if error is not None:
+            logger.warning("Cannot parse %s: %s", key, error)
+        entry = {
+            "size": by_key[key].size,
+            "mtime": by_key[key].mtime,
+            "error": error,
+            "chains": [],
+        }
+        for chain in chains:
+            target_id = f"{structure_id(key)}_{chain.chain}"
+            sequence = chain.sequence
+            kept = sequence not in kept_sequences and target_id not in target_ids
+            if kept:
+                kept_sequences.add(sequence)
+                target_ids.add(target_id)
+                new_chains.append((target_id, chain))
+            entry["chains"].append(
+                {"target_id": target_id, "sequence": sequence, "kept": kept}
+            )
+        entries[key] = entry
+    frames.append(chains_to_labels(new_chains))
+
+    labels = to_columnar(pd.concat(frames, ignore_index=True))
+    _write_atomically(destination, lambda file: write_columnar(labels, file))
+    # After the labels: a manifest never refers to missing labels
+    manifest = {"sources": {file.key: entries[file.key] for file in sources}}
+    _write_atomically(
+        manifest_path(destination),
+        lambda file: Path(file).write_text(json.dumps(manifest)),
+    )
+
+    return {
+        "sources": len(sources),
+        "parsed": len(todo),
+        "errors": sum(entry["error"] is not None for entry in entries.values()),
+        "chains": sum(len(entry["chains"]) for entry in entries.values()),
+        "kept": len(target_ids),
+    }
+
+
+def chains_to_labels(chains: list[tuple[str, ChainCoordinates]]) -> pd.DataFrame:
+    """
+    Converts chains to labels, in one DataFrame.
+
+    Residues are numbered from 1 in chain order, like the positions of `train_labels.csv`:
+    author numbers repeat across insertion codes (e.g. 11 and 11A), and would give
+    duplicate IDs.
+
+    Args:
+        chains (list[tuple[str, ChainCoordinates]]): target_id and C1' atoms of each chain.
+
+    Returns:
+        pd.DataFrame: ID, resname, resid, x_1, y_1 and z_1 of every residue.
+    """
+    if not chains:
+        return pd.DataFrame(
+            {
+                "ID": pd.Series(dtype=object),
+                "resname": pd.Series(dtype=object),
+                "resid": pd.Series(dtype=np.int64),
+                **{column: pd.Series(dtype=np.float32) for column in LABEL_COLUMNS[3:]},
+            }
+        )
+    resid = np.concatenate([np.arange(1, len(chain.resid) + 1) for _, chain in chains])
+    coords = np.concatenate([chain.coords for _, chain in chains])
+    return pd.DataFrame(
+        {
+            "ID": [
+                f"{target_id}_{number}"
+                for target_id, chain in chains
+                for number in range(1, len(chain.resid) + 1)
+            ],
+            "resname": np.concatenate([chain.resname for _, chain in chains]).astype(
+                object
+            ),
+            "resid": resid,
+            "x_1": coords[:, 0],
+            "y_1": coords[:, 1],
+            "z_1": coords[:, 2],
+        }
+    )
+
+
+@app.command()
+def ingest(
+    source: Path, destination: Path, workers: int = 1, resume: bool = True
+) -> None:
+    """
+    Converts a directory or a tarball of PDB/mmCIF files into training labels (Parquet),
+    one target per chain with a new sequence.
+    """
+    stats = ingest_structures(source, destination, workers=workers, resume=resume)
+    print(
+        f"{stats['parsed']} of {stats['sources']} files parsed ({stats['errors']} errors), "
+        f"{stats['kept']} of {stats['chains']} chains kept"
+    )
+    print(f"Labels saved at {destination}")
+
+
+if __name__ == "__main__":
+    app()
@@ -1,32 +1,75 @@
+"""
+The `rnafold` command line.
+
+Subcommands are the Typer apps of their modules, imported only when the subcommand runs:
+`rnafold --help` does not import pandas, the config or any heavy dependency.
+"""
+
+import importlib
+
+import click
 import typer
+from typer.core import TyperGroup
 
-app = typer.Typer()
+# Subcommand: (module with a Typer `app`, short help)
+COMMANDS = {
+    "evaluate": (
+        "rnafold.metrics",
+        "Computes the TM-score between predicted and native RNA structures.",
+    ),
+    "submit": ("rnafold.submit", "Writes a zero submission for the sequences."),
+    "report": (
+        "rnafold.report",
+        "Prints the sizes of the splits and the leakage between train and val.",
+    ),
+    "ingest": (
+        "rnafold.ingest",
+        "Converts a directory or a tarball of PDB/mmCIF files into training labels.",
+    ),
+    "benchmark": (
+        "rnafold.benchmark",
+        "Benchmarks the TM-score backends on the same solution and submission.",
+    ),
+}
 
 
-@app.command()
-def hello(name: str) -> None:
-    """
-    Prints Hello.
+def load_command(name: str) -> click.Command:
+    """Imports the module of a subcommand, and returns its command."""
+    module = importlib.import_module(COMMANDS[name][0])
+    command = typer.main.get_command(module.app)
+    command.name = name
+    return command
 
-    Args:
-        name (str): name to say hello to
-    """
-    print(f"Hello {name}")
 
+class LazyGroup(TyperGroup):
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return list(COMMANDS)
 
-@app.command()
-def goodbye(name: str, formal: bool = False) -> None:
-    """
-    Prints goodbye.
+    def get_command(self, ctx: click.Context, name: str) -> click.Command | None:
+        # Placeholder with the short help only, to list the commands without importing them
+        if name not in COMMANDS:
+            return None
+        return click.Command(name, short_help=COMMANDS[name][1])
 
-    Args:
-        name (str): name to say goob bye to.
-        formal (bool, optional): if True, will be more formal. Defaults to False.
+    def resolve_command(
+        self, ctx: click.Context, args: list[str]
+    ) -> tuple[str | None, click.Command | None, list[str]]:
+        name, command, args = super().resolve_command(ctx, args)
+        if name is None or command is None:
+            # Unknown command, while parsing resiliently (e.g. for shell completion)
+            return name, command, args
+        return name, load_command(name), args
+
+
+app = typer.Typer(cls=LazyGroup, no_args_is_help=True)
+
+
+@app.callback()
+def main() -> None:
+    """
+    Tools for RNA 3D structure prediction: evaluation, submissions, reports, ingestion and
+    benchmarks.
     """
-    if formal:
-        print(f"Goodbye Ms. {name}. Have a good day.")
-    else:
-        print(f"Bye {name}!")
 
 
 if __name__ == "__main__":
@@ -4,21 +4,51 @@ Competition metrics.
 Adapted for Mac from: https://www.kaggle.com/code/metric/ribonanza-tm-score/notebook
 """
 
+import functools
+import hashlib
 import os
 import re
 import shutil
+import subprocess  # nosec
 import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from enum import StrEnum
 from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional, Protocol
 
+import numpy as np
 import pandas as pd
 import typer
-from tqdm import tqdm
 
-from rnafold.config import Settings
+from rnafold.cache import TMScoreCache
+from rnafold.config import get_settings
+from rnafold.coords import (
+    CoordinateStore,
+    count_structures,
+    extract_target_ids,
+    is_store,
+)
+from rnafold.dataset import iter_table_chunks, read_table
+from rnafold.parallel import imap_ordered
+from rnafold.profiling import Profile, StageTimings, profile_calls, record_stages, stage
+from rnafold.tmscore import (
+    ALGORITHM_VERSION,
+    is_resolved,
+    tm_score_matrix,
+    tm_score_matrix_pruned,
+)
 
 app = typer.Typer()
 
 
+class Engine(StrEnum):
+    USALIGN = "usalign"
+    NUMPY = "numpy"
+
+
 def parse_tmscore_output(output: str) -> float:
     # Extract TM-score based on length of reference structure (second)
     tm_score_match = re.findall(r"TM-score=\s+([\d.]+)", output)[1]
@@ -61,6 +91,37 @@ def write_target_line(
     return f"ATOM  {atom_serial:>5d}  {atom_name:<5s} {residue_name:<3s} {residue_num:>3d}    {x_coord:>8.3f}{y_coord:>8.3f}{z_coord:>8.3f}{occupancy:>6.2f}{b_factor:>6.2f}           {atom_type}\n"
 
 
+# Same layout as `write_target_line`, for a C1' atom
+C1_PDB_LINE = "ATOM  %5d  C1'   %-3s %3d    %8.3f%8.3f%8.3f  1.00  0.00           C\n"
+
+
+def write_pdb(
+    target_path: str | Path,
+    resnames: np.ndarray,
+    resids: np.ndarray,
+    coords: np.ndarray,
+) -> None:
+    """
+    Writes C1' atoms into a PDB file, all lines being formatted in bulk.
+
+    The output is byte-identical to `write_target_line` with atom_name="C1'" and atom_type="C".
+
+    Args:
+        target_path (str | Path): Output PDB file
+        resnames (np.ndarray): Residue names, of shape (L,).
+        resids (np.ndarray): Residue numbers, of shape (L,).
+        coords (np.ndarray): Coordinates, of shape (L, 3).
+    """
+    rows = zip(
+        resids.tolist(),
+        resnames.tolist(),
+        resids.tolist(),
+        *np.asarray(coords).T.tolist(),
+    )
+    with open(target_path, "w") as target_file:
+        target_file.write("".join([C1_PDB_LINE % row for row in rows]))
+
+
 def write2pdb(df: pd.DataFrame, xyz_id: int, target_path: str) -> int:
     """
     Writes the structure into a PDB file.
@@ -73,33 +134,82 @@ def write2pdb(df: pd.DataFrame, xyz_id: int, target_path: str) -> int:
     Returns:
         int: Number of atoms for which the prediction is not a NaN (used for the metric's calculations).
     """
-    resolved_cnt = 0
-    with open(target_path, "w") as target_file:
-        for _, row in df.iterrows():
-            x_coord = row[f"x_{xyz_id}"]
-            y_coord = row[f"y_{xyz_id}"]
-            z_coord = row[f"z_{xyz_id}"]
-
-            if x_coord > -1e17 and y_coord > -1e17 and z_coord > -1e17:
-                # if True:
-                resolved_cnt += 1
-                target_line = write_target_line(
-                    atom_name="C1'",
-                    atom_serial=int(row["resid"]),
-                    residue_name=row["resname"],
-                    chain_id="0",
-                    residue_num=int(row["resid"]),
-                    x_coord=x_coord,
-                    y_coord=y_coord,
-                    z_coord=z_coord,
-                    atom_type="C",
-                )
-                target_file.write(target_line)
-    return resolved_cnt
+    coords = get_xyz(df, xyz_id)
+    resolved = is_resolved(coords)
+    write_pdb(
+        target_path,
+        df["resname"].to_numpy()[resolved],
+        df["resid"].to_numpy(dtype=int)[resolved],
+        coords[resolved],
+    )
+    return int(resolved.sum())
+
+
+def write_structures(
+    df: pd.DataFrame, workdir: Path, prefix: str
+) -> list[tuple[Path, int]]:
+    """
+    Writes every structure of a target into its own PDB file, `{prefix}_{i}.pdb`.
+
+    Args:
+        df (pd.DataFrame): Structures of a single target
+        workdir (Path): Output directory
+        prefix (str): File name prefix
+
+    Returns:
+        list[tuple[Path, int]]: PDB file and number of resolved atoms of each structure.
+    """
+    with stage("select"):
+        coords = get_structures(df)
+        resolved = is_resolved(coords)
+        resnames = df["resname"].to_numpy()
+        resids = df["resid"].to_numpy(dtype=int)
+
+    pdbs = []
+    with stage("write_pdb"):
+        for i, (structure, mask) in enumerate(zip(coords, resolved), start=1):
+            pdb = workdir / f"{prefix}_{i}.pdb"
+            write_pdb(pdb, resnames[mask], resids[mask], structure[mask])
+            pdbs.append((pdb, int(mask.sum())))
+    return pdbs
+
+
+def get_xyz(df: pd.DataFrame, xyz_id: int) -> np.ndarray:
+    """
+    Returns the coordinates of the i-th structure of a target.
+
+    Args:
+        df (pd.DataFrame): Structures of a single target
+        xyz_id (int): Id prefix of the x_i, y_i and z_i columns.
+
+    Returns:
+        np.ndarray: Coordinates of shape (L, 3).
+    """
+    return df[[f"x_{xyz_id}", f"y_{xyz_id}", f"z_{xyz_id}"]].to_numpy(dtype=np.float64)
+
+
+def get_structures(df: pd.DataFrame) -> np.ndarray:
+    """
+    Returns the coordinates of all the structures of a target.
+
+    Args:
+        df (pd.DataFrame): Structures of a single target
+
+    Returns:
+        np.ndarray: Coordinates of shape (K, L, 3), K being the number of x_i, y_i and z_i columns.
+    """
+    n_structures = count_structures(df)
+    columns = [f"{axis}_{i}" for i in range(1, n_structures + 1) for axis in "xyz"]
+    coords = df[columns].to_numpy(dtype=np.float64).reshape(len(df), n_structures, 3)
+    return coords.transpose(1, 0, 2)
 
 
 def score(
-    solution: pd.DataFrame, submission: pd.DataFrame, row_id_column_name: str
+    solution: pd.DataFrame,
+    submission: pd.DataFrame,
+    row_id_column_name: str,
+    engine: Engine = Engine.USALIGN,
+    profile: Optional[Profile] = None,
 ) -> float:
     """
     Computes the TM-score between predicted and native RNA structures using USalign.
@@ -116,51 +226,832 @@ def score(
     5. Runs USalign on each predicted-native pair and extracts the TM-score.
     6. Computes the highest TM-score per target and returns aggregated results.
 
+    With the `numpy` engine, steps 4 and 5 are replaced by an in-process TM-score computed on
+    the coordinates, with residues matched on `resid` (see `rnafold.tmscore`). Engines are
+    implemented by scoring backends, see `get_backend`.
+
     Args:
         solution (pd.DataFrame): A DataFrame containing the native RNA structures.
         submission (pd.DataFrame): A DataFrame containing the predicted RNA structures.
         row_id_column_name (str): The name of the column containing unique row identifiers.
+        engine (Engine, optional): TM-score engine. Defaults to USalign.
+        profile (Optional[Profile], optional): Gathers the time of each stage of each target.
 
     Returns:
         float: the average highest TM-scores.
     """
+    results = score_targets(solution, submission, engine=engine, profile=profile)
+    return float(results["tm_score"].mean())
+
+
+def score_targets(
+    solution: pd.DataFrame,
+    submission: pd.DataFrame,
+    engine: Engine = Engine.USALIGN,
+    workers: int = 1,
+    cache: Optional[TMScoreCache] = None,
+    profile: Optional[Profile] = None,
+    threads: int = 1,
+    prune_tolerance: Optional[float] = None,
+    conformer_tolerance: float = 0.0,
+) -> pd.DataFrame:
+    """
+    Computes the TM-scores of every target, with per-prediction diagnostics.
+
+    Targets are spread across `workers` processes. Results are in the same order, hence the
+    same aggregate, as with a single process.
+
+    Args:
+        solution (pd.DataFrame): A DataFrame containing the native RNA structures.
+        submission (pd.DataFrame): A DataFrame containing the predicted RNA structures.
+        engine (Engine, optional): TM-score engine. Defaults to USalign.
+        workers (int, optional): Number of processes. Defaults to 1.
+        cache (Optional[TMScoreCache], optional): Cache of the TM-scores of previous runs.
+        profile (Optional[Profile], optional): Gathers the time of each stage of each target.
+        threads (int, optional): Number of USalign processes run at once for a target, in
+            each worker. Defaults to 1.
+        prune_tolerance (Optional[float], optional): If set, skips the pairs that can not
+            beat the highest TM-score of their target by more than this tolerance (numpy
+            engine). The `tm_score` of each target is exact within tolerance. Defaults to
+            None, all pairs are scored.
+        conformer_tolerance (float, optional): RMSD, in Angstroms, under which two native
+            conformers of a target are scored once. Defaults to 0, identical natives only.
+
+    Returns:
+        pd.DataFrame: One row per target, with the highest TM-score (`tm_score`), the prediction
+            and native reaching it (`best_prediction`, `best_native`) and the highest TM-score of
+            each prediction (`tm_score_1`, ..., `tm_score_5`). With a cache, the number of pairs
+            found in and missing from the cache (`cache_hits`, `cache_misses`). With pruning,
+            the number of pairs pruned (`pruned`); the highest TM-score of a prediction is then
+            the highest one computed, NaN if all its pairs were pruned. The number of
+            distinct native conformers scored (`conformers`), without the unresolved and
+            duplicate ones.
+    """
+    if engine == Engine.USALIGN:
+        check_usalign()
+
+    # Extract target_id from ID (target_resid)
+    solution["target_id"] = extract_target_ids(solution)
+    submission["target_id"] = extract_target_ids(submission)
+
+    native_groups = solution.groupby("target_id")
+    predicted_groups = submission.groupby("target_id")
+    targets = (
+        (target_id, group_native, predicted_groups.get_group(target_id))
+        for target_id, group_native in native_groups
+    )
+    backend = get_backend(engine, cache, threads, prune_tolerance, conformer_tolerance)
+    return _score_target_groups(
+        targets, native_groups.ngroups, backend, workers, profile
+    )
+
+
+def score_targets_streaming(
+    solution: str | Path,
+    submission: str | Path,
+    engine: Engine = Engine.USALIGN,
+    workers: int = 1,
+    cache: Optional[TMScoreCache] = None,
+    chunksize: int = 100_000,
+    profile: Optional[Profile] = None,
+    threads: int = 1,
+    prune_tolerance: Optional[float] = None,
+    conformer_tolerance: float = 0.0,
+) -> pd.DataFrame:
+    """
+    Same as `score_targets`, but reads the files by chunks and scores targets as they come.
+
+    Rows of a target must be contiguous in both files, as in the competition files. A target
+    is dropped from memory once scored. Targets are scored in the order of the solution file;
+    submission targets read ahead of it are kept until needed, so memory stays bounded when
+    both files list the targets in the same order.
+
+    Args:
+        solution (str | Path): CSV, Parquet or coordinate store of the native RNA structures.
+        submission (str | Path): CSV, Parquet or coordinate store of the predicted RNA structures.
+        engine (Engine, optional): TM-score engine. Defaults to USalign.
+        workers (int, optional): Number of processes. Defaults to 1.
+        cache (Optional[TMScoreCache], optional): Cache of the TM-scores of previous runs.
+        chunksize (int, optional): Number of rows read at once. Defaults to 100,000.
+        profile (Optional[Profile], optional): Gathers the time of each stage of each target.
+        threads (int, optional): Number of USalign processes run at once for a target, in
+            each worker. Defaults to 1.
+        prune_tolerance (Optional[float], optional): If set, skips the pairs that can not
+            beat the highest TM-score of their target by more than this tolerance (numpy
+            engine). The `tm_score` of each target is exact within tolerance. Defaults to
+            None, all pairs are scored.
+        conformer_tolerance (float, optional): RMSD, in Angstroms, under which two native
+            conformers of a target are scored once. Defaults to 0, identical natives only.
+
+    Returns:
+        pd.DataFrame: One row per target, see `score_targets`.
+    """
+    if engine == Engine.USALIGN:
+        check_usalign()
+
+    def join_targets() -> Iterator[tuple[str, pd.DataFrame, pd.DataFrame]]:
+        if is_store(submission):
+            # Direct access to each target, no need to read ahead
+            store = CoordinateStore(submission)
+            for target_id, group_native in iter_targets(solution, chunksize):
+                if target_id not in store:
+                    raise ValueError(
+                        f"Target {target_id} is missing from the submission."
+                    )
+                yield target_id, group_native, store.target_frame(target_id)
+            return
 
-    if not shutil.which(Settings.tools.usalign):
+        predicted_targets = iter_targets(submission, chunksize)
+        read_ahead: dict[str, pd.DataFrame] = {}
+        for target_id, group_native in iter_targets(solution, chunksize):
+            while target_id not in read_ahead:
+                predicted_id, group_predicted = next(predicted_targets, (None, None))
+                if predicted_id is None:
+                    raise ValueError(
+                        f"Target {target_id} is missing from the submission."
+                    )
+                read_ahead[predicted_id] = group_predicted
+            yield target_id, group_native, read_ahead.pop(target_id)
+
+    backend = get_backend(engine, cache, threads, prune_tolerance, conformer_tolerance)
+    return _score_target_groups(join_targets(), None, backend, workers, profile)
+
+
+def _score_target_groups(
+    targets: Iterable[tuple[str, pd.DataFrame, pd.DataFrame]],
+    n_targets: Optional[int],
+    backend: "ScoringBackend",
+    workers: int,
+    profile: Optional[Profile],
+) -> pd.DataFrame:
+    """Scores (target_id, native, predicted) groups, see `score_targets`."""
+    # Imported on first use, for a fast CLI start
+    from tqdm import tqdm
+
+    tasks = (
+        (target_id, group_native, group_predicted, backend, profile is not None)
+        for target_id, group_native, group_predicted in targets
+    )
+    rows = []
+    results = imap_ordered(_score_target, tasks, workers=workers)
+    for row, total, timings in tqdm(results, total=n_targets, desc="Total"):
+        if profile is not None:
+            profile.add(row["target_id"], total, timings)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# Flags of every USalign run: scores over the C1' atoms only
+USALIGN_FLAGS = ["-atom", " C1'"]
+
+
+def has_usalign() -> bool:
+    """Whether the USalign binary of the config is installed."""
+    return shutil.which(get_settings().tools.usalign) is not None
+
+
+def check_usalign() -> None:
+    """Exits if the USalign binary of the config is not installed."""
+    if not has_usalign():
         sys.exit(
             "Error: USalign is not installed. Please install it via GitHub or Homebrew (brew install brewsci/bio/usalign)."
         )
 
-    # Extract target_id from ID (target_resid)
-    solution["target_id"] = solution["ID"].apply(lambda x: x.split("_")[0])
-    submission["target_id"] = submission["ID"].apply(lambda x: x.split("_")[0])
 
-    results = []
-    # Iterate through each target_id and generate PDB files for both clean and corrupted data
-    for target_id, group_native in tqdm(solution.groupby("target_id"), desc="Total"):
-        group_predicted = submission[submission["target_id"] == target_id]
-        native_pdb = "native.pdb"
-        predicted_pdb = "predicted.pdb"
+def usalign_version() -> str:
+    """
+    Identifies the USalign binary of the config by the SHA-256 of its content, so that
+    its cached TM-scores are not reused after an upgrade. The configured name if the
+    binary is not installed.
+    """
+    binary = shutil.which(get_settings().tools.usalign)
+    if binary is None:
+        return get_settings().tools.usalign
+    path = Path(binary).resolve()
+    status = path.stat()
+    return _file_digest(path, status.st_size, status.st_mtime_ns)
+
+
+@functools.lru_cache
+def _file_digest(path: Path, size: int, mtime_ns: int) -> str:
+    # Hashed once per version of the file, identified by its size and modification time
+    with open(path, "rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+
+def iter_targets(
+    file: str | Path, chunksize: int = 100_000
+) -> Iterator[tuple[str, pd.DataFrame]]:
+    """
+    Reads a labels or submission table by chunks, yielding the rows of one target at a time.
+
+    Rows of a target must be contiguous. Only the rows of the current chunk, and of the target
+    overlapping two chunks, are held in memory.
+
+    Args:
+        file (str | Path): CSV or Parquet file with an `ID` column (target_resid).
+        chunksize (int, optional): Number of rows read at once. Defaults to 100,000.
+
+    Yields:
+        tuple[str, pd.DataFrame]: target_id and rows of the target, with a `target_id` column.
+    """
+    seen: set[str] = set()
+
+    def check(target_id: str) -> str:
+        if target_id in seen:
+            raise ValueError(
+                f"Rows of target {target_id} are not contiguous in {file}."
+            )
+        seen.add(target_id)
+        return target_id
+
+    incomplete = None
+    for chunk in iter_table_chunks(file, chunksize):
+        chunk["target_id"] = extract_target_ids(chunk)
+        if incomplete is not None:
+            chunk = pd.concat([incomplete, chunk], ignore_index=True)
+
+        target_ids = chunk["target_id"].to_numpy()
+        starts = np.flatnonzero(np.r_[True, target_ids[1:] != target_ids[:-1]])
+        # The last target of the chunk may continue in the next one
+        for start, end in zip(starts[:-1], starts[1:]):
+            yield check(target_ids[start]), chunk.iloc[start:end]
+        incomplete = chunk.iloc[starts[-1] :]
+
+    if incomplete is not None:
+        yield check(incomplete["target_id"].iloc[0]), incomplete
+
+
+def _score_target(
+    task: tuple[str, pd.DataFrame, pd.DataFrame, "ScoringBackend", bool],
+) -> tuple[dict, float, Optional[StageTimings]]:
+    """
+    Scores a single target, returns its row of the `score_targets` DataFrame, the time to
+    score it and, if profiled, the time of each stage.
+    """
+    target_id, group_native, group_predicted, backend, profile = task
+    start = time.perf_counter()
+    with record_stages() if profile else nullcontext() as timings:
+        row = score_target(target_id, group_native, group_predicted, backend)
+    return row, time.perf_counter() - start, timings
+
+
+def score_target(
+    target_id: str,
+    group_native: pd.DataFrame,
+    group_predicted: pd.DataFrame,
+    backend: "ScoringBackend",
+) -> dict:
+    """
+    Scores a single target with a backend.
+
+    Args:
+        target_id (str): Target id.
+        group_native (pd.DataFrame): Native structures of the target.
+        group_predicted (pd.DataFrame): Predicted structures of the target.
+        backend (ScoringBackend): TM-score backend.
+
+    Returns:
+        dict: Row of the `score_targets` DataFrame, with the counters of the backend for
+            the target (see `ScoringBackend.counters`).
+    """
+    before = backend.counters()
+    tm_scores = backend.tm_scores(group_native, group_predicted)
+    after = backend.counters()
+    return {
+        **summarize_target(target_id, tm_scores),
+        **{name: after[name] - before[name] for name in after},
+    }
+
+
+def target_tm_scores(
+    group_native: pd.DataFrame,
+    group_predicted: pd.DataFrame,
+    engine: Engine = Engine.USALIGN,
+    cache: Optional[TMScoreCache] = None,
+) -> np.ndarray:
+    """
+    Computes the TM-scores of all (prediction, native) pairs of a target.
+
+    With a cache, only the pairs missing from it are computed, and then added to it.
+
+    Args:
+        group_native (pd.DataFrame): Native structures of the target.
+        group_predicted (pd.DataFrame): Predicted structures of the target.
+        engine (Engine, optional): TM-score engine. Defaults to USalign.
+        cache (Optional[TMScoreCache], optional): Cache of the TM-scores of previous runs.
+
+    Returns:
+        np.ndarray: TM-scores of shape (predictions, natives). NaN for natives without resolved residues.
+    """
+    return get_backend(engine, cache).tm_scores(group_native, group_predicted)
 
-        target_id_scores = []
 
-        # Compare the i-th prediction to the j-th groundtruth (i=5, j=40)
-        for pred_cnt in range(1, 6):
-            prediction_scores = []
-            for native_cnt in range(1, 41):
-                # Write solution PDB
-                resolved_cnt = write2pdb(group_native, native_cnt, native_pdb)
+class ScoringBackend(Protocol):
+    def tm_scores(
+        self,
+        group_native: pd.DataFrame,
+        group_predicted: pd.DataFrame,
+        pairs: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Computes the TM-scores of (prediction, native) pairs of a target.
 
-                # Write predicted PDB
-                _ = write2pdb(group_predicted, pred_cnt, predicted_pdb)
+        Args:
+            group_native (pd.DataFrame): Native structures of the target.
+            group_predicted (pd.DataFrame): Predicted structures of the target.
+            pairs (Optional[np.ndarray], optional): Mask of shape (predictions, natives) of the
+                pairs to compute, the others are NaN. Defaults to all pairs.
 
-                if resolved_cnt > 0:
-                    tm_score = run_usalign(predicted_pdb, native_pdb)
-                    prediction_scores.append(tm_score)
+        Returns:
+            np.ndarray: TM-scores of shape (predictions, natives). NaN for natives without
+                resolved residues.
+        """
 
-            target_id_scores.append(max(prediction_scores))
-        results.append(max(target_id_scores))
+    def counters(self) -> dict[str, int]:
+        """Counters of the backend since its creation, e.g. the cache hits."""
 
-    return float(sum(results) / len(results))
+    def fingerprint(self) -> dict[str, Any]:
+        """
+        What, besides the structures, determines the scores of the backend, e.g. the
+        version of its algorithm. Part of the keys of the cached TM-scores.
+        """
+
+
+class USalignBackend:
+    def __init__(self, threads: int = 1):
+        """
+        TM-scores of USalign, run on PDB files written for each target.
+
+        Args:
+            threads (int, optional): Number of USalign processes run at once for a target.
+                Defaults to 1, a single process scoring all the pairs.
+        """
+        self.threads = threads
+
+    def tm_scores(
+        self,
+        group_native: pd.DataFrame,
+        group_predicted: pd.DataFrame,
+        pairs: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        # Private scratch space, so that concurrent runs and workers do not share PDB files
+        with tempfile.TemporaryDirectory(prefix="rnafold-") as workdir:
+            return target_tm_scores_usalign(
+                group_native, group_predicted, Path(workdir), pairs, self.threads
+            )
+
+    def counters(self) -> dict[str, int]:
+        return {}
+
+    def fingerprint(self) -> dict[str, Any]:
+        return {"usalign": usalign_version(), "flags": USALIGN_FLAGS}
+
+
+class NumpyBackend:
+    def __init__(self, prune_tolerance: Optional[float] = None):
+        """
+        In-process TM-scores, see `rnafold.tmscore`.
+
+        Args:
+            prune_tolerance (Optional[float], optional): If set, only the pairs that can reach
+                the highest score of the target, within this tolerance, are scored (see
+                `tm_score_matrix_pruned`), the others are NaN. Defaults to None, all pairs.
+        """
+        self.prune_tolerance = prune_tolerance
+        self.pruned = 0
+
+    def tm_scores(
+        self,
+        group_native: pd.DataFrame,
+        group_predicted: pd.DataFrame,
+        pairs: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        if self.prune_tolerance is None:
+            return target_tm_scores_numpy(group_native, group_predicted, pairs)
+        tm_scores, pruned = target_tm_scores_pruned(
+            group_native, group_predicted, self.prune_tolerance, pairs
+        )
+        self.pruned += pruned
+        return tm_scores
+
+    def counters(self) -> dict[str, int]:
+        return {} if self.prune_tolerance is None else {"pruned": self.pruned}
+
+    def fingerprint(self) -> dict[str, Any]:
+        return {"algorithm": ALGORITHM_VERSION}
+
+
+class CachedBackend:
+    def __init__(self, backend: ScoringBackend, cache: TMScoreCache, engine: str):
+        """
+        Looks up TM-scores in a cache, and computes the missing ones with another backend.
+
+        Args:
+            backend (ScoringBackend): Backend computing the scores missing from the cache.
+            cache (TMScoreCache): Cache of the TM-scores of previous runs.
+            engine (str): Name of the engine of the backend, part of the cache keys.
+        """
+        self.backend = backend
+        self.cache = cache
+        self.engine = engine
+
+    def tm_scores(
+        self,
+        group_native: pd.DataFrame,
+        group_predicted: pd.DataFrame,
+        pairs: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        # Apart from "select" of the inner backend, which selects the structures again
+        with stage("cache_select"):
+            predicted = get_structures(align_predicted(group_native, group_predicted))
+            native = get_structures(group_native)
+        resolved = np.broadcast_to(
+            is_resolved(native).any(axis=1), (len(predicted), len(native))
+        )
+        if pairs is not None:
+            resolved = resolved & pairs
+
+        with stage("cache_lookup"):
+            keys = self.cache.keys(
+                predicted, native, self.engine, self.backend.fingerprint()
+            )
+            cached = self.cache.get_many(keys[resolved].tolist())
+        tm_scores = np.array(
+            [[cached.get(key, np.nan) for key in row] for row in keys], dtype=np.float64
+        )
+        tm_scores[~resolved] = np.nan
+
+        missing = resolved & np.isnan(tm_scores)
+        if missing.any():
+            computed = self.backend.tm_scores(group_native, group_predicted, missing)
+            tm_scores[missing] = computed[missing]
+            # Pairs pruned by the backend are not scores
+            missing &= ~np.isnan(computed)
+            with stage("cache_store"):
+                self.cache.set_many(
+                    dict(zip(keys[missing].tolist(), computed[missing].tolist()))
+                )
+        return tm_scores
+
+    def counters(self) -> dict[str, int]:
+        return {
+            "cache_hits": self.cache.stats.hits,
+            "cache_misses": self.cache.stats.misses,
+            **self.backend.counters(),
+        }
+
+    def fingerprint(self) -> dict[str, Any]:
+        return self.backend.fingerprint()
+
+
+class DistinctNativesBackend:
+    def __init__(self, backend: ScoringBackend, tolerance: float = 0.0):
+        """
+        Scores the distinct native conformers of a target only, with another backend.
+
+        Natives without resolved residues are not scored (NaN), and duplicates get the
+        scores of the first conformer they duplicate (see `distinct_conformers`).
+
+        Args:
+            backend (ScoringBackend): Backend scoring the distinct natives.
+            tolerance (float, optional): RMSD, in Angstroms, under which two natives are
+                duplicates. Defaults to 0, identical natives only.
+        """
+        self.backend = backend
+        self.tolerance = tolerance
+        self.conformers = 0
+
+    def tm_scores(
+        self,
+        group_native: pd.DataFrame,
+        group_predicted: pd.DataFrame,
+        pairs: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        with stage("dedupe"):
+            representatives = distinct_conformers(
+                get_structures(group_native), self.tolerance
+            )
+            distinct = np.flatnonzero(
+                representatives == np.arange(len(representatives))
+            )
+            # Index of each native among the distinct ones, -1 if unresolved
+            positions = np.full(len(representatives), -1)
+            positions[distinct] = np.arange(len(distinct))
+            positions = np.where(representatives >= 0, positions[representatives], -1)
+        self.conformers += len(distinct)
+
+        n_predicted = count_structures(group_predicted)
+        if pairs is None:
+            pairs = np.ones((n_predicted, len(representatives)), dtype=bool)
+        tm_scores = np.full(pairs.shape, np.nan)
+        if len(distinct) == 0:
+            return tm_scores
+
+        # A distinct native is scored if any of its duplicates is requested
+        distinct_pairs = np.zeros((n_predicted, len(distinct)), dtype=bool)
+        resolved = positions >= 0
+        np.logical_or.at(distinct_pairs.T, positions[resolved], pairs[:, resolved].T)
+        distinct_scores = self.backend.tm_scores(
+            select_structures(group_native, distinct), group_predicted, distinct_pairs
+        )
+        tm_scores[:, resolved] = distinct_scores[:, positions[resolved]]
+        tm_scores[~pairs] = np.nan
+        return tm_scores
+
+    def counters(self) -> dict[str, int]:
+        return {"conformers": self.conformers, **self.backend.counters()}
+
+    def fingerprint(self) -> dict[str, Any]:
+        return self.backend.fingerprint()
+
+
+def distinct_conformers(coords: np.ndarray, tolerance: float = 0.0) -> np.ndarray:
+    """
+    Finds the unresolved and duplicate conformers of a target.
+
+    Two conformers are duplicates if they have the same resolved residues, and an RMSD
+    (without superposition) of their resolved residues of at most `tolerance`.
+
+    Args:
+        coords (np.ndarray): Conformers of shape (K, L, 3).
+        tolerance (float, optional): RMSD, in Angstroms. Defaults to 0, identical conformers.
+
+    Returns:
+        np.ndarray: For each conformer, the first conformer it duplicates, itself if it is
+            distinct, and -1 if it has no resolved residue. Of shape (K,).
+    """
+    resolved = is_resolved(coords)
+    coords = np.where(resolved[..., None], coords, 0.0)
+    representatives = np.full(len(coords), -1)
+    distinct: list[int] = []
+    for k in np.flatnonzero(resolved.any(axis=1)):
+        representatives[k] = k
+        for d in distinct:
+            if not np.array_equal(resolved[k], resolved[d]):
+                continue
+            mean_dist2 = np.sum((coords[k] - coords[d]) ** 2) / resolved[k].sum()
+            if mean_dist2 <= tolerance**2:
+                representatives[k] = d
+                break
+        else:
+            distinct.append(int(k))
+    return representatives
+
+
+def select_structures(df: pd.DataFrame, indices: Iterable[int]) -> pd.DataFrame:
+    """
+    Keeps some structures of a target.
+
+    Args:
+        df (pd.DataFrame): Structures of a single target.
+        indices (Iterable[int]): Structures to keep, 0-based.
+
+    Returns:
+        pd.DataFrame: The other columns, and the x_i, y_i and z_i columns of the structures
+            kept, renumbered from 1 in the order of the indices.
+    """
+    columns = {
+        f"{axis}_{k + 1}": f"{axis}_{i}"
+        for i, k in enumerate(indices, start=1)
+        for axis in "xyz"
+    }
+    others = [column for column in df.columns if not re.fullmatch(r"[xyz]_\d+", column)]
+    return df[others + list(columns)].rename(columns=columns)
+
+
+# Backends of the engines, see `get_backend`
+BACKENDS: dict[Engine, Callable[..., ScoringBackend]] = {
+    Engine.USALIGN: USalignBackend,
+    Engine.NUMPY: NumpyBackend,
+}
+
+
+def get_backend(
+    engine: Engine = Engine.USALIGN,
+    cache: Optional[TMScoreCache] = None,
+    threads: int = 1,
+    prune_tolerance: Optional[float] = None,
+    conformer_tolerance: float = 0.0,
+) -> ScoringBackend:
+    """
+    Returns the scoring backend of an engine.
+
+    Args:
+        engine (Engine, optional): TM-score engine. Defaults to USalign.
+        cache (Optional[TMScoreCache], optional): Cache of the TM-scores of previous runs,
+            wrapping the backend in a `CachedBackend`.
+        threads (int, optional): Number of USalign processes run at once for a target, for
+            the USalign engine. Defaults to 1.
+        prune_tolerance (Optional[float], optional): Tolerance of the pruning of the pairs that
+            can not reach the highest score of a target, for the NumPy engine. Defaults to
+            None, no pruning.
+        conformer_tolerance (float, optional): RMSD, in Angstroms, under which two native
+            conformers of a target are scored once. Defaults to 0, identical natives only.
+
+    Returns:
+        ScoringBackend: The backend, scoring the distinct natives of each target (see
+            `DistinctNativesBackend`).
+    """
+    if engine == Engine.USALIGN:
+        if prune_tolerance is not None:
+            # The bounds hold for residues matched on resid, USalign aligns them itself
+            raise ValueError("Pruning is only available with the numpy engine.")
+        options: dict[str, Any] = {"threads": threads}
+    else:
+        options = {"prune_tolerance": prune_tolerance}
+    backend = BACKENDS[engine](**options)
+    if cache is not None:
+        backend = CachedBackend(backend, cache, engine)
+    return DistinctNativesBackend(backend, conformer_tolerance)
+
+
+def target_tm_scores_usalign(
+    group_native: pd.DataFrame,
+    group_predicted: pd.DataFrame,
+    workdir: Path,
+    pairs: Optional[np.ndarray] = None,
+    threads: int = 1,
+) -> np.ndarray:
+    """
+    Computes the TM-scores of all (prediction, native) pairs of a target with USalign.
+
+    A USalign process compares every prediction to a chunk of the natives in list mode
+    (`-dir1`/`-dir2`), the natives being split into `threads` chunks scored at once.
+
+    Args:
+        group_native (pd.DataFrame): Native structures of the target.
+        group_predicted (pd.DataFrame): Predicted structures of the target.
+        workdir (Path): Directory for the intermediate PDB files.
+        pairs (Optional[np.ndarray], optional): Mask of the pairs to compute. Defaults to all pairs.
+        threads (int, optional): Number of USalign processes run at once. Defaults to 1.
+
+    Returns:
+        np.ndarray: TM-scores of shape (predictions, natives). NaN for natives without resolved
+            residues, 0 for predictions without resolved residues.
+    """
+    predicted_pdbs = write_structures(group_predicted, workdir, "predicted")
+    native_pdbs = write_structures(group_native, workdir, "native")
+    shape = (len(predicted_pdbs), len(native_pdbs))
+    if pairs is None:
+        pairs = np.ones(shape, dtype=bool)
+
+    native_resolved = np.array([count > 0 for _, count in native_pdbs])
+    predicted_resolved = np.array([count > 0 for _, count in predicted_pdbs])
+    requested = pairs & native_resolved
+    # USalign can not read empty PDB files: nothing of these predictions is aligned
+    tm_scores = np.where(requested, 0.0, np.nan)
+    scored = requested & predicted_resolved[:, None]
+    rows, columns = (
+        np.flatnonzero(scored.any(axis=1)),
+        np.flatnonzero(scored.any(axis=0)),
+    )
+    if not len(rows):
+        return tm_scores
+
+    with stage("write_pdb"):
+        predicted_list = write_pdb_list(
+            workdir / "predicted.list", [predicted_pdbs[i][0] for i in rows]
+        )
+        chunks = np.array_split(columns, min(threads, len(columns)))
+        native_lists = [
+            write_pdb_list(
+                workdir / f"native_{k}.list", [native_pdbs[j][0] for j in chunk]
+            )
+            for k, chunk in enumerate(chunks)
+        ]
+
+    with stage("usalign"), ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+        outputs = list(
+            executor.map(
+                lambda native_list: run_usalign_lists(
+                    workdir, predicted_list, native_list
+                ),
+                native_lists,
+            )
+        )
+
+    with stage("parse"):
+        for chunk, output in zip(chunks, outputs):
+            scores = parse_usalign_table(output)
+            for i in rows:
+                for j in chunk:
+                    names = (predicted_pdbs[i][0].name, native_pdbs[j][0].name)
+                    if names not in scores:
+                        raise ValueError(
+                            f"USalign did not compare {names[0]} to {names[1]}."
+                        )
+                    tm_scores[i, j] = scores[names]
+    tm_scores[~requested] = np.nan
+    return tm_scores
+
+
+def target_tm_scores_numpy(
+    group_native: pd.DataFrame,
+    group_predicted: pd.DataFrame,
+    pairs: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Computes the TM-scores of all (prediction, native) pairs of a target with the in-process engine.
+
+    Args:
+        group_native (pd.DataFrame): Native structures of the target.
+        group_predicted (pd.DataFrame): Predicted structures of the target.
+        pairs (Optional[np.ndarray], optional): Mask of the pairs to compute. Defaults to all pairs.
+
+    Returns:
+        np.ndarray: TM-scores of shape (predictions, natives). NaN for natives without resolved residues.
+    """
+    with stage("select"):
+        predicted = get_structures(align_predicted(group_native, group_predicted))
+        native = get_structures(group_native)
+    if pairs is None:
+        pairs = np.ones((len(predicted), len(native)), dtype=bool)
+
+    # Only compute the predictions and natives involved in the requested pairs
+    rows, columns = pairs.any(axis=1), pairs.any(axis=0)
+    tm_scores = np.full(pairs.shape, np.nan)
+    with stage("tm_score"):
+        tm_scores[np.ix_(rows, columns)] = tm_score_matrix(
+            predicted[rows], native[columns]
+        )
+    tm_scores[~pairs] = np.nan
+    tm_scores[:, ~is_resolved(native).any(axis=1)] = np.nan
+    return tm_scores
+
+
+def target_tm_scores_pruned(
+    group_native: pd.DataFrame,
+    group_predicted: pd.DataFrame,
+    tolerance: float = 0.0,
+    pairs: Optional[np.ndarray] = None,
+) -> tuple[np.ndarray, int]:
+    """
+    Computes the TM-scores of the (prediction, native) pairs of a target that can reach its
+    highest score, with the in-process engine.
+
+    Args:
+        group_native (pd.DataFrame): Native structures of the target.
+        group_predicted (pd.DataFrame): Predicted structures of the target.
+        tolerance (float, optional): Acceptable error of the highest score. Defaults to 0.
+        pairs (Optional[np.ndarray], optional): Mask of the pairs to compute. Defaults to all pairs.
+
+    Returns:
+        tuple[np.ndarray, int]: TM-scores of shape (predictions, natives), NaN for natives
+            without resolved residues and for pruned pairs, and number of pruned pairs.
+    """
+    with stage("select"):
+        predicted = get_structures(align_predicted(group_native, group_predicted))
+        native = get_structures(group_native)
+    if pairs is None:
+        pairs = np.ones((len(predicted), len(native)), dtype=bool)
+
+    pairs = pairs & is_resolved(native).any(axis=1)
+    with stage("tm_score"):
+        return tm_score_matrix_pruned(predicted, native, pairs, tolerance)
+
+
+def align_predicted(
+    group_native: pd.DataFrame, group_predicted: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Matches predicted residues to native residues on `resid`.
+
+    Args:
+        group_native (pd.DataFrame): Native structures of the target.
+        group_predicted (pd.DataFrame): Predicted structures of the target.
+
+    Returns:
+        pd.DataFrame: Predicted structures, one row per native residue. Missing residues are NaNs (unresolved).
+    """
+    return group_predicted.set_index("resid").reindex(group_native["resid"])
+
+
+def summarize_target(target_id: str, tm_scores: np.ndarray) -> dict:
+    """
+    Summarizes the TM-score matrix of a target.
+
+    Args:
+        target_id (str): Target id.
+        tm_scores (np.ndarray): TM-scores of shape (predictions, natives).
+
+    Returns:
+        dict: Row of the `score_targets` DataFrame.
+    """
+    best_prediction, best_native = np.unravel_index(
+        np.nanargmax(tm_scores), tm_scores.shape
+    )
+    return {
+        "target_id": target_id,
+        "tm_score": float(tm_scores[best_prediction, best_native]),
+        "best_prediction": int(best_prediction) + 1,
+        "best_native": int(best_native) + 1,
+        # NaN for predictions whose pairs were all pruned
+        **{
+            f"tm_score_{i}": float(np.fmax.reduce(prediction_scores))
+            for i, prediction_scores in enumerate(tm_scores, start=1)
+        },
+    }
 
 
 def run_usalign(predicted_pdb: str, native_pdb: str) -> float:
@@ -174,23 +1065,254 @@ def run_usalign(predicted_pdb: str, native_pdb: str) -> float:
     Returns:
         float: Computed TM-score
     """
-    command = f'{Settings.tools.usalign} {predicted_pdb} {native_pdb} -atom " C1\'"'
-    usalign_output = os.popen(command).read()  # nosec
-    return parse_tmscore_output(usalign_output)
+    command = [get_settings().tools.usalign, predicted_pdb, native_pdb, *USALIGN_FLAGS]
+    with stage("usalign"):
+        usalign_output = subprocess.run(  # nosec
+            command, capture_output=True, text=True, check=True
+        ).stdout
+    with stage("parse"):
+        return parse_tmscore_output(usalign_output)
+
+
+def write_pdb_list(list_file: Path, pdbs: list[Path]) -> Path:
+    """Writes the names of PDB files, one per line, as USalign `-dir1`/`-dir2` lists."""
+    list_file.write_text("".join(f"{pdb.name}\n" for pdb in pdbs))
+    return list_file
+
+
+def run_usalign_lists(workdir: Path, predicted_list: Path, native_list: Path) -> str:
+    """
+    Compares every predicted PDB file to every native PDB file of the lists, in a single
+    USalign process.
+
+    Args:
+        workdir (Path): Directory of the PDB files.
+        predicted_list (Path): Names of the predicted PDB files, one per line.
+        native_list (Path): Names of the native PDB files, one per line.
+
+    Returns:
+        str: Tabular output of USalign (`-outfmt 2`), a line per pair.
+    """
+    # The trailing separator is required by USalign
+    folder = f"{workdir}{os.sep}"
+    command = [
+        get_settings().tools.usalign,
+        "-dir1",
+        folder,
+        str(predicted_list),
+        "-dir2",
+        folder,
+        str(native_list),
+        *USALIGN_FLAGS,
+        "-outfmt",
+        "2",
+    ]
+    return subprocess.run(  # nosec
+        command, capture_output=True, text=True, check=True
+    ).stdout
+
+
+def parse_usalign_table(output: str) -> dict[tuple[str, str], float]:
+    """
+    Parses the tabular output of USalign (`-outfmt 2`).
+
+    Args:
+        output (str): Output of USalign, a header line starting with "#", then a line per
+            pair: first structure, second structure, TM-score normalized by the first, by the
+            second, RMSD, ...
+
+    Returns:
+        dict[tuple[str, str], float]: TM-score normalized by the length of the second
+            structure (the native), by file names of the (first, second) structures.
+    """
+    scores = {}
+    for line in output.splitlines():
+        if not line.strip() or line.startswith("#"):
+            continue
+        first, second, _, tm_score = line.split("\t")[:4]
+        # Structures are named `<path>:<chain>`
+        first_name, second_name = (
+            Path(name).name.rsplit(":", 1)[0] for name in (first, second)
+        )
+        scores[first_name, second_name] = float(tm_score)
+    return scores
+
+
+def benchmark_backends(
+    solution: pd.DataFrame,
+    submission: pd.DataFrame,
+    engines: Optional[Iterable[Engine]] = None,
+    cached: bool = True,
+) -> pd.DataFrame:
+    """
+    Scores the same solution and submission with each backend, and times them.
+
+    A cached backend is run twice on an empty cache: a first run filling it (`cold`), then a
+    run reading it (`warm`).
+
+    Args:
+        solution (pd.DataFrame): Native structures.
+        submission (pd.DataFrame): Predicted structures.
+        engines (Optional[Iterable[Engine]], optional): Engines to benchmark. Defaults to all
+            engines, USalign only if it is installed.
+        cached (bool, optional): Whether to also benchmark the engines with a cache.
+            Defaults to True.
+
+    Returns:
+        pd.DataFrame: One row per backend: `backend`, `seconds`, mean `tm_score`, and the
+            seconds spent in each stage (`<stage>_seconds`).
+    """
+    if engines is None:
+        engines = [
+            engine for engine in Engine if engine != Engine.USALIGN or has_usalign()
+        ]
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="rnafold-") as workdir:
+        for engine in engines:
+            cache = TMScoreCache(Path(workdir) / f"{engine}.db")
+            runs: list[tuple[str, Optional[TMScoreCache]]] = [(str(engine), None)]
+            if cached:
+                runs += [(f"{engine}+cache (cold)", cache)]
+                runs += [(f"{engine}+cache (warm)", cache)]
+            for name, run_cache in runs:
+                profile = Profile()
+                start = time.perf_counter()
+                results = score_targets(
+                    solution,
+                    submission,
+                    engine=engine,
+                    cache=run_cache,
+                    profile=profile,
+                )
+                rows.append(
+                    {
+                        "backend": name,
+                        "seconds": time.perf_counter() - start,
+                        "tm_score": results["tm_score"].mean(),
+                        **{
+                            f"{stage_name}_seconds": seconds
+                            for stage_name, seconds in profile.summary()[
+                                ["stage", "seconds"]
+                            ].values
+                        },
+                    }
+                )
+    return pd.DataFrame(rows).fillna(0.0)
 
 
 @app.command()
 def evaluate(
-    solution: Path = Path(Settings.labels.val),
-    submission: Path = Path(Settings.submission),
+    solution: Optional[Path] = typer.Option(
+        None, help="Native structures. Defaults to the validation labels of the config."
+    ),
+    submission: Optional[Path] = typer.Option(
+        None, help="Predicted structures. Defaults to the submission of the config."
+    ),
+    engine: Engine = typer.Option(
+        Engine.USALIGN,
+        help="TM-score engine. numpy scores residues in correspondence, like "
+        "`USalign -TMscore 1`: a lower bound of the USalign score, not the same metric.",
+    ),
+    details: Optional[Path] = None,
+    workers: int = typer.Option(
+        1, help="Number of processes scoring targets in parallel."
+    ),
+    threads: int = typer.Option(
+        1, help="Number of USalign processes run at once for a target, in each worker."
+    ),
+    conformer_tolerance: float = typer.Option(
+        0.0,
+        help="RMSD (Angstroms) under which two native conformers of a target are scored "
+        "once. 0 for identical conformers only.",
+    ),
+    prune: Optional[float] = typer.Option(
+        None,
+        help="Skips the pairs that can not beat the best TM-score of their target by more "
+        "than this tolerance, 0 for exact scores (numpy engine).",
+    ),
+    cache: Optional[Path] = typer.Option(
+        None, help="TM-score cache file, reused across runs."
+    ),
+    cache_size: int = typer.Option(
+        10_000_000, help="Maximum number of cached TM-scores."
+    ),
+    stream: bool = typer.Option(
+        False, help="Read the CSV files by chunks, with bounded memory."
+    ),
+    chunksize: int = typer.Option(
+        100_000, help="Number of rows read at once when streaming."
+    ),
+    profile: Optional[Path] = typer.Option(
+        None, help="Saves the time of each stage of each target (.csv or .json)."
+    ),
+    profile_stats: Optional[Path] = typer.Option(
+        None, help="Runs under cProfile, and saves the statistics (pstats format)."
+    ),
 ) -> None:
     """
     Computes the TM-score between predicted and native RNA structures using USalign.
+
+    Per-target scores are saved to the `details` CSV file, if provided.
     """
-    y_true = pd.read_csv(solution)
-    y_pred = pd.read_csv(submission)
-    tm_score = score(y_true, y_pred, "")
-    print("Submission TM-score", tm_score)
+    solution = solution or Path(get_settings().labels.val)
+    submission = submission or Path(get_settings().submission)
+    tm_score_cache = TMScoreCache(cache, max_entries=cache_size) if cache else None
+    stage_profile = Profile() if profile else None
+    with profile_calls(profile_stats):
+        if stream:
+            results = score_targets_streaming(
+                solution,
+                submission,
+                engine=engine,
+                workers=workers,
+                cache=tm_score_cache,
+                chunksize=chunksize,
+                profile=stage_profile,
+                threads=threads,
+                prune_tolerance=prune,
+                conformer_tolerance=conformer_tolerance,
+            )
+        else:
+            y_true = read_table(solution)
+            y_pred = read_table(submission)
+            results = score_targets(
+                y_true,
+                y_pred,
+                engine=engine,
+                workers=workers,
+                cache=tm_score_cache,
+                profile=stage_profile,
+                threads=threads,
+                prune_tolerance=prune,
+                conformer_tolerance=conformer_tolerance,
+            )
+    if details:
+        results.to_csv(details, index=False)
+    if tm_score_cache:
+        print(
+            "TM-score cache:",
+            results["cache_hits"].sum(),
+            "hits,",
+            results["cache_misses"].sum(),
+            "misses",
+        )
+    print(
+        "Native conformers:",
+        results["conformers"].sum(),
+        "distinct over",
+        len(results),
+        "targets",
+    )
+    if prune is not None:
+        print("TM-score pruning:", results["pruned"].sum(), "pairs pruned")
+    if profile and stage_profile:
+        stage_profile.save(profile)
+        print(stage_profile.summary().to_string(index=False))
+        print(f"Profile saved at {profile}")
+    if profile_stats:
+        print(f"cProfile statistics saved at {profile_stats}")
+    print("Submission TM-score", results["tm_score"].mean())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+"""Process pool helpers."""
+
+import signal
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def _ignore_sigint() -> None:
+    """Lets the parent process handle Ctrl-C, instead of every worker."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _init_worker(initializer: Optional[Callable], initargs: tuple) -> None:
+    _ignore_sigint()
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def imap_ordered(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    workers: int = 1,
+    window: Optional[int] = None,
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
+) -> Iterator[R]:
+    """
+    Applies a function to items in a process pool, yielding the results in input order.
+
+    Items are consumed lazily: at most `window` of them are in flight at once. On Ctrl-C,
+    or if the consumer stops early, pending tasks are cancelled and the workers are terminated.
+
+    Args:
+        func (Callable): Picklable function, applied to each item.
+        items (Iterable): Items to process.
+        workers (int, optional): Number of processes. Runs in the current process if 1. Defaults to 1.
+        window (Optional[int], optional): Maximum number of tasks in flight. Defaults to 2 * workers.
+        initializer (Optional[Callable], optional): Called once in each worker (or in the current
+            process if workers is 1) before any item, e.g. to load a model.
+        initargs (tuple, optional): Arguments of the initializer.
+
+    Yields:
+        Results of func, in the order of the items.
+    """
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        yield from map(func, items)
+        return
+
+    window = window or 2 * workers
+    executor = process_pool(workers, initializer, initargs)
+    pending: deque = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    except BaseException:
+        # Ctrl-C, worker error or early stop: do not wait for the running tasks
+        terminate(executor)
+        raise
+    executor.shutdown()
+
+
+def process_pool(
+    workers: int, initializer: Optional[Callable] = None, initargs: tuple = ()
+) -> ProcessPoolExecutor:
+    """
+    Starts a process pool whose workers ignore Ctrl-C, and run an initializer once.
+
+    Args:
+        workers (int): Number of processes.
+        initializer (Optional[Callable], optional): Called once in each worker before any task.
+        initargs (tuple, optional): Arguments of the initializer.
+
+    Returns:
+        ProcessPoolExecutor: The pool, to be closed with `shutdown` or `terminate`.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(initializer, initargs),
+    )
+
+
+def terminate(executor: ProcessPoolExecutor) -> None:
+    """Cancels the pending tasks of a pool and kills its workers, without waiting for them."""
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
@@ -97,11 +97,11 @@ def plot_gc_content_distribution(
 
 
 if __name__ == "__main__":
-    from rnafold.config import Settings
+    from rnafold.config import get_settings
     from rnafold.dataset import load_sequences
 
-    sequences_train = load_sequences(Settings.sequences.train)
-    sequences_test = load_sequences(Settings.sequences.test)
+    sequences_train = load_sequences(get_settings().sequences.train)
+    sequences_test = load_sequences(get_settings().sequences.test)
 
     plot_sequence_length_distribution(
         datasets=[sequences_train, sequences_test],
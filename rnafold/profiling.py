@@ -0,0 +1,186 @@
+"""
+Timing of the stages of the evaluation.
+
+Code paths of the metric are wrapped in `stage` timers ("write_pdb", "usalign", "parse",
+"select", "tm_score", "cache_select", "cache_lookup", ...). Timers cost nothing unless
+stages are recorded:
+
+    with record_stages() as timings:
+        scores = get_backend(Engine.NUMPY).tm_scores(native, predicted)
+    timings.seconds  # {"select": 0.01, "tm_score": 0.2}
+
+`score_targets(..., profile=Profile())` records the stages of each target, in the
+workers, and gathers them in the `Profile`, saved as CSV or JSON. For call stacks,
+`profile_calls` runs the whole evaluation under cProfile. Stages wrap named functions
+(`write_structures`, `run_usalign`, `parse_tmscore_output`, `tm_score_matrix`, ...), so
+they also stand out in the flame graphs of sampling profilers such as py-spy, e.g. with
+`evaluate --workers 1`.
+"""
+
+import cProfile
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pandas as pd
+
+# Timings of the stages of the current process, None when not recording
+_active: Optional["StageTimings"] = None
+
+
+@dataclass
+class StageTimings:
+    seconds: dict[str, float] = field(default_factory=dict)
+    calls: dict[str, int] = field(default_factory=dict)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Times a stage, if stages are recorded (see `record_stages`).
+
+    Nested stages are timed independently: the time of a stage includes its inner stages.
+
+    Args:
+        name (str): Stage name. The times of stages of the same name are summed.
+    """
+    timings = _active
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+@contextmanager
+def record_stages() -> Iterator[StageTimings]:
+    """
+    Records the time of the stages run in the current process, until exit.
+
+    Yields:
+        StageTimings: Time and number of calls of each stage, filled in as stages run.
+    """
+    global _active
+    previous, _active = _active, StageTimings()
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+
+class Profile:
+    def __init__(self):
+        """Per-target stage timings of an evaluation, see `score_targets`."""
+        self.targets: list[tuple[str, float, StageTimings]] = []
+
+    def add(self, target_id: str, total: float, timings: StageTimings) -> None:
+        """
+        Adds the timings of a target.
+
+        Args:
+            target_id (str): Target id.
+            total (float): Time to score the target, in seconds.
+            timings (StageTimings): Time of each stage of the target.
+        """
+        self.targets.append((target_id, total, timings))
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the timings of the targets.
+
+        Returns:
+            pd.DataFrame: One row per target: `target_id`, `total` and, for each stage,
+                `<stage>` (seconds) and `<stage>_calls`. 0 for stages a target did not run.
+        """
+        stages = list(
+            dict.fromkeys(name for *_, t in self.targets for name in t.seconds)
+        )
+        rows = [
+            {
+                "target_id": target_id,
+                "total": total,
+                **{name: timings.seconds.get(name, 0.0) for name in stages},
+                **{f"{name}_calls": timings.calls.get(name, 0) for name in stages},
+            }
+            for target_id, total, timings in self.targets
+        ]
+        columns = ["target_id", "total", *stages, *(f"{s}_calls" for s in stages)]
+        return pd.DataFrame(rows, columns=columns)
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Returns the timings of each stage, over all targets.
+
+        Returns:
+            pd.DataFrame: One row per stage, by decreasing time: `stage`, `seconds`, `calls`
+                and `share` of the total time of the targets.
+        """
+        frame = self.to_frame()
+        stages = [
+            column for column in frame.columns[2:] if not column.endswith("_calls")
+        ]
+        total = frame["total"].sum()
+        summary = pd.DataFrame(
+            {
+                "stage": stages,
+                "seconds": [frame[name].sum() for name in stages],
+                "calls": [int(frame[f"{name}_calls"].sum()) for name in stages],
+            }
+        )
+        summary["share"] = summary["seconds"] / total if total > 0 else 0.0
+        return summary.sort_values("seconds", ascending=False, ignore_index=True)
+
+    def save(self, path: str | Path) -> None:
+        """
+        Saves the profile: the per-target timings as CSV, or both the per-target and the
+        per-stage timings as JSON (`{"targets": [...], "stages": [...]}`), by extension.
+
+        Args:
+            path (str | Path): `.csv` or `.json` file.
+        """
+        path = Path(path)
+        if path.suffix == ".csv":
+            self.to_frame().to_csv(path, index=False)
+        elif path.suffix == ".json":
+            profile = {
+                "targets": self.to_frame().to_dict(orient="records"),
+                "stages": self.summary().to_dict(orient="records"),
+            }
+            path.write_text(json.dumps(profile, indent=2))
+        else:
+            raise ValueError(
+                f"Unknown profile format {path.suffix}, use .csv or .json."
+            )
+
+
+@contextmanager
+def profile_calls(path: Optional[str | Path]) -> Iterator[None]:
+    """
+    Runs the block under cProfile, and saves the statistics on exit.
+
+    Only the current process is profiled: use a single worker to profile the scoring.
+
+    Args:
+        path (Optional[str | Path]): Statistics file, to read with `pstats` or snakeviz.
+            Nothing is profiled if None.
+    """
+    if path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
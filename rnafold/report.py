@@ -1,12 +1,24 @@
+from pathlib import Path
+from typing import Optional
+
 import pandas as pd
+import typer
+
+from rnafold.config import get_settings
+from rnafold.dataset import read_table
+from rnafold.similarity import SimilarityIndex, max_identities
+
+app = typer.Typer()
 
-from rnafold.config import Settings
+# Identities to a training sequence above which a validation target is reported as leaked
+LEAKAGE_THRESHOLDS = (0.8, 0.95, 1.0)
 
 
 def _load_all_sequences() -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    sequences_train = pd.read_csv(Settings.sequences.train)
-    sequences_val = pd.read_csv(Settings.sequences.val)
-    sequences_test = pd.read_csv(Settings.sequences.test)
+    settings = get_settings()
+    sequences_train = read_table(settings.sequences.train)
+    sequences_val = read_table(settings.sequences.val)
+    sequences_test = read_table(settings.sequences.test)
     return (sequences_train, sequences_val, sequences_test)
 
 
@@ -28,10 +40,51 @@ def _print_sequences(
     print("Val == test:", set2 == set3)
 
 
-def report() -> None:
+def _print_leakage(
+    sequences_train: pd.DataFrame,
+    sequences_val: pd.DataFrame,
+    index: Optional[SimilarityIndex] = None,
+) -> pd.DataFrame:
+    """
+    Prints how many validation targets are close to a training sequence.
+
+    Args:
+        sequences_train (pd.DataFrame): Training sequences.
+        sequences_val (pd.DataFrame): Validation sequences.
+        index (Optional[SimilarityIndex], optional): Index of the training sequences, e.g.
+            loaded from a file. Defaults to an index built from sequences_train.
+
+    Returns:
+        pd.DataFrame: Max identity of each validation target to train, see `max_identities`.
+    """
+    if index is None:
+        index = SimilarityIndex.build(
+            sequences_train["target_id"], sequences_train["sequence"]
+        )
+    identities = max_identities(index, sequences_val)
+
+    print("# LEAKAGE")
+    for threshold in LEAKAGE_THRESHOLDS:
+        leaked = (identities["identity"] >= threshold).sum()
+        print(f"- Val targets with identity >= {threshold:.0%} to train:", leaked)
+    print(f"- Median max identity to train: {identities['identity'].median():.2f}")
+    return identities
+
+
+@app.command()
+def report(
+    index_file: Optional[Path] = typer.Option(
+        None, help="Index of the training sequences, see `rnafold/similarity.py build`."
+    ),
+) -> None:
+    """
+    Prints the sizes of the splits of the config, and the leakage between train and val.
+    """
     sequences_train, sequences_val, sequences_test = _load_all_sequences()
     _print_sequences(sequences_train, sequences_val, sequences_test)
+    index = SimilarityIndex.load(index_file) if index_file is not None else None
+    _print_leakage(sequences_train, sequences_val, index)
 
 
 if __name__ == "__main__":
-    report()
+    app()
@@ -0,0 +1,201 @@
+"""
+Batch statistics of RhoFold outputs.
+
+`analyze` walks an output tree (one `<target_id>/results.npz` per target, as written by
+`predict_rna_structures`) and computes per-target statistics in a parallel, streaming pass:
+each worker holds one distogram at a time. Results are saved in parts as they come, so an
+interrupted pass resumes where it stopped, then merged into a single Parquet table.
+"""
+
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import typer
+
+from rnafold.parallel import imap_ordered
+from rnafold.rhofold.distogram import (
+    MAX_DISTANCE,
+    MIN_DISTANCE,
+    RhoFoldDistogram,
+    contact_probabilities,
+    expected_distances,
+)
+
+app = typer.Typer()
+
+DISTOGRAM_FILE = "results.npz"
+CONTACT_THRESHOLDS = (8.0, 12.0)
+# Pairs closer in sequence are always in contact, they are not counted
+MIN_SEPARATION = 3
+# Probability above which a contact or a base pair is predicted, as in `save_ss2ct`
+PROBABILITY_THRESHOLD = 0.5
+
+
+def find_distograms(root: Path) -> list[Path]:
+    """Returns the distogram files of an output tree, sorted by target_id."""
+    return sorted(Path(root).glob(f"*/{DISTOGRAM_FILE}"), key=lambda f: f.parent.name)
+
+
+def analyze_distogram(
+    file: Path,
+    atom_type: str = "c",
+    thresholds: tuple[float, ...] = CONTACT_THRESHOLDS,
+    min_distance: float = MIN_DISTANCE,
+    max_distance: float = MAX_DISTANCE,
+) -> dict:
+    """
+    Computes the statistics of a RhoFold output.
+
+    Args:
+        file (Path): Distogram file, in the directory of its target.
+        atom_type (str, optional): Distogram used, 'n', 'p' or 'c'. Defaults to "c".
+        thresholds (tuple[float, ...], optional): Contact distances, in Angstroms.
+            Defaults to 8 and 12.
+        min_distance (float, optional): Lower edge of the first bin. Defaults to 2 A.
+        max_distance (float, optional): Upper edge of the last bin. Defaults to 40 A.
+
+    Returns:
+        dict: target_id, sequence_length, mean and min pLDDT, number of base pairs, mean
+            expected distance and number of contacts at each threshold (pairs at least 3
+            residues apart).
+    """
+    with RhoFoldDistogram(file) as distogram:
+        dist = distogram.distances(atom_type)
+        plddt = np.asarray(distogram.plddt, dtype=np.float64)
+        ss_prob_map = np.asarray(distogram.ss_prob_map)
+
+        length = dist.shape[-1]
+        i, j = np.triu_indices(length, k=MIN_SEPARATION)
+        distances = expected_distances(dist, min_distance, max_distance)
+
+        stats = {
+            "target_id": Path(file).parent.name,
+            "sequence_length": length,
+            "mean_plddt": plddt.mean(),
+            "min_plddt": plddt.min(),
+            "base_pairs": int(np.triu(ss_prob_map >= PROBABILITY_THRESHOLD, k=1).sum()),
+            "mean_expected_distance": distances[i, j].mean() if len(i) else np.nan,
+        }
+        for threshold in thresholds:
+            contacts = contact_probabilities(
+                dist, threshold, min_distance, max_distance
+            )
+            stats[f"contacts_{threshold:g}"] = int(
+                (contacts[i, j] >= PROBABILITY_THRESHOLD).sum()
+            )
+    return stats
+
+
+def _analyze(task: tuple) -> dict:
+    file, kwargs = task
+    return analyze_distogram(file, **kwargs)
+
+
+def analyze_outputs(
+    root: Path,
+    destination: Path,
+    workers: int = 1,
+    batch_size: int = 100,
+    **kwargs,
+) -> Path:
+    """
+    Computes the statistics of all RhoFold outputs of a directory, into a Parquet table.
+
+    Statistics are saved every `batch_size` targets in `destination.parts`. Targets already
+    saved there are skipped, so an interrupted pass can be resumed. The parts are merged
+    into `destination` at the end.
+
+    Args:
+        root (Path): Output tree, one `<target_id>/results.npz` per target.
+        destination (Path): Parquet file.
+        workers (int, optional): Number of processes. Defaults to 1.
+        batch_size (int, optional): Number of targets per part. Defaults to 100.
+        **kwargs: Arguments of `analyze_distogram`.
+
+    Returns:
+        Path: The Parquet file.
+    """
+    parts_dir = Path(f"{destination}.parts")
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    parts = sorted(parts_dir.glob("part-*.parquet"))
+    done = {
+        target_id
+        for part in parts
+        for target_id in pq.read_table(part, columns=["target_id"])[
+            "target_id"
+        ].to_pylist()
+    }
+
+    files = [file for file in find_distograms(root) if file.parent.name not in done]
+    results = imap_ordered(
+        _analyze, ((file, kwargs) for file in files), workers=workers
+    )
+    batch: list[dict] = []
+    for stats in results:
+        batch.append(stats)
+        if len(batch) == batch_size:
+            parts.append(_write_part(batch, parts_dir, len(parts)))
+            batch = []
+    if batch:
+        parts.append(_write_part(batch, parts_dir, len(parts)))
+
+    _merge_parts(parts, destination)
+    for part in parts:
+        part.unlink()
+    parts_dir.rmdir()
+    return Path(destination)
+
+
+def _write_part(batch: list[dict], parts_dir: Path, number: int) -> Path:
+    """Writes statistics to a new part, atomically: a part is either complete or absent."""
+    part = parts_dir / f"part-{number:05d}.parquet"
+    partial = part.with_suffix(".tmp")
+    pd.DataFrame(batch).to_parquet(partial, index=False)
+    partial.replace(part)
+    return part
+
+
+def _merge_parts(parts: list[Path], destination: Path) -> None:
+    """Concatenates the parts into one file, a part at a time."""
+    writer: Optional[pq.ParquetWriter] = None
+    for part in parts:
+        table = pq.read_table(part)
+        if writer is None:
+            writer = pq.ParquetWriter(destination, table.schema)
+        writer.write_table(table.cast(writer.schema))
+    if writer is None:
+        pd.DataFrame({"target_id": pd.Series(dtype=str)}).to_parquet(
+            destination, index=False
+        )
+        return
+    writer.close()
+
+
+@app.command()
+def analyze(
+    root: Path,
+    destination: Path,
+    workers: int = 1,
+    atom: str = "c",
+    thresholds: List[float] = list(CONTACT_THRESHOLDS),
+    batch_size: int = 100,
+) -> None:
+    """
+    Computes per-target statistics of a directory of RhoFold outputs, into a Parquet table.
+    """
+    analyze_outputs(
+        root,
+        destination,
+        workers=workers,
+        batch_size=batch_size,
+        atom_type=atom,
+        thresholds=tuple(thresholds),
+    )
+    print(f"Statistics saved at {destination}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,214 @@
+"""
+Benchmark of RhoFold inference against the sequence length.
+
+`benchmark` predicts a length-stratified sample of sequences, records the wall time, CPU time
+and peak RSS of each one, then fits and saves a cost model. `estimate` uses the model to
+predict the runtime and memory of a sequences file, e.g. to check that a test set fits in the
+Kaggle time limit before running it.
+"""
+
+import time
+from enum import StrEnum
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+import typer
+
+from rnafold.dataset import read_table
+from rnafold.parallel import process_pool, terminate
+from rnafold.rhofold.cost import CostModel, estimate_job
+from rnafold.rhofold.main import process_csv
+from rnafold.rhofold.runner import (
+    TIMING_COLUMNS,
+    PredictorFactory,
+    RhoFoldPredictor,
+    _load_predictor,
+    _predict,
+    get_sequence_length,
+    peak_rss,
+    reset_peak_rss,
+)
+
+app = typer.Typer()
+
+# Kaggle notebooks run for 8 hours at most
+TIME_LIMIT_HOURS = 8.0
+
+
+class PredictorName(StrEnum):
+    RHOFOLD = "rhofold"
+    SYNTHETIC = "synthetic"
+
+
+class SyntheticPredictor:
+    def __init__(self, channels: int = 32, **kwargs):
+        """
+        Stands in for RhoFold, to benchmark the pipeline without the model.
+
+        It updates a pair representation of shape (L, L, channels), like the attention layers
+        of RhoFold, so its time and memory grow with the square of the sequence length.
+
+        Args:
+            channels (int, optional): Channels of the pair representation. Defaults to 32.
+        """
+        self.weights = np.random.default_rng(0).standard_normal(
+            (channels, channels), dtype=np.float32
+        )
+
+    def __call__(self, fasta_file: Path, output_dir: Path) -> None:
+        length = get_sequence_length(fasta_file)
+        rng = np.random.default_rng(length)
+        pair = rng.standard_normal((length, length, len(self.weights)), np.float32)
+        pair = np.tanh(pair @ self.weights)
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+        np.save(output_dir / "pair.npy", pair.mean(axis=-1))
+
+
+PREDICTORS: dict[PredictorName, PredictorFactory] = {
+    PredictorName.RHOFOLD: RhoFoldPredictor,
+    PredictorName.SYNTHETIC: SyntheticPredictor,
+}
+
+
+def stratified_sample(
+    sequences: pd.DataFrame, strata: int = 5, per_stratum: int = 2, seed: int = 0
+) -> pd.DataFrame:
+    """
+    Samples sequences evenly across length quantiles.
+
+    Args:
+        sequences (pd.DataFrame): Sequences, with a `sequence` column.
+        strata (int, optional): Number of length quantiles. Defaults to 5.
+        per_stratum (int, optional): Sequences sampled per quantile. Defaults to 2.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: Sampled sequences, shortest first.
+    """
+    shuffled = sequences.sample(frac=1, random_state=seed)
+    lengths = shuffled["sequence"].str.len()
+    quantiles = pd.qcut(lengths.rank(method="first"), q=min(strata, len(shuffled)))
+    sample = shuffled.groupby(quantiles, observed=True).head(per_stratum)
+    return sample.loc[sample["sequence"].str.len().sort_values(kind="stable").index]
+
+
+def run_benchmark(
+    fasta_files: Iterable[Path],
+    output_dir: Path,
+    predictor_factory: PredictorFactory = RhoFoldPredictor,
+    threads: Optional[int] = None,
+    **predictor_kwargs,
+) -> tuple[pd.DataFrame, CostModel]:
+    """
+    Predicts sequences one at a time in a worker process, and fits their costs.
+
+    Like the scheduler workers, the worker loads the predictor once, with its thread
+    settings: they are process-wide, and left unchanged in the current process.
+
+    Args:
+        fasta_files (Iterable[Path]): FASTA files, one sequence each.
+        output_dir (Path): Outputs of `file.fasta` are saved in `output_dir / file`.
+        predictor_factory (PredictorFactory, optional): Builds the model. Defaults to
+            `RhoFoldPredictor`.
+        threads (Optional[int], optional): Thread budget, as for a scheduler worker.
+        **predictor_kwargs: Arguments of the predictor factory.
+
+    Returns:
+        tuple[pd.DataFrame, CostModel]: Timings of each sequence (see `run_batch`), and the
+            cost model fitted on them.
+    """
+    tasks = [(Path(file), Path(output_dir) / Path(file).stem) for file in fasta_files]
+    executor = process_pool(1)
+    try:
+        load_time, load_memory = executor.submit(
+            _load_timed, predictor_factory, predictor_kwargs, threads
+        ).result()
+        results = list(executor.map(_predict, tasks))
+    except BaseException:
+        terminate(executor)
+        raise
+    executor.shutdown()
+
+    timings = pd.DataFrame(results, columns=TIMING_COLUMNS)
+    return timings, CostModel.fit(timings, load_time, load_memory)
+
+
+def _load_timed(
+    predictor_factory: PredictorFactory,
+    predictor_kwargs: dict,
+    threads: Optional[int] = None,
+) -> tuple[float, int]:
+    """Loads the predictor of a worker, and returns its load time and peak memory."""
+    reset_peak_rss()
+    start_time = time.time()
+    _load_predictor(predictor_factory, predictor_kwargs, threads)
+    return time.time() - start_time, peak_rss()
+
+
+@app.command()
+def benchmark(
+    sequences: Path,
+    output_dir: Path = Path("benchmark"),
+    model: Path = Path("cost_model.json"),
+    predictor: PredictorName = PredictorName.RHOFOLD,
+    strata: int = 5,
+    per_stratum: int = 2,
+    threads: Optional[int] = None,
+    seed: int = 0,
+) -> None:
+    """
+    Benchmarks inference on a length-stratified sample of sequences, and saves a cost model.
+    """
+    table = read_table(sequences, columns=["target_id", "sequence"])
+    sample = stratified_sample(table, strata, per_stratum, seed)
+    process_csv(sample, output_dir / "fastas")
+
+    fasta_files = [
+        output_dir / "fastas" / f"{target}.fasta" for target in sample["target_id"]
+    ]
+    timings, cost_model = run_benchmark(
+        fasta_files, output_dir / "outputs", PREDICTORS[predictor], threads
+    )
+    timings.to_csv(output_dir / "timings.csv", index=False)
+    cost_model.save(model)
+
+    print(timings.to_string(index=False))
+    print(f"Runtime: {cost_model.runtime.a:.3g} * L^{cost_model.runtime.k:.2f} seconds")
+    if cost_model.memory is not None:
+        print(f"Memory: {cost_model.memory.a:.3g} * L^{cost_model.memory.k:.2f} bytes")
+    print(f"Cost model saved at {model}")
+
+
+@app.command()
+def estimate(
+    sequences: Path,
+    model: Path = Path("cost_model.json"),
+    workers: int = 1,
+    time_limit: float = TIME_LIMIT_HOURS,
+) -> None:
+    """
+    Estimates the runtime and memory of predicting a sequences file, with a saved cost model.
+
+    Exits with code 1 if the estimated wall time exceeds the time limit (hours).
+    """
+    cost_model = CostModel.load(model)
+    lengths = read_table(sequences, columns=["sequence"])["sequence"].str.len()
+    job = estimate_job(lengths.to_numpy(), cost_model, workers)
+
+    print(f"Sequences: {job['sequences']} (longest: {job['longest']} nt)")
+    print(f"Compute time: {job['compute_time'] / 3600:.2f} h")
+    print(f"Wall time with {workers} workers: {job['wall_time'] / 3600:.2f} h")
+    if "worker_memory" in job:
+        print(f"Peak memory per worker: {job['worker_memory'] / 2**30:.2f} GiB")
+        print(f"Peak memory of all workers: {job['total_memory'] / 2**30:.2f} GiB")
+
+    if job["wall_time"] > time_limit * 3600:
+        print(f"Estimated wall time exceeds the {time_limit:g} h limit.")
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
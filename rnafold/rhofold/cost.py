@@ -0,0 +1,182 @@
+"""Runtime and memory models of RhoFold inference, as power laws of the sequence length."""
+
+import json
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class PowerLaw:
+    """y = a * L^k, L being the sequence length."""
+
+    a: float
+    k: float
+
+    def __call__(self, lengths) -> np.ndarray:
+        return self.a * np.power(np.asarray(lengths, dtype=np.float64), self.k)
+
+    @classmethod
+    def fit(cls, lengths, values) -> "PowerLaw":
+        """
+        Fits a power law by least squares in log-log space.
+
+        Args:
+            lengths (array-like): Sequence lengths.
+            values (array-like): Measures, e.g. execution times. Non-positive values are ignored.
+
+        Returns:
+            PowerLaw: The fitted law.
+        """
+        lengths = np.asarray(lengths, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        keep = (lengths > 0) & (values > 0)
+        if np.unique(lengths[keep]).size < 2:
+            raise ValueError(
+                "At least 2 distinct lengths are needed to fit a power law."
+            )
+        k, log_a = np.polyfit(np.log(lengths[keep]), np.log(values[keep]), deg=1)
+        return cls(a=float(np.exp(log_a)), k=float(k))
+
+
+# Attention over residue pairs makes RhoFold roughly quadratic in the sequence length
+DEFAULT_RUNTIME = PowerLaw(a=1.0, k=2.0)
+
+
+def fit_runtime(timings: pd.DataFrame) -> PowerLaw:
+    """
+    Fits the runtime of inference from the timings of `predict_rna_structures`.
+
+    Args:
+        timings (pd.DataFrame): `sequence_length` and `execution_time` (seconds) columns.
+
+    Returns:
+        PowerLaw: Seconds, as a function of the sequence length.
+    """
+    return PowerLaw.fit(timings["sequence_length"], timings["execution_time"])
+
+
+@dataclass
+class CostModel:
+    """
+    Cost of predicting sequences with a worker that loaded the model once.
+
+    runtime: seconds of a sequence. memory: peak RSS of a sequence (bytes) beyond the memory
+    of the loaded model, load_memory.
+    """
+
+    runtime: PowerLaw = field(default_factory=lambda: DEFAULT_RUNTIME)
+    memory: Optional[PowerLaw] = None
+    load_time: float = 0.0
+    load_memory: float = 0.0
+
+    def runtime_of(self, lengths) -> np.ndarray:
+        """Estimated seconds of each sequence length."""
+        return self.runtime(lengths)
+
+    def memory_of(self, lengths) -> np.ndarray:
+        """Estimated peak memory (bytes) of a worker predicting each sequence length."""
+        if self.memory is None:
+            raise ValueError("The cost model has no memory model.")
+        return self.load_memory + self.memory(lengths)
+
+    @classmethod
+    def fit(
+        cls,
+        timings: pd.DataFrame,
+        load_time: float = 0.0,
+        load_memory: float = 0.0,
+    ) -> "CostModel":
+        """
+        Fits the runtime, and the memory if `peak_rss` was measured.
+
+        Args:
+            timings (pd.DataFrame): `sequence_length`, `execution_time` and optional `peak_rss`
+                columns, as returned by `run_batch`.
+            load_time (float, optional): Seconds to load the model. Defaults to 0.
+            load_memory (float, optional): RSS of the process after the model load, in bytes.
+                Defaults to 0, i.e. memory of sequences including the model.
+
+        Returns:
+            CostModel: The fitted model.
+        """
+        memory = None
+        if "peak_rss" in timings.columns and timings["peak_rss"].notna().all():
+            try:
+                memory = PowerLaw.fit(
+                    timings["sequence_length"], timings["peak_rss"] - load_memory
+                )
+            except ValueError:
+                # Sequences too short to use memory beyond the model: no memory model
+                pass
+        return cls(
+            runtime=fit_runtime(timings),
+            memory=memory,
+            load_time=load_time,
+            load_memory=load_memory,
+        )
+
+    def save(self, path: str | Path) -> None:
+        Path(path).write_text(json.dumps(asdict(self), indent=2))
+
+    @classmethod
+    def load(cls, path: str | Path) -> "CostModel":
+        params = json.loads(Path(path).read_text())
+        memory = params.pop("memory")
+        return cls(
+            runtime=PowerLaw(**params.pop("runtime")),
+            memory=PowerLaw(**memory) if memory is not None else None,
+            **params,
+        )
+
+
+def estimate_makespan(runtimes: np.ndarray, workers: int) -> float:
+    """
+    Estimates the wall time of running tasks longest-first on a pool of workers.
+
+    Args:
+        runtimes (np.ndarray): Seconds of each task.
+        workers (int): Number of workers.
+
+    Returns:
+        float: Seconds until the last task ends.
+    """
+    loads = np.zeros(workers)
+    for runtime in np.sort(runtimes)[::-1]:
+        loads[np.argmin(loads)] += runtime
+    return float(loads.max())
+
+
+def estimate_job(lengths: np.ndarray, cost_model: CostModel, workers: int = 1) -> dict:
+    """
+    Estimates the runtime and memory of predicting sequences, before launching the job.
+
+    The cost model must have been fitted with the thread budget of the workers.
+
+    Args:
+        lengths (np.ndarray): Sequence lengths.
+        cost_model (CostModel): Fitted cost model.
+        workers (int, optional): Number of workers, scheduled longest-first. Defaults to 1.
+
+    Returns:
+        dict: Number of sequences, longest sequence, total compute (seconds), wall time
+            (seconds, model loads included) and, with a memory model, the peak memory of a
+            worker and of all workers (bytes).
+    """
+    lengths = np.asarray(lengths)
+    runtimes = cost_model.runtime_of(lengths)
+    estimate = {
+        "sequences": len(lengths),
+        "longest": int(lengths.max()) if len(lengths) else 0,
+        "compute_time": float(runtimes.sum()) + workers * cost_model.load_time,
+        "wall_time": cost_model.load_time + estimate_makespan(runtimes, workers),
+    }
+    if cost_model.memory is not None and len(lengths):
+        # Worst case: the longest sequences all run at the same time
+        memories = np.sort(cost_model.memory_of(lengths))[::-1]
+        estimate["worker_memory"] = float(memories[0])
+        estimate["total_memory"] = float(memories[:workers].sum())
+    return estimate
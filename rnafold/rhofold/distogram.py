@@ -1,10 +1,12 @@
+import struct
+import zipfile
 from enum import StrEnum
+from functools import cached_property
 from pathlib import Path
+from typing import Optional
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import seaborn as sns
 
 
 class AtomType(StrEnum):
@@ -13,53 +15,94 @@ class AtomType(StrEnum):
     C = "c"
 
 
+# Distance range of the distogram bins, in Angstroms. Bins are of equal width over this range,
+# and must match the distogram heads of the model
+MIN_DISTANCE = 2.0
+MAX_DISTANCE = 40.0
+
+
 class RhoFoldDistogram:
     _EXPECTED_FIELDS = {"dist_n", "dist_p", "dist_c", "ss_prob_map", "plddt"}
 
     def __init__(self, file_path: str | Path):
-        """Load an npz file containing RNA distogram data."""
-        _data = np.load(file_path)
-        self.files = _data.files
-        self.summary = self._summarize_data(_data)
-
-        # Extract fields
-        self.dist_n: np.ndarray = _data["dist_n"]
-        self.dist_p: np.ndarray = _data["dist_p"]
-        self.dist_c: np.ndarray = _data["dist_c"]
-        self.ss_prob_map: np.ndarray = _data["ss_prob_map"]
-        self.plddt: np.ndarray = _data["plddt"]
-
-    def _summarize_data(self, data) -> pd.DataFrame:
         """
-        Print basic statistics for the data.
-
-        Args:
-            X (np.lib.npyio.NpzFile): Opened distogram npz file
+        Open an npz file containing RNA distogram data.
 
-        Returns:
-            pd.DataFrame: Description of the distrogram
+        Only the archive directory is read here. Fields are loaded on first access:
+        uncompressed members (`np.savez`) are memory-mapped, compressed ones are decompressed.
         """
-        summary = {}
-        for key in data.files:
-            summary[key] = {
-                "shape": data[key].shape,
-                "mean": np.mean(data[key]),
-                "std": np.std(data[key]),
-                "min": np.min(data[key]),
-                "max": np.max(data[key]),
-            }
-        return pd.DataFrame(summary).T
+        self.file_path = Path(file_path)
+        self._data = np.load(self.file_path)
+        self.files = self._data.files
+        self._arrays: dict[str, np.ndarray] = {}
 
-    def plot_distance_distribution(self, atom_type: str):
+    def __enter__(self) -> "RhoFoldDistogram":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the npz file. Fields already loaded stay available."""
+        self._data.close()
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        if key not in self._arrays:
+            array = _memmap_npz_member(self.file_path, self._data.zip, key)
+            self._arrays[key] = array if array is not None else self._data[key]
+        return self._arrays[key]
+
+    @property
+    def dist_n(self) -> np.ndarray:
+        return self["dist_n"]
+
+    @property
+    def dist_p(self) -> np.ndarray:
+        return self["dist_p"]
+
+    @property
+    def dist_c(self) -> np.ndarray:
+        return self["dist_c"]
+
+    @property
+    def ss_prob_map(self) -> np.ndarray:
+        return self["ss_prob_map"]
+
+    @property
+    def plddt(self) -> np.ndarray:
+        return self["plddt"]
+
+    def distances(self, atom_type: str) -> np.ndarray:
+        """Distance probabilities of an atom type ('n', 'p' or 'c'), of shape (bins, L, L)."""
         try:
             atom_enum = AtomType(atom_type.lower())
         except ValueError:
             raise ValueError(
                 f"Invalid atom type: {atom_type}. Choose from 'n', 'p', or 'c'."
             )
+        return self[f"dist_{atom_enum.value}"]
+
+    def expected_distances(self, atom_type: str = "c") -> np.ndarray:
+        """Expected distance between each pair of residues, of shape (L, L)."""
+        return expected_distances(self.distances(atom_type))
+
+    def contact_map(self, atom_type: str = "c", threshold: float = 8.0) -> np.ndarray:
+        """Probability that each pair of residues is closer than threshold, of shape (L, L)."""
+        return contact_probabilities(self.distances(atom_type), threshold)
+
+    @cached_property
+    def summary(self) -> pd.DataFrame:
+        """
+        Basic statistics of each field, computed on first access.
 
-        dist_matrix = getattr(self, f"dist_{atom_enum.value}")
-        plot_distance_distribution(dist_matrix, atom_enum.value)
+        Returns:
+            pd.DataFrame: Shape, mean, std, min and max of each field.
+        """
+        return pd.DataFrame({key: summarize_array(self[key]) for key in self.files}).T
+
+    def plot_distance_distribution(self, atom_type: str):
+        dist_matrix = self.distances(atom_type)
+        plot_distance_distribution(dist_matrix, atom_type.lower())
 
     def plot_secondary_structure(self):
         plot_secondary_structure(self.ss_prob_map)
@@ -68,8 +111,150 @@ class RhoFoldDistogram:
         plot_confidence(self.plddt)
 
 
+def bin_edges(
+    n_bins: int,
+    min_distance: float = MIN_DISTANCE,
+    max_distance: float = MAX_DISTANCE,
+) -> np.ndarray:
+    """Edges of n_bins equal-width distance bins, of shape (n_bins + 1,)."""
+    return np.linspace(min_distance, max_distance, n_bins + 1)
+
+
+def expected_distances(
+    dist: np.ndarray,
+    min_distance: float = MIN_DISTANCE,
+    max_distance: float = MAX_DISTANCE,
+) -> np.ndarray:
+    """
+    Computes the expected distance of each pair of residues from a distogram.
+
+    Args:
+        dist (np.ndarray): Distance probabilities, of shape (bins, L, L).
+        min_distance (float, optional): Lower edge of the first bin. Defaults to 2 A.
+        max_distance (float, optional): Upper edge of the last bin. Defaults to 40 A.
+
+    Returns:
+        np.ndarray: Expected distances, of shape (L, L).
+    """
+    edges = bin_edges(len(dist), min_distance, max_distance)
+    centers = (edges[:-1] + edges[1:]) / 2
+    weights = np.tensordot(centers, dist, axes=1)
+    return weights / np.maximum(dist.sum(axis=0, dtype=np.float64), 1e-12)
+
+
+def contact_probabilities(
+    dist: np.ndarray,
+    threshold: float,
+    min_distance: float = MIN_DISTANCE,
+    max_distance: float = MAX_DISTANCE,
+) -> np.ndarray:
+    """
+    Computes the probability of each pair of residues to be closer than a threshold.
+
+    Bins count if their upper edge is at most the threshold.
+
+    Args:
+        dist (np.ndarray): Distance probabilities, of shape (bins, L, L).
+        threshold (float): Contact distance, in Angstroms.
+        min_distance (float, optional): Lower edge of the first bin. Defaults to 2 A.
+        max_distance (float, optional): Upper edge of the last bin. Defaults to 40 A.
+
+    Returns:
+        np.ndarray: Contact probabilities, of shape (L, L).
+    """
+    edges = bin_edges(len(dist), min_distance, max_distance)
+    n_close = int(np.searchsorted(edges[1:], threshold, side="right"))
+    close = dist[:n_close].sum(axis=0, dtype=np.float64)
+    return close / np.maximum(dist.sum(axis=0, dtype=np.float64), 1e-12)
+
+
+def summarize_array(array: np.ndarray, chunk_bytes: int = 64 * 2**20) -> dict:
+    """
+    Computes the shape, mean, std, min and max of an array in a single pass.
+
+    The array is read by chunks along its first axis, so memory-mapped arrays are not loaded
+    at once. Chunk statistics are merged with the parallel variance formula.
+
+    Args:
+        array (np.ndarray): Array, possibly memory-mapped.
+        chunk_bytes (int, optional): Approximate size of a chunk. Defaults to 64 MiB.
+
+    Returns:
+        dict: shape, mean, std, min and max.
+    """
+    if array.ndim == 0 or array.size == 0:
+        values = np.asarray(array, dtype=np.float64)
+        return {
+            "shape": array.shape,
+            "mean": np.mean(values),
+            "std": np.std(values),
+            "min": np.min(values) if values.size else np.nan,
+            "max": np.max(values) if values.size else np.nan,
+        }
+
+    rows = max(1, chunk_bytes // max(1, array[0].nbytes))
+    count, mean, m2 = 0, 0.0, 0.0
+    low, high = np.inf, -np.inf
+    for start in range(0, len(array), rows):
+        chunk = np.asarray(array[start : start + rows], dtype=np.float64)
+        chunk_mean = chunk.mean()
+        chunk_m2 = np.square(chunk - chunk_mean).sum()
+        delta = chunk_mean - mean
+        total = count + chunk.size
+        mean += delta * chunk.size / total
+        m2 += chunk_m2 + delta**2 * count * chunk.size / total
+        count = total
+        low, high = min(low, chunk.min()), max(high, chunk.max())
+
+    return {
+        "shape": array.shape,
+        "mean": mean,
+        "std": np.sqrt(m2 / count),
+        "min": low,
+        "max": high,
+    }
+
+
+def _memmap_npz_member(
+    path: Path, archive: zipfile.ZipFile, key: str
+) -> Optional[np.ndarray]:
+    """Memory-maps an uncompressed npz member, or returns None if it can not be."""
+    info = archive.getinfo(f"{key}.npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+
+    with open(path, "rb") as file:
+        # The data follows the local file header, whose name and extra field lengths can
+        # differ from the central directory ones
+        file.seek(info.header_offset)
+        local_header = file.read(30)
+        name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+        file.seek(info.header_offset + 30 + name_length + extra_length)
+
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+        offset = file.tell()
+
+    if dtype.hasobject or 0 in shape:
+        return None
+    return np.memmap(
+        path,
+        dtype=dtype,
+        mode="r",
+        offset=offset,
+        shape=shape,
+        order="F" if fortran_order else "C",
+    )
+
+
 def plot_distance_distribution(dist_matrix: np.ndarray, atom_type: str = ""):
     """Plot the pairwise distance distribution for a given atom type."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     mean_dist = np.max(dist_matrix, axis=0)
 
     plt.figure(figsize=(8, 6))
@@ -84,6 +269,9 @@ def plot_distance_distribution(dist_matrix: np.ndarray, atom_type: str = ""):
 
 def plot_secondary_structure(ss_prob_map: np.ndarray):
     """Visualize the secondary structure probability map."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     plt.figure(figsize=(8, 6))
     sns.heatmap(ss_prob_map, cmap="viridis", square=True)
     plt.title("Secondary Structure Probability Map")
@@ -94,6 +282,8 @@ def plot_secondary_structure(ss_prob_map: np.ndarray):
 
 def plot_confidence(plddt: np.ndarray):
     """Plot the per-residue confidence scores."""
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(8, 4))
     plt.plot(plddt.flatten(), marker="o", linestyle="")
     plt.title("Per-Residue Confidence Scores")
@@ -1,27 +1,29 @@
-import os
 import subprocess  # nosec
-import time
 from pathlib import Path
+from typing import Optional
 
 import pandas as pd
 
+from rnafold.fasta import write_fasta, write_fasta_files
+from rnafold.rhofold.cost import CostModel
+from rnafold.rhofold.runner import (
+    RHOFOLD_CKPT,
+    PredictorFactory,
+    RhoFoldPredictor,
+    get_sequence_length,  # noqa: F401
+)
+from rnafold.rhofold.scheduler import run_scheduled
+
 
 def generate_fasta(file_path, sequence_id, sequence):
-    with open(file_path, "w") as fasta_file:
-        fasta_file.write(f">{sequence_id}\n")
-        for i in range(0, len(sequence), 80):  # Wrap lines at 80 chars
-            fasta_file.write(sequence[i : i + 80] + "\n")
-    print(f"FASTA file saved at {file_path}")
+    write_fasta([(sequence_id, sequence)], file_path)
 
 
 def process_csv(fastas, output_folder):
-    os.makedirs(output_folder, exist_ok=True)
-
-    for index, row in fastas.iterrows():
-        sequence_id = row["target_id"]
-        sequence = row["sequence"]
-        fasta_file_path = os.path.join(output_folder, f"{sequence_id}.fasta")
-        generate_fasta(fasta_file_path, sequence_id, sequence)
+    """Writes a FASTA file per sequence of a table (target_id, sequence), as RhoFold expects."""
+    records = zip(fastas["target_id"], fastas["sequence"])
+    count = write_fasta_files(records, output_folder)
+    print(f"{count} FASTA files saved in {output_folder}")
 
 
 def predict_rna_structure(
@@ -30,7 +32,7 @@ def predict_rna_structure(
     relax_steps: int = 1,
     single_seq_pred: bool = True,
     device: str = "cpu",
-    ckpt: str | Path = "../models/RhoFold_pretrained.pt",
+    ckpt: str | Path = RHOFOLD_CKPT,
 ):
     """
     Runs the RhoFold inference script with the given parameters.
@@ -63,35 +65,55 @@ def predict_rna_structure(
     subprocess.run(cmd, check=True)  # nosec
 
 
-def get_sequence_length(fasta_file: Path) -> int:
-    with open(fasta_file, "r") as f:
-        lines = f.readlines()
-        sequence = "".join(line.strip() for line in lines if not line.startswith(">"))
-    return len(sequence)
-
-
 def predict_rna_structures(
     fasta_dir: Path,
     output_dir: Path,
+    workers: int = 1,
+    threads_per_worker: Optional[int] = None,
+    memory_limit: Optional[float] = None,
+    cost_model: Optional[CostModel] = None,
+    resume: bool = True,
+    predictor_factory: PredictorFactory = RhoFoldPredictor,
     **rhofold_kwargs,
 ) -> pd.DataFrame:
-    results = []
-
-    for fasta_file in Path(fasta_dir).glob("*.fasta"):
-        start_time = time.time()
-
-        seq_output_dir = output_dir / fasta_file.stem
-        predict_rna_structure(fasta_file, seq_output_dir, **rhofold_kwargs)
-        end_time = time.time()
-
-        sequence_length = get_sequence_length(fasta_file)
-
-        results.append(
-            {
-                "target_id": fasta_file.stem,
-                "execution_time": round(end_time - start_time, 3),
-                "sequence_length": sequence_length,
-            }
-        )
-
-    return pd.DataFrame(results)
+    """
+    Predicts the structures of all FASTA files of a directory, longest sequences first.
+
+    RhoFold is loaded once per worker. Sequences whose outputs are complete are skipped,
+    so an interrupted run can be resumed.
+
+    Args:
+        fasta_dir (Path): Directory of FASTA files, one sequence each.
+        output_dir (Path): Outputs of `file.fasta` are saved in `output_dir / file`.
+        workers (int, optional): Number of inference processes. Defaults to 1.
+        threads_per_worker (Optional[int], optional): Threads of each worker. Defaults to the
+            torch default.
+        memory_limit (Optional[float], optional): Memory ceiling of the running sequences, in
+            bytes. Defaults to no ceiling.
+        cost_model (Optional[CostModel], optional): Runtime and memory estimates, e.g. from
+            `rnafold.rhofold.benchmark`. Defaults to a fit of the completed sequences.
+        resume (bool, optional): Whether to skip completed sequences. Defaults to True.
+        predictor_factory (PredictorFactory, optional): Builds the model of a worker.
+            Defaults to `RhoFoldPredictor`.
+        **rhofold_kwargs: Arguments of the predictor (relax_steps, single_seq_pred, device, ckpt).
+
+    Returns:
+        pd.DataFrame: target_id, execution_time, sequence_length, cpu_time and peak_rss of
+            each sequence.
+    """
+    return run_scheduled(
+        Path(fasta_dir).glob("*.fasta"),
+        output_dir,
+        workers=workers,
+        threads_per_worker=threads_per_worker,
+        memory_limit=memory_limit,
+        runtime=cost_model.runtime_of if cost_model is not None else None,
+        memory=(
+            cost_model.memory_of
+            if cost_model is not None and cost_model.memory is not None
+            else None
+        ),
+        resume=resume,
+        predictor_factory=predictor_factory,
+        **rhofold_kwargs,
+    )
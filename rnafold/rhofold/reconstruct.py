@@ -0,0 +1,321 @@
+"""
+3D coordinates from RhoFold distograms.
+
+A distogram gives, for each pair of residues, probabilities over distance bins. Coordinates
+are reconstructed in three steps:
+
+1. Distance matrix: expected distance of each pair (or distances sampled from the bins).
+2. Classical multidimensional scaling (MDS): coordinates whose distances best match the
+   matrix, from the top 3 eigenvectors of the double-centered squared distances.
+3. Refinement: stress majorization (preconditioned gradient steps), pairs weighted by
+   their confidence, distances beyond the range being lower bounds only.
+
+Distances beyond the range of the distogram are first completed with shortest paths through
+the known ones, so that MDS starts from an unfolded chain.
+
+Distances do not tell a structure from its mirror image, so the mirror image is one of the
+candidates, and the others come from sampled distance matrices. The C4' distogram is used
+for the C1' atoms, about 2.5 A apart.
+"""
+
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import typer
+
+from rnafold.dataset import read_table
+from rnafold.parallel import imap_ordered
+from rnafold.rhofold.analytics import find_distograms
+from rnafold.rhofold.distogram import (
+    MAX_DISTANCE,
+    MIN_DISTANCE,
+    RhoFoldDistogram,
+    bin_edges,
+)
+from rnafold.submit import NUM_PREDICTIONS, write_submission
+
+app = typer.Typer()
+
+REFINEMENT_STEPS = 100
+# Temperature of the distance sampling of the diverse candidates
+SAMPLING_TEMPERATURE = 1.0
+SAMPLING_ROWS = 128
+
+
+def distance_weights(dist: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """
+    Confidence of the distance of each pair: its inverse variance.
+
+    Args:
+        dist (np.ndarray): Distance probabilities, of shape (bins, L, L).
+        centers (np.ndarray): Bin centers, of shape (bins,).
+
+    Returns:
+        np.ndarray: Weights of shape (L, L), zero on the diagonal.
+    """
+    probabilities = dist / np.maximum(dist.sum(axis=0), 1e-12)
+    mean = np.tensordot(centers, probabilities, axes=1)
+    variance = np.tensordot(centers**2, probabilities, axes=1) - mean**2
+    weights = 1 / (np.maximum(variance, 0) + 1)
+    weights = (weights + weights.T) / 2
+    np.fill_diagonal(weights, 0)
+    return weights
+
+
+def sample_distances(
+    dist: np.ndarray,
+    centers: np.ndarray,
+    rng: np.random.Generator,
+    temperature: float = SAMPLING_TEMPERATURE,
+) -> np.ndarray:
+    """
+    Samples a symmetric distance matrix from a distogram (Gumbel-max over the bins).
+
+    Args:
+        dist (np.ndarray): Distance probabilities, of shape (bins, L, L).
+        centers (np.ndarray): Bin centers, of shape (bins,).
+        rng (np.random.Generator): Random generator.
+        temperature (float, optional): Higher values flatten the probabilities. Defaults to 1.
+
+    Returns:
+        np.ndarray: Distances of shape (L, L).
+    """
+    length = dist.shape[-1]
+    bins = np.empty((length, length), dtype=np.int64)
+    # By blocks of rows, to bound the memory of the noise
+    for start in range(0, length, SAMPLING_ROWS):
+        block = dist[:, start : start + SAMPLING_ROWS]
+        logits = np.log(np.maximum(block, 1e-12)) / temperature
+        noise = rng.gumbel(size=block.shape).astype(np.float32)
+        bins[start : start + SAMPLING_ROWS] = np.argmax(logits + noise, axis=0)
+    distances = np.triu(centers[bins], k=1)
+    return distances + distances.T
+
+
+def classical_mds(distances: np.ndarray, dims: int = 3) -> np.ndarray:
+    """
+    Embeds a distance matrix with classical multidimensional scaling.
+
+    Args:
+        distances (np.ndarray): Distances of shape (L, L).
+        dims (int, optional): Embedding dimension. Defaults to 3.
+
+    Returns:
+        np.ndarray: Centered coordinates of shape (L, dims).
+    """
+    squared = np.square(distances)
+    # Double centering: -1/2 J D^2 J, J being the centering matrix
+    gram = -0.5 * (
+        squared - squared.mean(axis=0) - squared.mean(axis=1)[:, None] + squared.mean()
+    )
+    eigenvalues, eigenvectors = np.linalg.eigh(gram)
+    top = np.argsort(eigenvalues)[::-1][:dims]
+    coords = eigenvectors[:, top] * np.sqrt(np.maximum(eigenvalues[top], 0))
+    if coords.shape[1] < dims:
+        coords = np.pad(coords, ((0, 0), (0, dims - coords.shape[1])))
+    return coords
+
+
+def shortest_paths(distances: np.ndarray, known: np.ndarray) -> np.ndarray:
+    """
+    Completes a distance matrix with shortest paths through the known distances.
+
+    Distances beyond the distogram range are unknown. Shortest paths over-estimate them,
+    but much less than the range does, which gives MDS a better starting point.
+
+    Args:
+        distances (np.ndarray): Distances of shape (L, L).
+        known (np.ndarray): Pairs whose distance is known, of shape (L, L).
+
+    Returns:
+        np.ndarray: Completed distances, inf between disconnected residues.
+    """
+    paths = np.where(known, distances, np.inf)
+    np.fill_diagonal(paths, 0)
+    # Floyd-Warshall, vectorized over the pairs
+    for k in range(len(paths)):
+        np.minimum(paths, paths[:, k, None] + paths[None, k], out=paths)
+    return paths
+
+
+def initial_coordinates(
+    distances: np.ndarray, lower_bounds: np.ndarray, completed: np.ndarray
+) -> np.ndarray:
+    """MDS of distances, the lower bounds being replaced by completed distances."""
+    distances = np.where(lower_bounds, np.maximum(distances, completed), distances)
+    finite = np.isfinite(distances)
+    # Residues disconnected from the others are put at the range of the distogram
+    distances = np.where(finite, distances, distances[finite].max(initial=0))
+    return classical_mds(distances)
+
+
+def stress(coords: np.ndarray, distances: np.ndarray, weights: np.ndarray) -> float:
+    """Weighted squared error between the distances of coordinates and target distances."""
+    actual = np.linalg.norm(coords[:, None] - coords[None], axis=-1)
+    return float((weights * np.square(actual - distances)).sum() / 2)
+
+
+def refine(
+    coords: np.ndarray,
+    distances: np.ndarray,
+    weights: np.ndarray,
+    steps: int = REFINEMENT_STEPS,
+    lower_bounds: Optional[np.ndarray] = None,
+    preconditioner: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Refines coordinates by minimizing the weighted stress, with stress majorization (SMACOF).
+
+    Each step is a gradient step preconditioned by the pseudo-inverse of the weights
+    Laplacian (the Guttman transform), which never increases the stress.
+
+    Args:
+        coords (np.ndarray): Initial coordinates, of shape (L, 3).
+        distances (np.ndarray): Target distances, of shape (L, L).
+        weights (np.ndarray): Symmetric pair weights, zero on the diagonal, of shape (L, L).
+        steps (int, optional): Number of steps. Defaults to 100.
+        lower_bounds (Optional[np.ndarray], optional): Pairs whose target distance is only a
+            lower bound, i.e. not penalized when further apart, of shape (L, L).
+        preconditioner (Optional[np.ndarray], optional): Pseudo-inverse of the weights
+            Laplacian, to reuse it across candidates. Defaults to computing it.
+
+    Returns:
+        np.ndarray: Refined and centered coordinates, of shape (L, 3).
+    """
+    if preconditioner is None:
+        preconditioner = laplacian_pseudo_inverse(weights)
+    coords = coords.copy()
+    for _ in range(steps):
+        actual = np.linalg.norm(coords[:, None] - coords[None], axis=-1)
+        targets = distances
+        if lower_bounds is not None:
+            targets = np.where(lower_bounds & (actual > distances), actual, distances)
+        ratios = -weights * targets / np.maximum(actual, 1e-6)
+        np.fill_diagonal(ratios, 0)
+        np.fill_diagonal(ratios, -ratios.sum(axis=1))
+        coords = preconditioner @ (ratios @ coords)
+    return coords - coords.mean(axis=0)
+
+
+def laplacian_pseudo_inverse(weights: np.ndarray) -> np.ndarray:
+    """Pseudo-inverse of the Laplacian of the pair weights, diag(W 1) - W."""
+    laplacian = np.diag(weights.sum(axis=1)) - weights
+    return np.linalg.pinv(laplacian, hermitian=True)
+
+
+def reconstruct(
+    dist: np.ndarray,
+    n_candidates: int = NUM_PREDICTIONS,
+    steps: int = REFINEMENT_STEPS,
+    temperature: float = SAMPLING_TEMPERATURE,
+    seed: int = 0,
+    min_distance: float = MIN_DISTANCE,
+    max_distance: float = MAX_DISTANCE,
+) -> np.ndarray:
+    """
+    Reconstructs candidate structures from a distogram.
+
+    Candidates are, in order: the expected distances embedded and refined, its mirror image,
+    then embeddings of distance matrices sampled from the distogram.
+
+    Args:
+        dist (np.ndarray): Distance probabilities, of shape (bins, L, L).
+        n_candidates (int, optional): Number of candidates. Defaults to 5.
+        steps (int, optional): Refinement steps of each candidate. Defaults to 100.
+        temperature (float, optional): Temperature of the distance sampling. Defaults to 1.
+        seed (int, optional): Random seed of the sampling. Defaults to 0.
+        min_distance (float, optional): Lower edge of the first bin. Defaults to 2 A.
+        max_distance (float, optional): Upper edge of the last bin. Defaults to 40 A.
+
+    Returns:
+        np.ndarray: Coordinates of shape (n_candidates, L, 3).
+    """
+    dist = np.asarray(dist, dtype=np.float32)
+    edges = bin_edges(len(dist), min_distance, max_distance)
+    centers = (edges[:-1] + edges[1:]) / 2
+    weights = distance_weights(dist, centers)
+    preconditioner = laplacian_pseudo_inverse(weights)
+    rng = np.random.default_rng(seed)
+
+    probabilities = dist / np.maximum(dist.sum(axis=0), 1e-12)
+    expected = np.tensordot(centers, probabilities, axes=1)
+    expected = (expected + expected.T) / 2
+    np.fill_diagonal(expected, 0)
+    # The last bin gathers all the distances beyond the range: they are lower bounds
+    beyond = probabilities[-1] >= 0.5
+    beyond |= beyond.T
+    completed = shortest_paths(expected, ~beyond)
+
+    candidates: list[np.ndarray] = []
+    while len(candidates) < n_candidates:
+        if not candidates:
+            distances, lower_bounds = expected, beyond
+        else:
+            distances = sample_distances(dist, centers, rng, temperature)
+            lower_bounds = distances >= centers[-1]
+        coords = initial_coordinates(distances, lower_bounds, completed)
+        coords = refine(coords, distances, weights, steps, lower_bounds, preconditioner)
+        candidates.append(coords)
+        if len(candidates) == 1 and n_candidates > 1:
+            candidates.append(coords * [1, 1, -1])
+    return np.stack(candidates)
+
+
+def reconstruct_file(
+    file: Path, atom_type: str = "c", n_candidates: int = NUM_PREDICTIONS, **kwargs
+) -> np.ndarray:
+    """
+    Reconstructs candidate structures from a RhoFold output.
+
+    Args:
+        file (Path): Distogram file.
+        atom_type (str, optional): Distogram used, 'n', 'p' or 'c'. Defaults to "c".
+        n_candidates (int, optional): Number of candidates. Defaults to 5.
+        **kwargs: Arguments of `reconstruct`.
+
+    Returns:
+        np.ndarray: Coordinates of shape (n_candidates, L, 3).
+    """
+    with RhoFoldDistogram(file) as distogram:
+        return reconstruct(distogram.distances(atom_type), n_candidates, **kwargs)
+
+
+def _reconstruct(task: tuple) -> tuple[str, np.ndarray]:
+    file, kwargs = task
+    return Path(file).parent.name, reconstruct_file(file, **kwargs)
+
+
+@app.command()
+def submission(
+    root: Path,
+    sequences: Path,
+    destination: Path = Path("submission.csv"),
+    n_candidates: int = NUM_PREDICTIONS,
+    atom: str = "c",
+    steps: int = REFINEMENT_STEPS,
+    seed: int = 0,
+    workers: int = 1,
+) -> None:
+    """
+    Writes a submission with candidates reconstructed from a directory of RhoFold distograms.
+
+    Targets without a distogram get zero coordinates.
+    """
+    files = find_distograms(root)
+    kwargs = {
+        "atom_type": atom,
+        "n_candidates": n_candidates,
+        "steps": steps,
+        "seed": seed,
+    }
+    tasks = ((file, kwargs) for file in files)
+    predictions = dict(imap_ordered(_reconstruct, tasks, workers=workers))
+
+    table = read_table(sequences, columns=["target_id", "sequence"])
+    write_submission(table, destination, predictions, n_candidates)
+    print(f"Submission saved at {destination}")
+
+
+if __name__ == "__main__":
+    app()
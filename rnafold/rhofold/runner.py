@@ -0,0 +1,266 @@
+"""
+Batch RhoFold inference.
+
+`predict_rna_structure` starts a new Python process per sequence, paying for the torch import
+and the checkpoint load every time. Here, each worker loads the model once, then consumes
+sequences from a queue.
+"""
+
+import json
+import logging
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Protocol
+
+import numpy as np
+import pandas as pd
+
+from rnafold.parallel import imap_ordered
+
+RHOFOLD_DIR = "../../RhoFold"
+RHOFOLD_CKPT = "../models/RhoFold_pretrained.pt"
+
+# Written in the output directory of a sequence once all its outputs are saved
+DONE_MARKER = "done.json"
+TIMING_COLUMNS = [
+    "target_id",
+    "execution_time",
+    "sequence_length",
+    "cpu_time",
+    "peak_rss",
+]
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+logger = logging.getLogger(__name__)
+
+
+class Predictor(Protocol):
+    def __call__(self, fasta_file: Path, output_dir: Path) -> None:
+        """Predicts the structure of the sequence of a FASTA file, and saves it in output_dir."""
+
+
+# Builds a predictor in each worker, e.g. `RhoFoldPredictor` or a stub model in tests
+PredictorFactory = Callable[..., Predictor]
+
+
+class RhoFoldPredictor:
+    def __init__(
+        self,
+        relax_steps: int = 1,
+        single_seq_pred: bool = True,
+        device: str = "cpu",
+        ckpt: str | Path = RHOFOLD_CKPT,
+        rhofold_dir: str | Path = RHOFOLD_DIR,
+    ):
+        """
+        Loads the RhoFold model, once for all the sequences to predict.
+
+        Args:
+            relax_steps (int, optional): Number of Amber relaxation steps, 0 to skip. Defaults to 1.
+            single_seq_pred (bool, optional): Whether to predict from the sequence only, without
+                MSA. Defaults to True.
+            device (str, optional): Device to run the inference on. Defaults to "cpu".
+            ckpt (str | Path, optional): Checkpoint file. Defaults to
+                "../models/RhoFold_pretrained.pt".
+            rhofold_dir (str | Path, optional): Clone of the RhoFold repository. Defaults to
+                "../../RhoFold".
+        """
+        if str(rhofold_dir) not in sys.path:
+            sys.path.insert(0, str(rhofold_dir))
+
+        import torch
+        from rhofold.config import rhofold_config
+        from rhofold.rhofold import RhoFold
+
+        self.relax_steps = relax_steps
+        self.single_seq_pred = single_seq_pred
+        self.device = device
+
+        self.model = RhoFold(rhofold_config)
+        checkpoint = torch.load(ckpt, map_location=torch.device("cpu"))
+        self.model.load_state_dict(checkpoint["model"])
+        self.model.eval().to(device)
+
+    def __call__(self, fasta_file: Path, output_dir: Path) -> None:
+        """
+        Predicts the structure of a sequence, with the outputs of RhoFold `inference.py`.
+
+        Args:
+            fasta_file (Path): FASTA file of the sequence.
+            output_dir (Path): Directory of the secondary structure (ss.ct), distograms
+                (results.npz), unrelaxed and relaxed models.
+        """
+        import torch
+        from rhofold.relax.relax import AmberRelaxation
+        from rhofold.utils import save_ss2ct
+        from rhofold.utils.alphabet import get_features
+
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        # Without MSA, the sequence is its own alignment
+        msa_file = (
+            fasta_file if self.single_seq_pred else fasta_file.with_suffix(".a3m")
+        )
+        data = get_features(str(fasta_file), str(msa_file))
+
+        with torch.no_grad():
+            outputs = self.model(
+                tokens=data["tokens"].to(self.device),
+                rna_fm_tokens=data["rna_fm_tokens"].to(self.device),
+                seq=data["seq"],
+            )
+        output = outputs[-1]
+
+        ss_prob_map = torch.sigmoid(output["ss"][0, 0]).cpu().numpy()
+        save_ss2ct(ss_prob_map, data["seq"], str(output_dir / "ss.ct"), threshold=0.5)
+
+        plddt = output["plddt"][0].cpu().numpy()
+        np.savez_compressed(
+            output_dir / "results.npz",
+            dist_n=torch.softmax(output["n"].squeeze(0), dim=0).cpu().numpy(),
+            dist_p=torch.softmax(output["p"].squeeze(0), dim=0).cpu().numpy(),
+            dist_c=torch.softmax(output["c4_"].squeeze(0), dim=0).cpu().numpy(),
+            ss_prob_map=ss_prob_map,
+            plddt=plddt,
+        )
+
+        unrelaxed_model = output_dir / "unrelaxed_model.pdb"
+        self.model.structure_module.converter.export_pdb_file(
+            data["seq"],
+            output["cord_tns_pred"][-1].squeeze(0).cpu().numpy(),
+            path=str(unrelaxed_model),
+            chain_id=None,
+            confidence=plddt,
+            logger=logger,
+        )
+
+        if self.relax_steps > 0:
+            relaxed_model = output_dir / f"relaxed_{self.relax_steps}_model.pdb"
+            amber_relax = AmberRelaxation(
+                max_iterations=self.relax_steps, logger=logger
+            )
+            amber_relax.process(str(unrelaxed_model), str(relaxed_model))
+
+
+# Model of the current worker, loaded once by `_load_predictor`
+_predictor: Optional[Predictor] = None
+
+
+def _load_predictor(
+    predictor_factory: PredictorFactory,
+    predictor_kwargs: dict,
+    threads: Optional[int] = None,
+) -> None:
+    global _predictor
+    if threads is not None:
+        # Before the model import, for the thread pools sized at import time
+        for variable in THREAD_VARIABLES:
+            os.environ[variable] = str(threads)
+    _predictor = predictor_factory(**predictor_kwargs)
+    if threads is not None and "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+
+
+def _predict(task: tuple[Path, Path]) -> dict:
+    fasta_file, output_dir = task
+    if _predictor is None:
+        raise RuntimeError("No predictor loaded in this process, see _load_predictor.")
+
+    reset_peak_rss()
+    start_time, start_cpu = time.time(), time.process_time()
+    _predictor(fasta_file, output_dir)
+    end_time, end_cpu = time.time(), time.process_time()
+
+    result = {
+        "target_id": fasta_file.stem,
+        "execution_time": round(end_time - start_time, 3),
+        "sequence_length": get_sequence_length(fasta_file),
+        "cpu_time": round(end_cpu - start_cpu, 3),
+        "peak_rss": peak_rss(),
+    }
+    write_done_marker(output_dir, result)
+    return result
+
+
+def write_done_marker(output_dir: Path, result: dict) -> None:
+    """Marks the outputs of a sequence as complete, atomically, with its timings."""
+    marker = Path(output_dir) / DONE_MARKER
+    marker.parent.mkdir(parents=True, exist_ok=True)
+    partial = marker.with_suffix(".tmp")
+    partial.write_text(json.dumps(result))
+    partial.replace(marker)
+
+
+def read_done_marker(output_dir: Path) -> Optional[dict]:
+    """Returns the timings of a completed sequence, or None if its outputs are incomplete."""
+    marker = Path(output_dir) / DONE_MARKER
+    if not marker.is_file():
+        return None
+    return json.loads(marker.read_text())
+
+
+def reset_peak_rss() -> None:
+    """Resets the peak RSS of the process, so that it measures the next sequence only (Linux)."""
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        pass
+
+
+def peak_rss() -> int:
+    """Returns the peak resident memory of the process, in bytes."""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Peak since the process start, in kilobytes on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def get_sequence_length(fasta_file: Path) -> int:
+    with open(fasta_file, "r") as f:
+        lines = f.readlines()
+        sequence = "".join(line.strip() for line in lines if not line.startswith(">"))
+    return len(sequence)
+
+
+def run_batch(
+    fasta_files: Iterable[Path],
+    output_dir: Path,
+    workers: int = 1,
+    predictor_factory: PredictorFactory = RhoFoldPredictor,
+    **predictor_kwargs,
+) -> pd.DataFrame:
+    """
+    Predicts the structures of FASTA files, loading the model once per worker.
+
+    Args:
+        fasta_files (Iterable[Path]): FASTA files, one sequence each. Outputs of `file.fasta`
+            are saved in `output_dir / file`.
+        output_dir (Path): Output directory.
+        workers (int, optional): Number of processes, each with its own model. Defaults to 1.
+        predictor_factory (PredictorFactory, optional): Builds the model of a worker. Must be
+            picklable if workers > 1. Defaults to `RhoFoldPredictor`.
+        **predictor_kwargs: Arguments of the predictor factory.
+
+    Returns:
+        pd.DataFrame: target_id, execution_time (seconds, model load excluded),
+            sequence_length, cpu_time (seconds, all threads) and peak_rss (bytes) of each
+            sequence, in the order of the files.
+    """
+    tasks = ((Path(file), Path(output_dir) / Path(file).stem) for file in fasta_files)
+    results = imap_ordered(
+        _predict,
+        tasks,
+        workers=workers,
+        initializer=_load_predictor,
+        initargs=(predictor_factory, predictor_kwargs),
+    )
+    return pd.DataFrame(list(results), columns=TIMING_COLUMNS)
@@ -0,0 +1,228 @@
+"""
+Length-aware scheduling of RhoFold predictions across CPU cores.
+
+Inference cost grows superlinearly with the sequence length, so sequences are dispatched
+longest-first to a pool of workers: the long ones start early, and the short ones fill the
+gaps at the end. Each sequence has a deterministic output directory, marked as complete once
+all its outputs are saved, so an interrupted run resumes where it stopped.
+"""
+
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from rnafold.parallel import process_pool, terminate
+from rnafold.rhofold.cost import DEFAULT_RUNTIME, CostModel
+from rnafold.rhofold.runner import (
+    TIMING_COLUMNS,
+    PredictorFactory,
+    RhoFoldPredictor,
+    _load_predictor,
+    _predict,
+    get_sequence_length,
+    read_done_marker,
+)
+
+logger = logging.getLogger(__name__)
+
+# Model of a measure (seconds, bytes) as a function of sequence lengths
+LengthModel = Callable[[np.ndarray], np.ndarray]
+
+
+@dataclass
+class Task:
+    fasta_file: Path
+    output_dir: Path
+    length: int
+    cost: float = 0.0
+    memory: float = 0.0
+
+
+def plan_tasks(
+    fasta_files: Iterable[Path],
+    output_dir: Path,
+    runtime: LengthModel = DEFAULT_RUNTIME,
+    memory: Optional[LengthModel] = None,
+) -> list[Task]:
+    """
+    Orders sequences longest-first, by estimated cost.
+
+    Args:
+        fasta_files (Iterable[Path]): FASTA files, one sequence each.
+        output_dir (Path): Outputs of `file.fasta` are saved in `output_dir / file`.
+        runtime (LengthModel, optional): Estimated cost of a sequence length. Defaults to L^2.
+        memory (Optional[LengthModel], optional): Estimated peak memory (bytes) of a length.
+
+    Returns:
+        list[Task]: Tasks, most expensive first, ties broken by file name.
+    """
+    fasta_files = sorted(Path(file) for file in fasta_files)
+    lengths = np.array([get_sequence_length(file) for file in fasta_files], dtype=int)
+    costs = runtime(lengths) if len(lengths) else np.zeros(0)
+    memories = memory(lengths) if memory is not None and len(lengths) else None
+
+    tasks = [
+        Task(
+            fasta_file=file,
+            output_dir=Path(output_dir) / file.stem,
+            length=int(lengths[i]),
+            cost=float(costs[i]),
+            memory=float(memories[i]) if memories is not None else 0.0,
+        )
+        for i, file in enumerate(fasta_files)
+    ]
+    # Stable sort: equal costs keep the order of the file names
+    return sorted(tasks, key=lambda task: -task.cost)
+
+
+def next_task(
+    queue: list[Task], running_memory: float, memory_limit: Optional[float]
+) -> Optional[Task]:
+    """
+    Pops the most expensive task fitting in the memory left, if any.
+
+    A task larger than the memory limit still runs, alone, rather than never.
+
+    Args:
+        queue (list[Task]): Tasks waiting, most expensive first.
+        running_memory (float): Estimated memory of the running tasks.
+        memory_limit (Optional[float]): Memory ceiling, in bytes.
+
+    Returns:
+        Optional[Task]: The task to start, or None to wait for a running one to finish.
+    """
+    for i, task in enumerate(queue):
+        if (
+            memory_limit is None
+            or running_memory == 0
+            or running_memory + task.memory <= memory_limit
+        ):
+            return queue.pop(i)
+    return None
+
+
+def run_scheduled(
+    fasta_files: Iterable[Path],
+    output_dir: Path,
+    workers: int = 1,
+    threads_per_worker: Optional[int] = None,
+    memory_limit: Optional[float] = None,
+    runtime: Optional[LengthModel] = None,
+    memory: Optional[LengthModel] = None,
+    resume: bool = True,
+    predictor_factory: PredictorFactory = RhoFoldPredictor,
+    **predictor_kwargs,
+) -> pd.DataFrame:
+    """
+    Predicts the structures of FASTA files with a pool of workers, longest sequences first.
+
+    Args:
+        fasta_files (Iterable[Path]): FASTA files, one sequence each.
+        output_dir (Path): Outputs of `file.fasta` are saved in `output_dir / file`.
+        workers (int, optional): Number of inference processes. Defaults to 1.
+        threads_per_worker (Optional[int], optional): Threads of each worker (torch, OpenMP,
+            BLAS), e.g. the number of CPUs divided by workers. Only set in worker processes:
+            with threads, a single worker also runs in a child process. Defaults to the
+            library defaults.
+        memory_limit (Optional[float], optional): Ceiling on the estimated memory of the
+            running sequences, in bytes. Needs a memory model. Defaults to no ceiling.
+        runtime (Optional[LengthModel], optional): Estimated runtime of a sequence length.
+            Defaults to a fit of the timings of completed sequences, or L^2.
+        memory (Optional[LengthModel], optional): Estimated peak memory of a worker predicting
+            a sequence length, in bytes. Defaults to a fit of the completed sequences, if any.
+        resume (bool, optional): Whether to skip the sequences whose outputs are complete.
+            Defaults to True.
+        predictor_factory (PredictorFactory, optional): Builds the model of a worker.
+            Defaults to `RhoFoldPredictor`.
+        **predictor_kwargs: Arguments of the predictor factory.
+
+    Returns:
+        pd.DataFrame: Timings of each sequence (see `run_batch`), completed ones included,
+            sorted by target_id.
+    """
+    fasta_files = sorted(Path(file) for file in fasta_files)
+
+    done = []
+    if resume:
+        markers = (read_done_marker(Path(output_dir) / f.stem) for f in fasta_files)
+        done = [marker for marker in markers if marker is not None]
+    done_ids = {result["target_id"] for result in done}
+    todo = [file for file in fasta_files if file.stem not in done_ids]
+
+    fitted = _fit_cost_model(done)
+    if runtime is None:
+        runtime = fitted.runtime_of if fitted is not None else DEFAULT_RUNTIME
+    if memory is None and fitted is not None and fitted.memory is not None:
+        memory = fitted.memory_of
+    if memory_limit is not None and memory is None:
+        logger.warning("No memory model, the memory ceiling is not enforced.")
+    queue = plan_tasks(todo, output_dir, runtime, memory)
+    logger.info(
+        "%d sequences to predict, %d already done, %d workers",
+        len(queue),
+        len(done),
+        workers,
+    )
+
+    initargs = (predictor_factory, predictor_kwargs, threads_per_worker)
+    if not queue:
+        results = []
+    elif workers == 1 and threads_per_worker is None:
+        # Thread settings are process-wide: with them, even one worker is a child process
+        _load_predictor(*initargs)
+        results = [_predict((task.fasta_file, task.output_dir)) for task in queue]
+    else:
+        results = _run_pool(queue, workers, memory_limit, initargs)
+
+    timings = pd.DataFrame(done + results, columns=TIMING_COLUMNS)
+    return timings.sort_values("target_id", ignore_index=True)
+
+
+def _fit_cost_model(done: list[dict]) -> Optional[CostModel]:
+    """Fits the costs of the completed sequences, if their lengths vary enough."""
+    try:
+        return CostModel.fit(pd.DataFrame(done))
+    except (KeyError, ValueError):
+        return None
+
+
+def _run_pool(
+    queue: list[Task],
+    workers: int,
+    memory_limit: Optional[float],
+    initargs: tuple,
+) -> list[dict]:
+    results = []
+    running: dict[Future, Task] = {}
+    executor = process_pool(workers, _load_predictor, initargs)
+    try:
+        while queue or running:
+            # Fill the free workers, within the memory ceiling
+            while queue and len(running) < workers:
+                running_memory = sum(task.memory for task in running.values())
+                task = next_task(queue, running_memory, memory_limit)
+                if task is None:
+                    break
+                future = executor.submit(_predict, (task.fasta_file, task.output_dir))
+                running[future] = task
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                task = running.pop(future)
+                results.append(future.result())
+                logger.info(
+                    "%s done (%d nt), %d left",
+                    task.fasta_file.stem,
+                    task.length,
+                    len(queue) + len(running),
+                )
+    except BaseException:
+        terminate(executor)
+        raise
+    executor.shutdown()
+    return results
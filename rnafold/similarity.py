@@ -0,0 +1,417 @@
+"""
+Sequence similarity index, for train/test leakage checks and template lookup.
+
+`SimilarityIndex` maps the minimizers of the training sequences (the smallest hashed k-mer of
+each window of w consecutive k-mers) to the sequences containing them. A query only looks up
+its own minimizers, ranks the training sequences by shared minimizers, and aligns the best
+candidates only, so its cost does not grow with the number of training sequences.
+
+Identity is the number of identical positions of a semi-global alignment (free end gaps)
+divided by the query length. Sequences shorter than k have no minimizer, and no hit.
+"""
+
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+import typer
+from Bio.Align import PairwiseAligner
+
+from rnafold.coords import extract_target_ids
+from rnafold.dataset import read_table
+from rnafold.features import EncodedSequences
+from rnafold.parallel import imap_ordered
+
+app = typer.Typer()
+
+KMER_SIZE = 11
+WINDOW_SIZE = 5
+# Training sequences aligned per query, among those sharing the most minimizers
+CANDIDATES = 20
+# Minimizers of more training sequences are ignored, e.g. those of poly-A tails
+MAX_OCCURRENCES = 1000
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+NO_KMER = np.iinfo(np.uint64).max
+
+
+@dataclass
+class Hit:
+    target_id: str
+    identity: float
+    shared_minimizers: int
+
+
+def encode_nucleotides(sequence: str) -> np.ndarray:
+    """Encodes A/C/G/U (T as U, case-insensitive) in 2 bits, other characters as -1."""
+    table = np.full(256, -1, dtype=np.int64)
+    for i, bases in enumerate(("Aa", "Cc", "Gg", "UuTt")):
+        for base in bases:
+            table[ord(base)] = i
+    codes = np.frombuffer(sequence.encode("ascii", errors="replace"), dtype=np.uint8)
+    return table[codes]
+
+
+def minimizers(sequence: str, k: int = KMER_SIZE, w: int = WINDOW_SIZE) -> np.ndarray:
+    """
+    Computes the minimizers of a sequence.
+
+    Args:
+        sequence (str): RNA sequence. K-mers with other characters than A/C/G/U/T are skipped.
+        k (int, optional): K-mer size, at most 32. Defaults to 11.
+        w (int, optional): Number of consecutive k-mers of a window. Defaults to 5.
+
+    Returns:
+        np.ndarray: Distinct hashed minimizers, sorted, uint64.
+    """
+    letters = encode_nucleotides(sequence)
+    n_kmers = len(letters) - k + 1
+    if n_kmers <= 0:
+        return np.zeros(0, dtype=np.uint64)
+
+    codes = np.zeros(n_kmers, dtype=np.uint64)
+    valid = np.ones(n_kmers, dtype=bool)
+    for j in range(k):
+        window = letters[j : j + n_kmers]
+        codes = (codes << np.uint64(2)) | np.maximum(window, 0).astype(np.uint64)
+        valid &= window >= 0
+
+    # Hashed, so that minimizers are not biased towards poly-A
+    hashes = codes * HASH_MULTIPLIER
+    hashes ^= hashes >> np.uint64(29)
+    hashes[~valid] = NO_KMER
+
+    if n_kmers > w:
+        hashes = np.lib.stride_tricks.sliding_window_view(hashes, w).min(axis=1)
+    else:
+        hashes = hashes.min(keepdims=True)
+    return np.unique(hashes[hashes != NO_KMER])
+
+
+@cache
+def _aligner() -> PairwiseAligner:
+    return PairwiseAligner(
+        mode="global",
+        match_score=1,
+        mismatch_score=-1,
+        open_gap_score=-2,
+        extend_gap_score=-1,
+        end_gap_score=0,
+    )
+
+
+def sequence_identity(query: str, target: str) -> float:
+    """
+    Computes the identity of a query to a target sequence.
+
+    Args:
+        query (str): Query sequence.
+        target (str): Target sequence.
+
+    Returns:
+        float: Identical positions of the best semi-global alignment, over the query length.
+    """
+    query = query.upper().replace("T", "U")
+    target = target.upper().replace("T", "U")
+    if not query or not target:
+        return 0.0
+    alignment = _aligner().align(target, query)[0]
+    return alignment.counts().identities / len(query)
+
+
+class SimilarityIndex:
+    def __init__(
+        self,
+        target_ids: np.ndarray,
+        sequences: EncodedSequences,
+        keys: np.ndarray,
+        offsets: np.ndarray,
+        postings: np.ndarray,
+        k: int = KMER_SIZE,
+        w: int = WINDOW_SIZE,
+    ):
+        """
+        Minimizer index of sequences, see `build`.
+
+        Args:
+            target_ids (np.ndarray): target_id of each indexed sequence.
+            sequences (EncodedSequences): Indexed sequences.
+            keys (np.ndarray): Distinct minimizers, sorted.
+            offsets (np.ndarray): Postings of keys[i] are postings[offsets[i]:offsets[i + 1]].
+            postings (np.ndarray): Sequence indices of each minimizer.
+            k (int, optional): K-mer size. Defaults to 11.
+            w (int, optional): Window size. Defaults to 5.
+        """
+        self.target_ids = target_ids
+        self.sequences = sequences
+        self.keys = keys
+        self.offsets = offsets
+        self.postings = postings
+        self.k = k
+        self.w = w
+
+    @classmethod
+    def build(
+        cls,
+        target_ids: Iterable[str],
+        sequences: Iterable[str],
+        k: int = KMER_SIZE,
+        w: int = WINDOW_SIZE,
+    ) -> "SimilarityIndex":
+        """
+        Indexes sequences by their minimizers.
+
+        Args:
+            target_ids (Iterable[str]): target_id of each sequence.
+            sequences (Iterable[str]): Sequences, e.g. the training ones.
+            k (int, optional): K-mer size. Defaults to 11.
+            w (int, optional): Window size. Defaults to 5.
+
+        Returns:
+            SimilarityIndex: The index.
+        """
+        target_ids = np.array(list(target_ids), dtype=str)
+        sequences = list(sequences)
+        hashes = [minimizers(sequence, k, w) for sequence in sequences]
+        lengths = np.fromiter(map(len, hashes), dtype=np.int64, count=len(hashes))
+
+        all_hashes = np.concatenate(hashes or [np.zeros(0, dtype=np.uint64)])
+        owners = np.repeat(np.arange(len(hashes), dtype=np.int32), lengths)
+        order = np.argsort(all_hashes, kind="stable")
+        keys, counts = np.unique(all_hashes[order], return_counts=True)
+        return cls(
+            target_ids=target_ids,
+            sequences=EncodedSequences.from_sequences(sequences),
+            keys=keys,
+            offsets=np.concatenate([[0], np.cumsum(counts)]),
+            postings=owners[order],
+            k=k,
+            w=w,
+        )
+
+    def __len__(self) -> int:
+        return len(self.target_ids)
+
+    def sequence(self, i: int) -> str:
+        start, end = self.sequences.offsets[i], self.sequences.offsets[i + 1]
+        return self.sequences.codes[start:end].tobytes().decode("ascii")
+
+    def save(self, file: str | Path) -> None:
+        """Saves the index to a `.npz` file."""
+        np.savez(
+            file,
+            target_ids=self.target_ids,
+            codes=self.sequences.codes,
+            sequence_offsets=self.sequences.offsets,
+            keys=self.keys,
+            offsets=self.offsets,
+            postings=self.postings,
+            parameters=np.array([self.k, self.w]),
+        )
+
+    @classmethod
+    def load(cls, file: str | Path) -> "SimilarityIndex":
+        """Loads an index saved by `save`."""
+        with np.load(file) as data:
+            k, w = data["parameters"].tolist()
+            return cls(
+                target_ids=data["target_ids"],
+                sequences=EncodedSequences(data["codes"], data["sequence_offsets"]),
+                keys=data["keys"],
+                offsets=data["offsets"],
+                postings=data["postings"],
+                k=k,
+                w=w,
+            )
+
+    def candidates(self, sequence: str, n: int = CANDIDATES) -> list[tuple[int, int]]:
+        """
+        Finds the indexed sequences sharing the most minimizers with a sequence.
+
+        Args:
+            sequence (str): Query sequence.
+            n (int, optional): Maximum number of candidates. Defaults to 20.
+
+        Returns:
+            list[tuple[int, int]]: Index and number of shared minimizers of each candidate,
+                most shared first.
+        """
+        hashes = minimizers(sequence, self.k, self.w)
+        positions = np.searchsorted(self.keys, hashes)
+        found = positions < len(self.keys)
+        found[found] = self.keys[positions[found]] == hashes[found]
+        positions = positions[found]
+        starts, ends = self.offsets[positions], self.offsets[positions + 1]
+        frequent = ends - starts > MAX_OCCURRENCES
+        starts, ends = starts[~frequent], ends[~frequent]
+        if not len(starts):
+            return []
+
+        # Postings of all the matched minimizers, without a Python loop
+        lengths = ends - starts
+        ranges = np.arange(lengths.sum()) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths
+        )
+        owners = self.postings[np.repeat(starts, lengths) + ranges]
+        indices, shared = np.unique(owners, return_counts=True)
+        # Most shared first, ties by index
+        order = np.lexsort((indices, -shared))[:n]
+        return list(zip(indices[order].tolist(), shared[order].tolist()))
+
+    def search(
+        self, sequence: str, top: int = 1, candidates: int = CANDIDATES
+    ) -> list[Hit]:
+        """
+        Finds the indexed sequences most identical to a sequence.
+
+        Args:
+            sequence (str): Query sequence.
+            top (int, optional): Number of hits. Defaults to 1.
+            candidates (int, optional): Number of candidates aligned. Defaults to 20.
+
+        Returns:
+            list[Hit]: Best hits, most identical first.
+        """
+        hits = [
+            Hit(
+                target_id=str(self.target_ids[i]),
+                identity=sequence_identity(sequence, self.sequence(i)),
+                shared_minimizers=shared,
+            )
+            for i, shared in self.candidates(sequence, candidates)
+        ]
+        # Stable sort: equal identities keep the order of shared minimizers
+        return sorted(hits, key=lambda hit: -hit.identity)[:top]
+
+
+# Index of the current worker, see `max_identities`
+_index: Optional[SimilarityIndex] = None
+
+
+def _set_index(index: Optional[SimilarityIndex]) -> None:
+    global _index
+    _index = index
+
+
+def _nearest(task: tuple[str, str]) -> dict:
+    target_id, sequence = task
+    if _index is None:
+        raise RuntimeError("No index set in this process, see _set_index.")
+    hits = _index.search(sequence, top=1)
+    return {
+        "target_id": target_id,
+        "nearest_target_id": hits[0].target_id if hits else None,
+        "identity": hits[0].identity if hits else 0.0,
+    }
+
+
+def max_identities(
+    index: SimilarityIndex, sequences: pd.DataFrame, workers: int = 1
+) -> pd.DataFrame:
+    """
+    Finds the most identical indexed sequence of each sequence, e.g. for leakage checks.
+
+    Args:
+        index (SimilarityIndex): Index, e.g. of the training sequences.
+        sequences (pd.DataFrame): target_id and sequence columns.
+        workers (int, optional): Number of processes. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: target_id, nearest_target_id and identity (0 without any hit).
+    """
+    tasks = zip(sequences["target_id"], sequences["sequence"])
+    try:
+        results = list(
+            imap_ordered(
+                _nearest,
+                tasks,
+                workers=workers,
+                initializer=_set_index,
+                initargs=(index,),
+            )
+        )
+    finally:
+        # With a single worker, the index was set in this process
+        _set_index(None)
+    return pd.DataFrame(results, columns=["target_id", "nearest_target_id", "identity"])
+
+
+@dataclass
+class Template:
+    target_id: str
+    identity: float
+    labels: pd.DataFrame
+
+
+def find_templates(
+    index: SimilarityIndex,
+    sequence: str,
+    labels: str | Path,
+    top: int = 5,
+    min_identity: float = 0.0,
+) -> list[Template]:
+    """
+    Finds the training targets most similar to a sequence, with their structures.
+
+    Args:
+        index (SimilarityIndex): Index of the training sequences.
+        sequence (str): Query sequence.
+        labels (str | Path): Training labels, Parquet with a target index for fast reads.
+        top (int, optional): Number of templates. Defaults to 5.
+        min_identity (float, optional): Minimum identity of a template. Defaults to 0.
+
+    Returns:
+        list[Template]: Templates, most identical first, with their labels rows.
+    """
+    hits = [hit for hit in index.search(sequence, top) if hit.identity >= min_identity]
+    if not hits:
+        return []
+    table = read_table(labels, targets=[hit.target_id for hit in hits])
+    target_ids = extract_target_ids(table)
+    return [
+        Template(
+            target_id=hit.target_id,
+            identity=hit.identity,
+            labels=table[target_ids == hit.target_id].reset_index(drop=True),
+        )
+        for hit in hits
+    ]
+
+
+@app.command()
+def build(
+    sequences: Path,
+    destination: Path,
+    k: int = KMER_SIZE,
+    w: int = WINDOW_SIZE,
+) -> None:
+    """
+    Builds the similarity index of a sequences table (CSV or Parquet), into a `.npz` file.
+    """
+    table = read_table(sequences, columns=["target_id", "sequence"])
+    SimilarityIndex.build(table["target_id"], table["sequence"], k, w).save(destination)
+    print(f"Index of {len(table)} sequences saved at {destination}")
+
+
+@app.command()
+def leakage(
+    index: Path,
+    sequences: Path,
+    destination: Optional[Path] = None,
+    workers: int = 1,
+) -> None:
+    """
+    Computes the max identity of each sequence of a table to the indexed sequences.
+    """
+    table = read_table(sequences, columns=["target_id", "sequence"])
+    identities = max_identities(SimilarityIndex.load(index), table, workers)
+    print(identities.describe())
+    if destination is not None:
+        identities.to_csv(destination, index=False)
+        print(f"Identities saved at {destination}")
+
+
+if __name__ == "__main__":
+    app()
@@ -1,8 +1,19 @@
 """Zero submission for Kaggle."""
 
+from pathlib import Path
+from typing import Mapping, Optional
+
+import numpy as np
 import pandas as pd
+import typer
+
+from rnafold.config import get_settings
+from rnafold.coords import CoordinateStoreWriter, is_store
+from rnafold.dataset import read_table
+
+app = typer.Typer()
 
-from rnafold.config import Settings
+NUM_PREDICTIONS = 5
 
 
 def compute_sequence_length(sequences: pd.Series) -> pd.Series:
@@ -11,34 +22,96 @@ def compute_sequence_length(sequences: pd.Series) -> pd.Series:
 
 def create_random_submission(sequences: pd.DataFrame) -> pd.DataFrame:
     sequences["len"] = compute_sequence_length(sequences["sequence"])
+    return build_submission(sequences)
 
-    data_submission = []
-    for _, row in sequences.iterrows():
-        sequence = row["sequence"]
-        target_id = row["target_id"]
-
-        for i, resname in enumerate(sequence):
-            # NB: 1-indexing
-            data_submission.append(
-                {
-                    "ID": f"{target_id}_{i+1}",
-                    "resname": resname,
-                    "resid": i + 1,
-                }
-            )
 
-    submission = pd.DataFrame.from_records(data_submission)
+def xyz_columns(num_predictions: int = NUM_PREDICTIONS) -> list[str]:
+    """Returns the coordinate columns of a submission: x_1, y_1, z_1, ..., z_n."""
+    return [f"{axis}_{i}" for i in range(1, num_predictions + 1) for axis in "xyz"]
+
 
-    # Add empty columns for xyz predictions
-    NUM_PREDICTIONS = 5
-    for i in range(1, NUM_PREDICTIONS + 1):
-        submission[f"x_{i}"] = 0.0
-        submission[f"y_{i}"] = 0.0
-        submission[f"z_{i}"] = 0.0
+def build_submission(
+    sequences: pd.DataFrame,
+    predictions: Optional[Mapping[str, np.ndarray]] = None,
+    num_predictions: int = NUM_PREDICTIONS,
+) -> pd.DataFrame:
+    """
+    Builds a submission, one row per residue, with the schema of the Kaggle sample submission.
 
+    Sequences are exploded into residues with NumPy, and all coordinate columns are allocated
+    in a single block.
+
+    Args:
+        sequences (pd.DataFrame): Sequences, with `target_id` and `sequence` columns.
+        predictions (Optional[Mapping[str, np.ndarray]], optional): Predicted coordinates of
+            each target, of shape (num_predictions, L, 3). Targets without predictions get zeros.
+        num_predictions (int, optional): Number of predicted structures per target. Defaults to 5.
+
+    Returns:
+        pd.DataFrame: ID, resname, resid and x_i, y_i, z_i columns.
+    """
+    target_ids = sequences["target_id"].to_numpy().astype(str)
+    lengths = sequences["sequence"].str.len().to_numpy()
+    offsets = np.r_[0, np.cumsum(lengths)]
+
+    # NB: 1-indexing
+    resids = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths) + 1
+    ids = np.char.add(
+        np.char.add(np.repeat(target_ids, lengths), "_"), resids.astype(str)
+    )
+    resnames = np.frombuffer("".join(sequences["sequence"]).encode(), dtype="S1")
+
+    coords = np.zeros((offsets[-1], 3 * num_predictions))
+    for i, target_id in enumerate(target_ids):
+        if predictions is not None and target_id in predictions:
+            # (P, L, 3) -> (L, P * 3), columns ordered as x_1, y_1, z_1, x_2, ...
+            prediction = np.asarray(predictions[target_id])
+            coords[offsets[i] : offsets[i + 1]] = prediction.transpose(1, 0, 2).reshape(
+                lengths[i], -1
+            )
+
+    submission = pd.DataFrame(coords, columns=xyz_columns(num_predictions))
+    submission.insert(0, "ID", ids)
+    submission.insert(1, "resname", resnames.astype(str))
+    submission.insert(2, "resid", resids)
     return submission
 
 
+def write_submission(
+    sequences: pd.DataFrame,
+    path: str | Path,
+    predictions: Optional[Mapping[str, np.ndarray]] = None,
+    num_predictions: int = NUM_PREDICTIONS,
+    chunksize: int = 1_000,
+) -> None:
+    """
+    Builds a submission and writes it to disk chunk by chunk, to bound memory.
+
+    Args:
+        sequences (pd.DataFrame): Sequences, with `target_id` and `sequence` columns.
+        path (str | Path): Output CSV file, or coordinate store (`.coords` directory).
+        predictions (Optional[Mapping[str, np.ndarray]], optional): Predicted coordinates of
+            each target, of shape (num_predictions, L, 3). Targets without predictions get zeros.
+        num_predictions (int, optional): Number of predicted structures per target. Defaults to 5.
+        chunksize (int, optional): Number of sequences built at once. Defaults to 1,000.
+    """
+    chunks = (
+        build_submission(
+            sequences.iloc[start : start + chunksize], predictions, num_predictions
+        )
+        for start in range(0, len(sequences), chunksize)
+    )
+    if is_store(path):
+        with CoordinateStoreWriter(path, num_predictions) as writer:
+            for chunk in chunks:
+                writer.add_frame(chunk)
+        return
+
+    with open(path, "w", newline="") as file:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(file, index=False, header=i == 0)
+
+
 def duplicate_xyz_columns(df: pd.DataFrame, n: int = 5) -> pd.DataFrame:
     """
     Duplicates the 'x_1', 'y_1', and 'z_1' columns in a DataFrame up to 'n' times.
@@ -58,11 +131,23 @@ def duplicate_xyz_columns(df: pd.DataFrame, n: int = 5) -> pd.DataFrame:
     return df
 
 
-if __name__ == "__main__":
-    COLUMS = ["target_id", "sequence"]
+@app.command()
+def submit(
+    sequences: Optional[Path] = typer.Option(
+        None,
+        help="Sequences to predict. Defaults to the validation sequences of the config.",
+    ),
+    destination: Path = Path("submission.csv"),
+) -> None:
+    """
+    Writes a zero submission for the sequences, as a CSV file or a coordinate store.
+    """
+    sequences = sequences or Path(get_settings().sequences.val)
+    table = read_table(sequences, columns=["target_id", "sequence"])
+    write_submission(table, destination)
 
-    sequences = pd.read_csv(Settings.sequences.val, usecols=COLUMS)
-    submission = create_random_submission(sequences)
-    submission.to_csv("submission.csv", index=False)
+    print(f"Submission saved at {destination}")
 
-    print(submission)
+
+if __name__ == "__main__":
+    app()
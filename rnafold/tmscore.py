@@ -0,0 +1,565 @@
+"""
+In-process TM-score for C1'-only RNA structures.
+
+NumPy port of the TM-score search of USalign (`TMscore8_search`) for structures whose
+residues are already in correspondence (same sequence, same residue numbering), i.e. the
+score of `USalign -TMscore 1`. The score is normalized by the number of resolved residues
+of the native structure, like the second TM-score reported by USalign.
+The default USalign alignment does not assume this correspondence, and can only find a
+better superposition: this score is a lower bound of the default USalign score.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+# Version of the scores of this module, to bump whenever a change alters them: it is part
+# of the keys of the cached TM-scores
+ALGORITHM_VERSION = 1
+
+# Coordinates below this value are sentinels for unresolved residues
+UNRESOLVED_THRESHOLD = -1e17
+
+# Parameters of the iterative search, as in USalign
+MAX_ITERATIONS = 20
+MAX_FRAGMENT_LENGTHS = 6
+MIN_FRAGMENT_LENGTH = 4
+
+# Score levels of the TM-score upper bounds
+BOUND_LEVELS = 20
+# Number of pairs scored at once when pruning
+PRUNING_BATCH_SIZE = 4
+
+
+def is_resolved(coords: np.ndarray) -> np.ndarray:
+    """
+    Returns the mask of resolved residues, i.e. residues without sentinel or NaN coordinates.
+
+    Args:
+        coords (np.ndarray): Coordinates of shape (..., L, 3).
+
+    Returns:
+        np.ndarray: Boolean mask of shape (..., L).
+    """
+    return np.all(coords > UNRESOLVED_THRESHOLD, axis=-1)
+
+
+def d0_rna(length: int) -> float:
+    """
+    Returns the TM-score distance scale d0 used by USalign for RNA (C3'/C1' atoms).
+
+    Args:
+        length (int): Normalization length (number of residues of the native structure).
+
+    Returns:
+        float: d0, in Angstroms.
+    """
+    if length <= 11:
+        return 0.3
+    if length <= 15:
+        return 0.4
+    if length <= 19:
+        return 0.5
+    if length <= 23:
+        return 0.6
+    if length < 30:
+        return 0.7
+    return 0.6 * np.sqrt(length - 0.5) - 2.5
+
+
+def d0_search(d0: float) -> float:
+    """Returns the distance cutoff used to select residues during the search."""
+    return float(np.clip(d0, 4.5, 8.0))
+
+
+def fragment_lengths(n_aligned: int) -> list[int]:
+    """
+    Returns the lengths of the seed fragments of the search: L, L/2, L/4, ..., 4.
+
+    Args:
+        n_aligned (int): Number of aligned residues.
+
+    Returns:
+        list[int]: Fragment lengths, in decreasing order.
+    """
+    min_length = min(MIN_FRAGMENT_LENGTH, n_aligned)
+    lengths = []
+    for i in range(MAX_FRAGMENT_LENGTHS - 1):
+        lengths.append(int(n_aligned / 2**i))
+        if lengths[-1] <= min_length:
+            lengths[-1] = min_length
+            return lengths
+    lengths.append(min_length)
+    return lengths
+
+
+def fragment_starts(n_aligned: int, length: int, step: int = 1) -> list[int]:
+    """
+    Returns the start positions of the seed fragments of a given length.
+
+    The last possible position is always included, as in USalign.
+    """
+    last = n_aligned - length
+    starts = list(range(0, last, step))
+    starts.append(last)
+    return starts
+
+
+def kabsch(mobile: np.ndarray, target: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Computes the rigid transformation minimizing the RMSD between two point sets.
+
+    Args:
+        mobile (np.ndarray): Points to superpose, of shape (n, 3).
+        target (np.ndarray): Reference points, of shape (n, 3).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Rotation (3, 3) and translation (3,) such that
+            `mobile @ rotation.T + translation` is superposed on `target`.
+    """
+    mobile_center = mobile.mean(axis=0)
+    target_center = target.mean(axis=0)
+    covariance = (mobile - mobile_center).T @ (target - target_center)
+    u, _, vt = np.linalg.svd(covariance)
+    # Correct the rotation to avoid reflections
+    sign = np.sign(np.linalg.det(vt.T @ u.T)) or 1.0
+    rotation = vt.T @ np.diag([1.0, 1.0, sign]) @ u.T
+    translation = target_center - mobile_center @ rotation.T
+    return rotation, translation
+
+
+def _select(
+    dist2: np.ndarray, cutoff: float, d0: float, lnorm: int
+) -> tuple[np.ndarray, float]:
+    """
+    Scores a superposition and selects the residues closer than the cutoff.
+
+    The cutoff is relaxed by steps of 0.5 until at least 3 residues are selected
+    (USalign's `score_fun8`).
+    """
+    n_aligned = len(dist2)
+    score = float(np.sum(1.0 / (1.0 + dist2 / d0**2)) / lnorm)
+    increment = 0
+    while True:
+        relaxed = cutoff + increment * 0.5
+        selected = np.flatnonzero(dist2 < relaxed * relaxed)
+        if len(selected) < 3 and n_aligned > 3:
+            increment += 1
+        else:
+            return selected, score
+
+
+def tm_score(predicted: np.ndarray, native: np.ndarray, step: int = 1) -> float:
+    """
+    Computes the TM-score between a predicted and a native structure.
+
+    Both structures have one C1' atom per residue, in the same residue order. Unresolved
+    residues (sentinel or NaN coordinates) are ignored.
+
+    Args:
+        predicted (np.ndarray): Predicted coordinates, of shape (L, 3).
+        native (np.ndarray): Native coordinates, of shape (L, 3).
+        step (int, optional): Shift between two seed fragments (USalign's simplify_step). Defaults to 1.
+
+    Returns:
+        float: TM-score normalized by the number of resolved native residues. 0 if no residue can be aligned.
+    """
+    predicted = np.asarray(predicted, dtype=np.float64)
+    native = np.asarray(native, dtype=np.float64)
+
+    native_mask = is_resolved(native)
+    aligned = native_mask & is_resolved(predicted)
+    lnorm = int(native_mask.sum())
+    n_aligned = int(aligned.sum())
+    if n_aligned == 0:
+        return 0.0
+
+    x = predicted[aligned]
+    y = native[aligned]
+    d0 = d0_rna(lnorm)
+    search_cutoff = d0_search(d0)
+
+    best = -1.0
+    for length in fragment_lengths(n_aligned):
+        for start in fragment_starts(n_aligned, length, step):
+            fragment = slice(start, start + length)
+            rotation, translation = kabsch(x[fragment], y[fragment])
+            dist2 = np.sum((x @ rotation.T + translation - y) ** 2, axis=1)
+            selected, score = _select(dist2, search_cutoff - 1, d0, lnorm)
+            best = max(best, score)
+
+            # Extend the alignment iteratively from the seed fragment
+            for _ in range(MAX_ITERATIONS):
+                if len(selected) == 0:
+                    break
+                rotation, translation = kabsch(x[selected], y[selected])
+                dist2 = np.sum((x @ rotation.T + translation - y) ** 2, axis=1)
+                previous = selected
+                selected, score = _select(dist2, search_cutoff + 1, d0, lnorm)
+                best = max(best, score)
+                if np.array_equal(selected, previous):
+                    break
+
+    return best
+
+
+def tm_score_matrix(
+    predicted: np.ndarray, native: np.ndarray, step: int = 1, batch_size: int = 4096
+) -> np.ndarray:
+    """
+    Computes the TM-scores of all (prediction, native) pairs of a target at once.
+
+    Same search as `tm_score`, but every seed fragment of every pair is a row of a batch:
+    fragments and selected residues are weight masks over the L residues, superpositions
+    are batched weighted Kabsch (batched SVD) and distances are broadcast over the batch.
+
+    Args:
+        predicted (np.ndarray): Predicted coordinates, of shape (P, L, 3).
+        native (np.ndarray): Native coordinates, of shape (N, L, 3).
+        step (int, optional): Shift between two seed fragments (USalign's simplify_step). Defaults to 1.
+        batch_size (int, optional): Number of seed fragments processed at once, bounds memory. Defaults to 4096.
+
+    Returns:
+        np.ndarray: TM-scores of shape (P, N), normalized by the number of resolved native residues.
+            0 for pairs without aligned residues.
+    """
+    predicted_ids, native_ids = np.indices((len(predicted), len(native)))
+    scores = tm_score_pairs(
+        predicted, native, predicted_ids.ravel(), native_ids.ravel(), step, batch_size
+    )
+    return scores.reshape(len(predicted), len(native))
+
+
+def tm_score_pairs(
+    predicted: np.ndarray,
+    native: np.ndarray,
+    predicted_ids: np.ndarray,
+    native_ids: np.ndarray,
+    step: int = 1,
+    batch_size: int = 4096,
+) -> np.ndarray:
+    """
+    Computes the TM-scores of some (prediction, native) pairs of a target, see `tm_score_matrix`.
+
+    Args:
+        predicted (np.ndarray): Predicted coordinates, of shape (P, L, 3).
+        native (np.ndarray): Native coordinates, of shape (N, L, 3).
+        predicted_ids (np.ndarray): Prediction of each pair, of shape (K,).
+        native_ids (np.ndarray): Native of each pair, of shape (K,).
+        step (int, optional): Shift between two seed fragments (USalign's simplify_step). Defaults to 1.
+        batch_size (int, optional): Number of seed fragments processed at once, bounds memory. Defaults to 4096.
+
+    Returns:
+        np.ndarray: TM-scores of shape (K,), normalized by the number of resolved native residues.
+            0 for pairs without aligned residues.
+    """
+    predicted = np.asarray(predicted, dtype=np.float64)
+    native = np.asarray(native, dtype=np.float64)
+
+    predicted_mask = is_resolved(predicted)
+    native_mask = is_resolved(native)
+    # Zero the sentinels to keep the arithmetic finite, they are masked out anyway
+    predicted = np.where(predicted_mask[..., None], predicted, 0.0)
+    native = np.where(native_mask[..., None], native, 0.0)
+
+    aligned = predicted_mask[predicted_ids] & native_mask[native_ids]
+    rank = np.cumsum(aligned, axis=1) - 1  # position of each residue among aligned ones
+    n_aligned = aligned.sum(axis=1)
+    lnorm = native_mask.sum(axis=1)[native_ids]
+    d0 = np.array([d0_rna(length) for length in lnorm])
+
+    pairs, starts, lengths = _seed_fragments(n_aligned, step)
+    scores = np.zeros(len(predicted_ids))
+    for begin in range(0, len(pairs), batch_size):
+        pair = pairs[begin : begin + batch_size]
+        start = starts[begin : begin + batch_size, None]
+        stop = start + lengths[begin : begin + batch_size, None]
+        mask = aligned[pair]
+        fragment = mask & (rank[pair] >= start) & (rank[pair] < stop)
+        _search(
+            predicted[predicted_ids[pair]],
+            native[native_ids[pair]],
+            mask,
+            fragment,
+            d0[pair],
+            lnorm[pair],
+            n_aligned[pair],
+            pair,
+            scores,
+        )
+
+    return scores
+
+
+def tm_score_upper_bounds(
+    predicted: np.ndarray, native: np.ndarray, levels: int = BOUND_LEVELS
+) -> np.ndarray:
+    """
+    Computes upper bounds of the TM-scores of all (prediction, native) pairs of a target,
+    valid for any superposition, hence for the scores of `tm_score_matrix`.
+
+    Superposition only moves the prediction rigidly, so for two aligned residues i and j at
+    distances d_i and d_j of their native positions, |p_ij - n_ij| <= d_i + d_j, where p_ij
+    and n_ij are the distances between i and j in the prediction and in the native. Residues
+    closer than r to their native positions are then pairwise within 2r in the graph of
+    these distance differences: they form a clique, no larger than the h-index of the degrees
+    (plus one) of the graph. Summing the bounds over distance levels r, of score
+    1 / (1 + (r / d0)^2), bounds the TM-score.
+
+    Args:
+        predicted (np.ndarray): Predicted coordinates, of shape (P, L, 3).
+        native (np.ndarray): Native coordinates, of shape (N, L, 3).
+        levels (int, optional): Number of score levels, the finer the tighter and the
+            slower. Defaults to 20.
+
+    Returns:
+        np.ndarray: Upper bounds of shape (P, N). 0 for pairs without aligned residues.
+    """
+    predicted = np.asarray(predicted, dtype=np.float64)
+    native = np.asarray(native, dtype=np.float64)
+    predicted_mask = is_resolved(predicted)
+    native_mask = is_resolved(native)
+    predicted_distances = [_distance_matrix(x) for x in predicted]
+    # Score levels t_k = k / levels, the contribution of a residue at distance r_k
+    thresholds = np.arange(1, levels) / levels
+
+    bounds = np.zeros((len(predicted), len(native)))
+    for j, y in enumerate(native):
+        lnorm = int(native_mask[j].sum())
+        if lnorm == 0:
+            continue
+        native_distances = _distance_matrix(y)
+        # Largest distance difference of the edges at each level, 2 * r_k, increasing
+        edges = (2 * d0_rna(lnorm) * np.sqrt(1 / thresholds - 1))[::-1]
+        for i in range(len(predicted)):
+            aligned = np.flatnonzero(predicted_mask[i] & native_mask[j])
+            n = len(aligned)
+            if n == 0:
+                continue
+            differences = np.abs(
+                predicted_distances[i][np.ix_(aligned, aligned)]
+                - native_distances[np.ix_(aligned, aligned)]
+            )
+            # Number of levels whose graph has each edge, an edge at level k being in all
+            # the graphs of the lower levels
+            edge_levels = len(edges) - np.searchsorted(edges, differences, side="right")
+            counts = np.bincount(
+                (np.arange(n)[:, None] * levels + edge_levels).ravel(),
+                minlength=n * levels,
+            ).reshape(n, levels)
+            # Degrees plus one (the residue itself) at levels 1, ..., levels - 1
+            sizes = np.cumsum(counts[:, ::-1], axis=1)[:, ::-1][:, 1:]
+            sizes = -np.sort(-sizes, axis=0)
+            cliques = (sizes >= np.arange(1, n + 1)[:, None]).sum(axis=0)
+            # The level 0 contains every aligned residue
+            bounds[i, j] = (n + cliques.sum()) / levels / lnorm
+    return bounds
+
+
+def tm_score_matrix_pruned(
+    predicted: np.ndarray,
+    native: np.ndarray,
+    pairs: Optional[np.ndarray] = None,
+    tolerance: float = 0.0,
+    step: int = 1,
+    batch_size: int = PRUNING_BATCH_SIZE,
+) -> tuple[np.ndarray, int]:
+    """
+    Computes the TM-scores of the (prediction, native) pairs of a target that can reach
+    the highest score, see `tm_score_upper_bounds`.
+
+    Pairs are scored by batches, by decreasing upper bound, and pairs whose upper bound does
+    not exceed the highest score computed by more than `tolerance` are skipped. The highest
+    score is the one of `tm_score_matrix`, within tolerance. Once it reaches 1 - tolerance,
+    all the remaining pairs are skipped.
+
+    Args:
+        predicted (np.ndarray): Predicted coordinates, of shape (P, L, 3).
+        native (np.ndarray): Native coordinates, of shape (N, L, 3).
+        pairs (Optional[np.ndarray], optional): Mask of shape (P, N) of the pairs to score.
+            Defaults to all pairs.
+        tolerance (float, optional): Acceptable error of the highest score. Defaults to 0.
+        step (int, optional): Shift between two seed fragments (USalign's simplify_step). Defaults to 1.
+        batch_size (int, optional): Number of pairs scored at once. Defaults to 4.
+
+    Returns:
+        tuple[np.ndarray, int]: TM-scores of shape (P, N), NaN for pruned pairs and pairs
+            not requested, and number of pruned pairs.
+    """
+    if pairs is None:
+        pairs = np.ones((len(predicted), len(native)), dtype=bool)
+    # Slack for the rounding errors of the bounds, no score exceeds 1
+    bounds = np.minimum(tm_score_upper_bounds(predicted, native) + 1e-9, 1.0)
+    candidates = np.flatnonzero(pairs)
+    candidates = candidates[np.argsort(-bounds.flat[candidates], kind="stable")]
+
+    scores = np.full(pairs.shape, np.nan)
+    best = -np.inf
+    n_scored = 0
+    while n_scored < len(candidates):
+        batch = candidates[n_scored : n_scored + batch_size]
+        # Candidates are sorted by bound: the next ones can not beat the best either
+        batch = batch[bounds.flat[batch] > best + tolerance]
+        if len(batch) == 0:
+            break
+        predicted_ids, native_ids = np.unravel_index(batch, pairs.shape)
+        scores.flat[batch] = tm_score_pairs(
+            predicted, native, predicted_ids, native_ids, step
+        )
+        best = max(best, np.max(scores.flat[batch]))
+        n_scored += len(batch)
+    return scores, len(candidates) - n_scored
+
+
+def _distance_matrix(x: np.ndarray) -> np.ndarray:
+    """Distances between all the points, of shape (L, L)."""
+    return np.sqrt(np.sum((x[:, None, :] - x[None, :, :]) ** 2, axis=-1))
+
+
+def _seed_fragments(
+    n_aligned: np.ndarray, step: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the pair index, start and length of every seed fragment of every pair."""
+    seeds = {}
+    for n in np.unique(n_aligned[n_aligned > 0]):
+        seeds[n] = np.array(
+            [
+                (start, length)
+                for length in fragment_lengths(int(n))
+                for start in fragment_starts(int(n), length, step)
+            ]
+        )
+    pairs = [np.flatnonzero(n_aligned == n) for n in seeds]
+    if not pairs:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+    pair_ids = np.concatenate(
+        [np.repeat(p, len(seeds[n])) for p, n in zip(pairs, seeds)]
+    )
+    fragments = np.concatenate(
+        [np.tile(seeds[n], (len(p), 1)) for p, n in zip(pairs, seeds)]
+    )
+    return pair_ids, fragments[:, 0], fragments[:, 1]
+
+
+def _search(
+    x: np.ndarray,
+    y: np.ndarray,
+    mask: np.ndarray,
+    fragment: np.ndarray,
+    d0: np.ndarray,
+    lnorm: np.ndarray,
+    n_aligned: np.ndarray,
+    pair: np.ndarray,
+    scores: np.ndarray,
+) -> None:
+    """
+    Runs the iterative search from a batch of seed fragments.
+
+    The best score of each seed is accumulated in `scores`, indexed by `pair`. Seeds of the same
+    pair reaching the same selection follow the same trajectory afterwards, so only one of them
+    is kept.
+    """
+    search_cutoff = np.clip(d0, 4.5, 8.0)
+
+    dist2 = _superposed_dist2(x, y, fragment)
+    selected, score = _select_batch(
+        dist2, mask, search_cutoff - 1, d0, lnorm, n_aligned
+    )
+    np.maximum.at(scores, pair, score)
+
+    # Seeds still iterating
+    active = _unique_states(np.flatnonzero(selected.any(axis=1)), pair, selected)
+    for _ in range(MAX_ITERATIONS):
+        if len(active) == 0:
+            break
+        dist2 = _superposed_dist2(x[active], y[active], selected[active])
+        new_selected, score = _select_batch(
+            dist2,
+            mask[active],
+            search_cutoff[active] + 1,
+            d0[active],
+            lnorm[active],
+            n_aligned[active],
+        )
+        np.maximum.at(scores, pair[active], score)
+        converged = np.all(new_selected == selected[active], axis=1)
+        selected[active] = new_selected
+        active = _unique_states(active[~converged], pair, selected)
+
+
+def _unique_states(
+    active: np.ndarray, pair: np.ndarray, selected: np.ndarray
+) -> np.ndarray:
+    """Keeps one seed per distinct (pair, selection) state."""
+    if len(active) < 2:
+        return active
+    keys = np.hstack(
+        [
+            pair[active].astype(">i8").view(np.uint8).reshape(-1, 8),
+            np.packbits(selected[active], axis=1),
+        ]
+    )
+    _, first = np.unique(keys, axis=0, return_index=True)
+    return active[np.sort(first)]
+
+
+def _superposed_dist2(x: np.ndarray, y: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Squared distances after superposing each x on y with a Kabsch fit restricted to weights."""
+    w = weights.astype(np.float64)
+    w_sum = w.sum(axis=1)[:, None, None]
+    x_center = np.matmul(w[:, None, :], x) / w_sum  # (S, 1, 3)
+    y_center = np.matmul(w[:, None, :], y) / w_sum
+
+    # Weighted covariance of the centered point sets
+    covariance = np.matmul((x * w[:, :, None]).transpose(0, 2, 1), y)
+    covariance -= w_sum * np.matmul(x_center.transpose(0, 2, 1), y_center)
+    u, _, vt = np.linalg.svd(covariance)
+    # Correct the rotations to avoid reflections
+    sign = np.sign(
+        np.linalg.det(np.matmul(vt.transpose(0, 2, 1), u.transpose(0, 2, 1)))
+    )
+    vt[:, 2, :] *= np.where(sign == 0, 1.0, sign)[:, None]
+    rotation_t = np.matmul(u, vt)  # transposed rotation, x @ rotation_t rotates x
+
+    moved = np.matmul(x - x_center, rotation_t) + y_center
+    return np.sum((moved - y) ** 2, axis=-1)
+
+
+def _select_batch(
+    dist2: np.ndarray,
+    mask: np.ndarray,
+    cutoff: np.ndarray,
+    d0: np.ndarray,
+    lnorm: np.ndarray,
+    n_aligned: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Batched `_select`: scores each superposition and selects the residues closer than the cutoff."""
+    score = (
+        np.sum(np.where(mask, 1.0 / (1.0 + dist2 / d0[:, None] ** 2), 0.0), axis=1)
+        / lnorm
+    )
+    dist2 = np.where(mask, dist2, np.inf)
+
+    # Relax the cutoff by steps of 0.5 until at least 3 residues are selected
+    relaxed = cutoff.astype(np.float64)
+    if dist2.shape[1] >= 3:
+        third = np.partition(dist2, 2, axis=1)[:, 2]
+        short = (n_aligned > 3) & (third >= relaxed * relaxed)
+        if short.any():
+            relaxed[short] = _relax(relaxed[short], third[short])
+
+    return dist2 < (relaxed * relaxed)[:, None], score
+
+
+def _relax(cutoff: np.ndarray, third: np.ndarray) -> np.ndarray:
+    """Smallest `cutoff + k * 0.5` whose square exceeds the third smallest squared distance."""
+    increment = np.maximum(np.ceil((np.sqrt(third) - cutoff) / 0.5), 0.0)
+    # Fix floating point rounding of the closed form
+    while np.any(low := (cutoff + increment * 0.5) ** 2 <= third):
+        increment[low] += 1
+    while np.any(
+        high := (increment > 0) & ((cutoff + (increment - 1) * 0.5) ** 2 > third)
+    ):
+        increment[high] -= 1
+    return cutoff + increment * 0.5
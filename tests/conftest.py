@@ -0,0 +1,53 @@
+"""Fixtures shared by the test modules."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from typer.testing import CliRunner
+
+from rnafold import dataset
+from tests.helpers import write_mmcif, write_pdb
+
+
+@pytest.fixture
+def labels() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    frames = []
+    for target_id, length in [("1ABC_A", 12), ("1ABC_B", 7), ("2XYZ_A", 15)]:
+        frames.append(
+            pd.DataFrame(
+                {
+                    "ID": [f"{target_id}_{i}" for i in range(1, length + 1)],
+                    "resname": rng.choice(list("AUGC"), length),
+                    "resid": np.arange(1, length + 1),
+                    "x_1": rng.normal(size=length),
+                    "y_1": rng.normal(size=length),
+                    "z_1": rng.normal(size=length),
+                }
+            )
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.fixture
+def labels_parquet(tmp_path, labels, monkeypatch) -> str:
+    # Small row groups, so that targets overlap several of them
+    monkeypatch.setattr(dataset, "ROW_GROUP_SIZE", 5)
+    labels.to_csv(tmp_path / "labels.csv", index=False)
+    result = CliRunner().invoke(
+        dataset.app, [str(tmp_path / "labels.csv"), str(tmp_path / "labels.parquet")]
+    )
+    assert result.exit_code == 0
+    return str(tmp_path / "labels.parquet")
+
+
+@pytest.fixture
+def structures(tmp_path):
+    """1abc and 2abc are the same structure, 3abc (first) shares its chain A only."""
+    root = tmp_path / "structures"
+    (root / "ab").mkdir(parents=True)
+    write_pdb(root / "ab" / "1abc.pdb")
+    write_pdb(root / "ab" / "2abc.pdb")
+    write_mmcif(root / "3abc.cif")
+    (root / "README.txt").write_text("not a structure")
+    return root
@@ -0,0 +1,212 @@
+"""Builders of the test data shared by the test modules."""
+
+import functools
+
+import numpy as np
+import pandas as pd
+
+
+def make_structure(length: int, seed: int = 0) -> np.ndarray:
+    """Random walk with ~6A steps, close to the C1' trace of an RNA."""
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(size=(length, 3))
+    steps *= 6.0 / np.linalg.norm(steps, axis=1, keepdims=True)
+    return np.cumsum(steps, axis=0)
+
+
+def make_frame(target_id: str, coords: list[np.ndarray]) -> pd.DataFrame:
+    length = len(coords[0])
+    columns = {
+        "ID": [f"{target_id}_{i + 1}" for i in range(length)],
+        "resname": ["A"] * length,
+        "resid": np.arange(1, length + 1),
+    }
+    for i, xyz in enumerate(coords, start=1):
+        columns[f"x_{i}"], columns[f"y_{i}"], columns[f"z_{i}"] = xyz.T
+    return pd.DataFrame(columns)
+
+
+def make_labels(n_targets: int, n_structures: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    frames = []
+    for t in range(n_targets):
+        native = make_structure(20 + t, seed=t)
+        structures = [
+            native + rng.normal(scale=i, size=native.shape) for i in range(n_structures)
+        ]
+        frames.append(make_frame(f"T{t}", structures))
+    return pd.concat(frames, ignore_index=True)
+
+
+def random_sequences(n: int, seed: int = 0) -> list[str]:
+    """Sequences with lowercase letters, IUPAC ambiguity codes, T and other characters."""
+    rng = np.random.default_rng(seed)
+    alphabet = list("ACGUACGUACGUacguTtNnRYSWKMBDHVXx-.")
+    lengths = rng.integers(0, 60, size=n)
+    return ["".join(rng.choice(alphabet, size=length)) for length in lengths]
+
+
+def pdb_line(
+    record,
+    serial,
+    name,
+    resname,
+    chain,
+    resid,
+    xyz,
+    altloc=" ",
+    icode=" ",
+    occupancy=1.0,
+):
+    # Names of up to 3 characters start at column 14, as in wwPDB files
+    name = f" {name:<3}" if len(name) < 4 else name
+    return (
+        f"{record:<6}{serial:>5} {name}{altloc}{resname:>3} {chain}{resid:>4}{icode}   "
+        f"{xyz[0]:8.3f}{xyz[1]:8.3f}{xyz[2]:8.3f}{occupancy:6.2f}{20.0:6.2f}"
+        f"          {name.strip()[0]:>2}\n"
+    )
+
+
+def make_atoms():
+    """Atoms of a model: a protein chain, two RNA chains, a modified residue and waters."""
+    coords = make_structure(24, seed=1)
+    atoms = []
+    for i in range(4):
+        atoms.append(("ATOM", "CA", "GLY", "P", i + 1, coords[i]))
+    for i, resname in enumerate("GGACUUCA"):
+        xyz = coords[4 + i]
+        atoms.append(("ATOM", "P", resname, "A", i + 1, xyz + 1.5))
+        atoms.append(("ATOM", "C1'", resname, "A", i + 1, xyz))
+        atoms.append(("ATOM", "C4'", resname, "A", i + 1, xyz - 1.0))
+    # Modified nucleotide, not an A/U/G/C residue
+    atoms.append(("HETATM", "C1'", "PSU", "A", 9, coords[12]))
+    for i, resname in enumerate("CUAG"):
+        atoms.append(("ATOM", "C1'", resname, "B", 5 + i, coords[13 + i]))
+    # Residue without C1'
+    atoms.append(("ATOM", "P", "A", "B", 9, coords[17]))
+    atoms.append(("HETATM", "O", "HOH", "A", 101, coords[18]))
+    return atoms
+
+
+def write_pdb(path, models=2):
+    lines = ["HEADER    RNA\n"]
+    serial = 0
+    for model in range(models):
+        lines.append(f"MODEL     {model + 1:>4}\n")
+        for record, name, resname, chain, resid, xyz in make_atoms():
+            serial += 1
+            lines.append(
+                pdb_line(record, serial, name, resname, chain, resid, xyz + model)
+            )
+        # Alternate locations, the second one with a higher occupancy
+        lines.append(
+            pdb_line(
+                "ATOM", serial + 1, "C1'", "U", "B", 10, (1, 2, 3), "A", occupancy=0.4
+            )
+        )
+        lines.append(
+            pdb_line(
+                "ATOM", serial + 2, "C1'", "U", "B", 10, (4, 5, 6), "B", occupancy=0.6
+            )
+        )
+        # Equal occupancies: the first one
+        lines.append(
+            pdb_line(
+                "ATOM", serial + 3, "C1'", "G", "B", 11, (7, 8, 9), "A", occupancy=0.5
+            )
+        )
+        lines.append(
+            pdb_line(
+                "ATOM", serial + 4, "C1'", "G", "B", 11, (1, 1, 1), "B", occupancy=0.5
+            )
+        )
+        # Insertion code
+        lines.append(
+            pdb_line("ATOM", serial + 5, "C1'", "A", "B", 11, (2, 2, 2), icode="A")
+        )
+        # Atom name aligned left
+        lines.append(pdb_line("ATOM", serial + 6, "C1' ", "C", "B", 12, (3, 3, 3)))
+        serial += 6
+        lines.append("ENDMDL\n")
+    lines.append("END\n")
+    path.write_text("".join(lines))
+    return path
+
+
+MMCIF_COLUMNS = [
+    "group_PDB",
+    "id",
+    "type_symbol",
+    "label_atom_id",
+    "label_alt_id",
+    "label_comp_id",
+    "label_asym_id",
+    "label_entity_id",
+    "label_seq_id",
+    "pdbx_PDB_ins_code",
+    "Cartn_x",
+    "Cartn_y",
+    "Cartn_z",
+    "occupancy",
+    "B_iso_or_equiv",
+    "auth_seq_id",
+    "auth_asym_id",
+    "pdbx_PDB_model_num",
+]
+
+
+def mmcif_line(
+    columns,
+    model,
+    record,
+    serial,
+    name,
+    resname,
+    chain,
+    resid,
+    xyz,
+    altloc=".",
+    occupancy=1.0,
+    icode="?",
+):
+    values = {
+        "group_PDB": record,
+        "id": serial,
+        "type_symbol": name[0],
+        "label_atom_id": f'"{name}"',
+        "label_alt_id": altloc,
+        "label_comp_id": resname,
+        "label_asym_id": chain.lower(),
+        "label_entity_id": 1,
+        # Label chains and residue numbers differ from author ones, waters have none
+        "label_seq_id": "." if resname == "HOH" else resid,
+        "pdbx_PDB_ins_code": icode,
+        "Cartn_x": f"{xyz[0]:.3f}",
+        "Cartn_y": f"{xyz[1]:.3f}",
+        "Cartn_z": f"{xyz[2]:.3f}",
+        "occupancy": f"{occupancy:.2f}",
+        "B_iso_or_equiv": "20.00",
+        "auth_seq_id": resid + 10,
+        "auth_asym_id": chain,
+        "pdbx_PDB_model_num": model,
+    }
+    return " ".join(str(values[column]) for column in columns) + "\n"
+
+
+def write_mmcif(path, models=2, columns=MMCIF_COLUMNS):
+    lines = ["data_RNA\n", "#\n", "_entry.id RNA\n", "#\n", "loop_\n"]
+    lines += [f"_atom_site.{column}\n" for column in columns]
+    serial = 0
+    for model in range(models):
+        row = functools.partial(mmcif_line, columns, model + 1)
+        for record, name, resname, chain, resid, xyz in make_atoms():
+            serial += 1
+            lines.append(row(record, serial, name, resname, chain, resid, xyz + model))
+        # Alternate locations, and an insertion code
+        lines.append(row("ATOM", serial + 1, "C1'", "U", "B", 10, (1, 2, 3), "A", 0.4))
+        lines.append(row("ATOM", serial + 2, "C1'", "U", "B", 10, (4, 5, 6), "B", 0.6))
+        lines.append(row("ATOM", serial + 3, "C1'", "A", "B", 11, (2, 2, 2), icode="A"))
+        serial += 3
+    lines += ["#\n", "loop_\n", "_pdbx_poly_seq_scheme.asym_id\n", "A\n", "#\n"]
+    path.write_text("".join(lines))
+    return path
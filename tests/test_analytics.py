@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rnafold.rhofold import analytics
+from rnafold.rhofold.analytics import analyze_distogram, analyze_outputs
+from rnafold.rhofold.distogram import contact_probabilities, expected_distances
+
+
+def make_outputs(root, lengths: dict[str, int], bins: int = 38) -> None:
+    """Distograms with residues i and j in distance bin |i - j|, bins of 1 A from 2 A."""
+    for target_id, length in lengths.items():
+        positions = np.arange(length)
+        separation = np.abs(positions[:, None] - positions[None, :])
+        dist = np.zeros((bins, length, length), dtype=np.float32)
+        dist[np.minimum(separation, bins - 1), positions[:, None], positions] = 1.0
+
+        ss_prob_map = np.zeros((length, length), dtype=np.float32)
+        ss_prob_map[0, length - 1] = ss_prob_map[length - 1, 0] = 0.9
+
+        (root / target_id).mkdir(parents=True)
+        np.savez(
+            root / target_id / "results.npz",
+            dist_n=dist,
+            dist_p=dist,
+            dist_c=dist,
+            ss_prob_map=ss_prob_map,
+            plddt=np.linspace(0.5, 1.0, length, dtype=np.float32),
+        )
+
+
+def test_expected_distances_and_contacts():
+    dist = np.zeros((38, 2, 2))
+    dist[[0, 10], [0, 0], [0, 1]] = 1.0
+    dist[20, 1, :] = 0.5
+    dist[30, 1, :] = 0.5
+
+    np.testing.assert_allclose(expected_distances(dist), [[2.5, 12.5], [27.5, 27.5]])
+    np.testing.assert_allclose(
+        contact_probabilities(dist, threshold=13.0), [[1.0, 1.0], [0.0, 0.0]]
+    )
+
+
+def test_analyze_distogram(tmp_path):
+    make_outputs(tmp_path, {"R1": 20})
+
+    stats = analyze_distogram(tmp_path / "R1" / "results.npz", thresholds=(8.0,))
+
+    assert stats["target_id"] == "R1"
+    assert stats["sequence_length"] == 20
+    assert stats["mean_plddt"] == pytest.approx(0.75)
+    assert stats["base_pairs"] == 1
+    # Pairs 3 to 5 residues apart are closer than 8 A (distances 5.5 to 7.5 A)
+    assert stats["contacts_8"] == 17 + 16 + 15
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_analyze_outputs_resumes(tmp_path, monkeypatch, workers):
+    make_outputs(tmp_path / "outputs", {"R1": 10, "R2": 15, "R3": 20})
+    destination = tmp_path / "stats.parquet"
+
+    def fail_on_r3(file, **kwargs):
+        if file.parent.name == "R3":
+            raise RuntimeError("crash")
+        return analyze_distogram(file, **kwargs)
+
+    monkeypatch.setattr(analytics, "analyze_distogram", fail_on_r3)
+    with pytest.raises(RuntimeError, match="crash"):
+        analyze_outputs(tmp_path / "outputs", destination, batch_size=1)
+    assert len(list(tmp_path.glob("stats.parquet.parts/part-*.parquet"))) == 2
+
+    analyzed = []
+
+    def record(file, **kwargs):
+        analyzed.append(file.parent.name)
+        return analyze_distogram(file, **kwargs)
+
+    monkeypatch.setattr(analytics, "analyze_distogram", record)
+    analyze_outputs(tmp_path / "outputs", destination, batch_size=1)
+
+    assert analyzed == ["R3"]
+    stats = pd.read_parquet(destination)
+    assert stats["target_id"].tolist() == ["R1", "R2", "R3"]
+    assert stats["sequence_length"].tolist() == [10, 15, 20]
+    assert not (tmp_path / "stats.parquet.parts").exists()
+
+    expected = pd.DataFrame(
+        [
+            analyze_distogram(f, thresholds=(8.0, 12.0))
+            for f in analytics.find_distograms(tmp_path / "outputs")
+        ]
+    )
+    parallel = analyze_outputs(
+        tmp_path / "outputs", tmp_path / "parallel.parquet", workers=workers
+    )
+    pd.testing.assert_frame_equal(pd.read_parquet(parallel), expected)
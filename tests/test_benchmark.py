@@ -0,0 +1,152 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from typer.testing import CliRunner
+
+from rnafold.rhofold import runner as runner_module
+from rnafold.rhofold.benchmark import (
+    SyntheticPredictor,
+    app,
+    run_benchmark,
+    stratified_sample,
+)
+from rnafold.rhofold.cost import CostModel, PowerLaw, estimate_job, estimate_makespan
+from rnafold.rhofold.runner import THREAD_VARIABLES
+
+runner = CliRunner()
+
+
+def test_power_law_fit_recovers_the_law():
+    lengths = np.array([20, 50, 100, 200, 400])
+    law = PowerLaw.fit(lengths, 3e-4 * lengths**2.5)
+
+    assert law.a == pytest.approx(3e-4)
+    assert law.k == pytest.approx(2.5)
+    with pytest.raises(ValueError, match="2 distinct lengths"):
+        PowerLaw.fit([10, 10], [1.0, 2.0])
+
+
+def test_cost_model_save_and_load(tmp_path):
+    timings = pd.DataFrame(
+        {
+            "sequence_length": [10, 100, 1000],
+            "execution_time": [0.1, 10.0, 1000.0],
+            "peak_rss": [2e9 + 1e3, 2e9 + 1e5, 2e9 + 1e7],
+        }
+    )
+    cost_model = CostModel.fit(timings, load_time=30.0, load_memory=2e9)
+    cost_model.save(tmp_path / "cost_model.json")
+
+    loaded = CostModel.load(tmp_path / "cost_model.json")
+    assert loaded == cost_model
+    assert loaded.runtime.k == pytest.approx(2.0)
+    assert loaded.memory_of([500])[0] == pytest.approx(2e9 + 500**2 * 10)
+
+
+def test_estimate_job():
+    assert estimate_makespan(np.array([5.0, 4.0, 3.0, 3.0, 3.0]), workers=2) == 10.0
+
+    cost_model = CostModel(
+        runtime=PowerLaw(1.0, 1.0),
+        memory=PowerLaw(1.0, 1.0),
+        load_time=2.0,
+        load_memory=100.0,
+    )
+    job = estimate_job(np.array([5, 4, 3, 3, 3]), cost_model, workers=2)
+    assert job == {
+        "sequences": 5,
+        "longest": 5,
+        "compute_time": 22.0,
+        "wall_time": 12.0,
+        "worker_memory": 105.0,
+        "total_memory": 209.0,
+    }
+
+
+def test_stratified_sample_covers_all_lengths():
+    sequences = pd.DataFrame(
+        {
+            "target_id": [f"T{i}" for i in range(100)],
+            "sequence": ["A" * (i + 1) for i in range(100)],
+        }
+    )
+    sample = stratified_sample(sequences, strata=4, per_stratum=2)
+
+    lengths = sample["sequence"].str.len()
+    assert len(sample) == 8
+    assert lengths.is_monotonic_increasing
+    assert np.histogram(lengths, bins=[0, 25, 50, 75, 100])[0].tolist() == [2] * 4
+
+
+def test_run_benchmark_leaves_the_current_process_unchanged(tmp_path, monkeypatch):
+    for variable in THREAD_VARIABLES:
+        monkeypatch.delenv(variable, raising=False)
+    fasta_files = []
+    for n in [10, 20, 40]:
+        fasta_file = tmp_path / f"T{n}.fasta"
+        fasta_file.write_text(f">T{n}\n{'ACGU' * n}\n")
+        fasta_files.append(fasta_file)
+
+    timings, cost_model = run_benchmark(
+        fasta_files, tmp_path / "outputs", SyntheticPredictor, threads=2
+    )
+
+    assert timings["target_id"].tolist() == ["T10", "T20", "T40"]
+    assert cost_model.load_time >= 0
+    assert (tmp_path / "outputs" / "T40" / "pair.npy").exists()
+    # The thread settings and the predictor stay in the worker process
+    assert not any(variable in os.environ for variable in THREAD_VARIABLES)
+    assert runner_module._predictor is None
+
+
+def test_benchmark_then_estimate(tmp_path):
+    sequences = pd.DataFrame(
+        {
+            "target_id": [f"T{i}" for i in range(6)],
+            "sequence": ["ACGU" * n for n in [10, 20, 40, 60, 80, 100]],
+        }
+    )
+    sequences.to_csv(tmp_path / "sequences.csv", index=False)
+    model = tmp_path / "cost_model.json"
+
+    result = runner.invoke(
+        app,
+        [
+            "benchmark",
+            str(tmp_path / "sequences.csv"),
+            "--output-dir",
+            str(tmp_path / "benchmark"),
+            "--model",
+            str(model),
+            "--predictor",
+            "synthetic",
+            "--strata",
+            "3",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    timings = pd.read_csv(tmp_path / "benchmark" / "timings.csv")
+    assert len(timings) == 6
+    assert (timings["cpu_time"] >= 0).all()
+    assert CostModel.load(model).runtime.k > 0
+
+    result = runner.invoke(
+        app, ["estimate", str(tmp_path / "sequences.csv"), "--model", str(model)]
+    )
+    assert result.exit_code == 0, result.output
+    assert "Wall time with 1 workers" in result.output
+
+    result = runner.invoke(
+        app,
+        [
+            "estimate",
+            str(tmp_path / "sequences.csv"),
+            "--model",
+            str(model),
+            "--time-limit",
+            "0",
+        ],
+    )
+    assert result.exit_code == 1
@@ -0,0 +1,124 @@
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rnafold.cache import TMScoreCache
+from rnafold.metrics import CachedBackend, Engine, NumpyBackend, score_targets
+from tests.helpers import make_frame, make_structure
+
+
+def make_target(target_id: str, seed: int) -> tuple[pd.DataFrame, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    native = make_structure(30, seed=seed)
+    predictions = [
+        native + rng.normal(scale=s, size=native.shape) for s in (1, 2, 3, 4, 5)
+    ]
+    return make_frame(target_id, [native, native[::-1]]), make_frame(
+        target_id, predictions
+    )
+
+
+def test_cache_roundtrip_and_stats(tmp_path):
+    cache = TMScoreCache(tmp_path / "cache.db")
+    cache.set_many({"a": 0.5, "b": 0.25})
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": 0.5, "b": 0.25}
+    assert (cache.stats.hits, cache.stats.misses) == (2, 1)
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = TMScoreCache(tmp_path / "cache.db", max_entries=2)
+    cache.set_many({"a": 0.1})
+    cache.set_many({"b": 0.2})
+    time.sleep(0.01)
+    cache.get_many(["a"])  # "b" is now the least recently used
+    cache.set_many({"c": 0.3})
+
+    assert len(cache) == 2
+    assert cache.get_many(["a", "b", "c"]) == {"a": 0.1, "c": 0.3}
+
+
+def test_cache_counts_entries(tmp_path):
+    path = tmp_path / "cache.db"
+    # A cache written before the entries were counted
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE scores "
+            "(key TEXT PRIMARY KEY, score REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        connection.execute("INSERT INTO scores VALUES ('a', 0.1, 0.0)")
+    connection.close()
+
+    cache = TMScoreCache(path, max_entries=3)
+    assert len(cache) == 1
+    cache.set_many({"a": 0.5, "b": 0.2})  # "a" is updated, not counted twice
+    assert len(cache) == 2
+    cache.set_many({"c": 0.3, "d": 0.4})
+    assert len(cache) == 3
+    # The eviction is counted too, and the count is shared with other connections
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM scores").fetchone() == (3,)
+    connection.close()
+    assert len(TMScoreCache(path)) == 3
+
+
+def test_cache_keys_ignore_sentinel_values():
+    native = make_structure(10)[None]
+    a, b = native.copy(), native.copy()
+    a[0, 3] = -1e18
+    b[0, 3] = np.nan
+
+    assert TMScoreCache.keys(a, native, "numpy") == TMScoreCache.keys(
+        b, native, "numpy"
+    )
+    assert TMScoreCache.keys(a, native, "numpy") != TMScoreCache.keys(
+        a, native, "usalign"
+    )
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_score_targets_with_cache(tmp_path, workers):
+    frames = [make_target(f"T{t}", seed=t) for t in range(4)]
+    solution = pd.concat([native for native, _ in frames])
+    submission = pd.concat([predicted for _, predicted in frames])
+    cache = TMScoreCache(tmp_path / "cache.db")
+
+    expected = score_targets(solution.copy(), submission.copy(), engine=Engine.NUMPY)
+    first = score_targets(
+        solution, submission, engine=Engine.NUMPY, workers=workers, cache=cache
+    )
+    assert first["cache_hits"].sum() == 0
+    assert first["cache_misses"].sum() == 4 * 5 * 2
+
+    # Change one prediction of one target: only its 2 pairs are recomputed
+    submission.loc[submission["target_id"] == "T1", "x_3"] += 1.0
+    second = score_targets(
+        solution, submission, engine=Engine.NUMPY, workers=workers, cache=cache
+    )
+    assert second["cache_misses"].sum() == 2
+    assert second["cache_hits"].sum() == 4 * 5 * 2 - 2
+
+    pd.testing.assert_series_equal(first["tm_score"], expected["tm_score"])
+    pd.testing.assert_frame_equal(
+        second.drop(columns=["cache_hits", "cache_misses", "tm_score_3"]),
+        first.drop(columns=["cache_hits", "cache_misses", "tm_score_3"]),
+        check_exact=False,
+    )
+
+
+def test_changed_fingerprint_misses_the_cache(tmp_path, monkeypatch):
+    native, predicted = make_target("T", seed=0)
+    cache = TMScoreCache(tmp_path / "cache.db")
+    backend = CachedBackend(NumpyBackend(), cache, Engine.NUMPY)
+
+    backend.tm_scores(native, predicted)
+    backend.tm_scores(native, predicted)
+    assert (cache.stats.hits, cache.stats.misses) == (10, 10)
+
+    # A new version of the algorithm does not reuse the scores of the previous one
+    monkeypatch.setattr("rnafold.metrics.ALGORITHM_VERSION", -1)
+    backend.tm_scores(native, predicted)
+    assert (cache.stats.hits, cache.stats.misses) == (10, 20)
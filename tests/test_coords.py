@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rnafold.coords import CoordinateStore, CoordinateStoreWriter
+from rnafold.dataset import load_labels, write_store
+from rnafold.metrics import Engine, score_targets, score_targets_streaming
+from tests.helpers import make_labels
+
+
+@pytest.fixture
+def labels() -> pd.DataFrame:
+    labels = make_labels(3, 10, seed=0)
+    labels.loc[2, ["x_4", "y_4", "z_4"]] = -1e18
+    labels.loc[5, "y_10"] = np.nan
+    return labels
+
+
+def test_store_roundtrip(tmp_path, labels):
+    store = CoordinateStore.from_frame(labels, tmp_path / "labels.coords")
+
+    assert store.target_ids == ["T0", "T1", "T2"]
+    assert store.n_conformers == 10
+    frame = store.to_frame()
+    pd.testing.assert_frame_equal(
+        frame[["ID", "resname", "resid"]],
+        labels[["ID", "resname", "resid"]],
+        check_dtype=False,
+    )
+    np.testing.assert_allclose(frame["x_1"], labels["x_1"], rtol=1e-6)
+    assert frame.loc[2, "x_4"] == frame.loc[5, "y_10"] == -1e18
+
+
+def test_store_target_is_a_memory_mapped_view(tmp_path, labels):
+    store = CoordinateStore.from_frame(labels, tmp_path / "labels.coords")
+
+    target = store["T1"]
+
+    assert target.coords.shape == (10, 21, 3)
+    assert target.coords.dtype == np.float32
+    assert np.shares_memory(target.coords, store.coords)
+    assert target.resolved.shape == (10, 21)
+    assert target.resolved.all()
+    assert not store["T0"].resolved[3, 2]
+    assert np.isnan(store["T0"].coords[3, 2]).all()
+
+
+def test_writer_extends_consecutive_rows(tmp_path):
+    with CoordinateStoreWriter(tmp_path / "store.coords", n_conformers=1) as writer:
+        for target_id in ["A", "A", "B"]:
+            writer.add(target_id, np.array(["G"]), np.array([1]), np.zeros((1, 1, 3)))
+
+    store = CoordinateStore(tmp_path / "store.coords")
+    assert store.target_ids == ["A", "B"]
+    assert store.offsets.tolist() == [0, 2, 3]
+
+
+def test_writer_rejects_non_contiguous_targets_and_removes_the_store(tmp_path):
+    with pytest.raises(ValueError, match="not contiguous"):
+        with CoordinateStoreWriter(tmp_path / "store.coords", n_conformers=1) as writer:
+            for target_id in ["A", "B", "A"]:
+                writer.add(
+                    target_id, np.array(["G"]), np.array([1]), np.zeros((1, 1, 3))
+                )
+
+    assert not (tmp_path / "store.coords").exists()
+
+
+def test_write_store_from_csv_chunks(tmp_path, labels):
+    labels.to_csv(tmp_path / "labels.csv", index=False)
+    write_store(tmp_path / "labels.csv", tmp_path / "labels.coords", chunksize=7)
+
+    table = load_labels(tmp_path / "labels.coords", targets=["T2"])
+    assert table["ID"].tolist() == labels["ID"].iloc[41:].tolist()
+
+
+def test_score_targets_from_stores(tmp_path, labels):
+    submission = make_labels(3, 5, seed=1)
+    CoordinateStore.from_frame(labels, tmp_path / "solution.coords")
+    CoordinateStore.from_frame(submission, tmp_path / "submission.coords")
+
+    expected = score_targets(labels, submission, engine=Engine.NUMPY)
+    results = score_targets_streaming(
+        tmp_path / "solution.coords",
+        tmp_path / "submission.coords",
+        engine=Engine.NUMPY,
+    )
+    pd.testing.assert_frame_equal(results, expected, atol=1e-4)
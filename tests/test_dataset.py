@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+from typer.testing import CliRunner
+
+from rnafold.dataset import app, load_labels, load_sequences, read_target_index
+
+runner = CliRunner()
+
+
+def test_convert_labels(labels, labels_parquet):
+    table = load_labels(labels_parquet)
+
+    assert (
+        table["target_id"].tolist()
+        == ["1ABC_A"] * 12 + ["1ABC_B"] * 7 + ["2XYZ_A"] * 15
+    )
+    assert table["resid"].dtype == np.int32
+    assert table["x_1"].dtype == np.float32
+    np.testing.assert_allclose(table["x_1"], labels["x_1"], rtol=1e-6)
+    assert read_target_index(labels_parquet) == {
+        "1ABC_A": (0, 12),
+        "1ABC_B": (12, 7),
+        "2XYZ_A": (19, 15),
+    }
+
+
+def test_load_labels_targets_and_columns(labels, labels_parquet):
+    table = load_labels(
+        labels_parquet, targets=["2XYZ_A", "1ABC_B"], columns=["ID", "z_1"]
+    )
+
+    expected = labels.iloc[12:]
+    assert table.columns.tolist() == ["ID", "z_1"]
+    assert table["ID"].tolist() == expected["ID"].tolist()
+    np.testing.assert_allclose(table["z_1"], expected["z_1"], rtol=1e-6)
+
+
+def test_load_labels_unknown_targets(labels_parquet):
+    table = load_labels(labels_parquet, targets=["3ABC_A"], columns=["ID", "z_1"])
+    assert table.empty
+    assert table.columns.tolist() == ["ID", "z_1"]
+
+
+def test_load_labels_csv_targets(tmp_path, labels):
+    labels.to_csv(tmp_path / "labels.csv", index=False)
+    table = load_labels(tmp_path / "labels.csv", targets=["1ABC_B"])
+    assert table["ID"].tolist() == labels["ID"].iloc[12:19].tolist()
+
+
+def test_load_labels_csv_targets_and_columns(tmp_path, labels):
+    labels.to_csv(tmp_path / "labels.csv", index=False)
+    table = load_labels(
+        tmp_path / "labels.csv", targets=["1ABC_B"], columns=["z_1", "resid"]
+    )
+
+    assert table.columns.tolist() == ["z_1", "resid"]
+    assert table["resid"].tolist() == list(range(1, 8))
+    np.testing.assert_allclose(table["z_1"], labels["z_1"].iloc[12:19])
+
+
+def test_load_sequences_parquet(tmp_path):
+    sequences = pd.DataFrame({"target_id": ["T1", "T2"], "sequence": ["GGAU", "ACCCU"]})
+    sequences.to_csv(tmp_path / "sequences.csv", index=False)
+    runner.invoke(
+        app, [str(tmp_path / "sequences.csv"), str(tmp_path / "sequences.parquet")]
+    )
+
+    loaded = load_sequences(tmp_path / "sequences.parquet", targets=["T2"])
+
+    assert loaded["sequence"].tolist() == ["ACCCU"]
+    assert loaded["sequence_length"].tolist() == [5]
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rnafold.rhofold.distogram import RhoFoldDistogram, summarize_array
+
+
+def make_distogram(length: int = 30, bins: int = 40, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    fields = {}
+    for atom in "npc":
+        logits = rng.standard_normal((bins, length, length)).astype(np.float32)
+        fields[f"dist_{atom}"] = np.exp(logits) / np.exp(logits).sum(axis=0)
+    fields["ss_prob_map"] = rng.random((length, length), dtype=np.float32)
+    fields["plddt"] = rng.random(length, dtype=np.float32)
+    return fields
+
+
+@pytest.mark.parametrize("save", [np.savez, np.savez_compressed])
+def test_distogram_loads_fields_lazily(tmp_path, save):
+    fields = make_distogram()
+    save(tmp_path / "results.npz", **fields)
+
+    distogram = RhoFoldDistogram(tmp_path / "results.npz")
+    assert set(distogram.files) == RhoFoldDistogram._EXPECTED_FIELDS
+    assert distogram._arrays == {}
+
+    np.testing.assert_array_equal(distogram.plddt, fields["plddt"])
+    assert list(distogram._arrays) == ["plddt"]
+    assert isinstance(distogram.plddt, np.memmap) == (save is np.savez)
+
+    for key, array in fields.items():
+        np.testing.assert_array_equal(getattr(distogram, key), array)
+    distogram.close()
+
+
+def test_distogram_summary_matches_numpy(tmp_path):
+    fields = make_distogram()
+    np.savez(tmp_path / "results.npz", **fields)
+
+    with RhoFoldDistogram(tmp_path / "results.npz") as distogram:
+        summary = distogram.summary
+
+    expected = pd.DataFrame(
+        {
+            key: {
+                "shape": array.shape,
+                "mean": np.mean(array, dtype=np.float64),
+                "std": np.std(array, dtype=np.float64),
+                "min": np.min(array),
+                "max": np.max(array),
+            }
+            for key, array in fields.items()
+        }
+    ).T
+    assert summary["shape"].tolist() == expected["shape"].tolist()
+    for column in ["mean", "std", "min", "max"]:
+        np.testing.assert_allclose(
+            summary[column].astype(float), expected[column].astype(float), rtol=1e-9
+        )
+
+
+def test_summarize_array_merges_chunks():
+    array = np.random.default_rng(1).standard_normal((100, 7)) * 3 + 5
+
+    summary = summarize_array(array, chunk_bytes=7 * 8 * 3)
+
+    assert summary["mean"] == pytest.approx(array.mean())
+    assert summary["std"] == pytest.approx(array.std())
+    assert summary["min"] == array.min()
+    assert summary["max"] == array.max()
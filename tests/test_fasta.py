@@ -0,0 +1,147 @@
+import gc
+import gzip
+import io
+
+import pandas as pd
+import pytest
+from Bio import SeqIO
+from typer.testing import CliRunner
+
+from rnafold.fasta import (
+    app,
+    format_record,
+    read_fasta,
+    read_fasta_batches,
+    write_fasta,
+    write_fasta_files,
+    write_fasta_shards,
+)
+from rnafold.rhofold.main import process_csv
+from tests.helpers import random_sequences
+
+FASTA = """\
+>URS0001 rRNA from Homo sapiens
+ACGU
+GGCA
+
+>URS0002
+acgunN
+>URS0003 empty
+>URS0004   spaced  header
+AC GU
+"""
+
+
+def test_read_fasta_matches_biopython(tmp_path):
+    (tmp_path / "seqs.fasta").write_text(FASTA)
+
+    records = list(read_fasta(tmp_path / "seqs.fasta"))
+
+    expected = [
+        (record.id, str(record.seq))
+        for record in SeqIO.parse(tmp_path / "seqs.fasta", "fasta")
+    ]
+    assert records == expected
+    assert records[0] == ("URS0001", "ACGUGGCA")
+
+
+def test_read_fasta_gzip_and_streams(tmp_path, monkeypatch):
+    compressed = gzip.compress(FASTA.encode())
+    # Gzip is detected from the content, not the name
+    (tmp_path / "seqs.fa").write_bytes(compressed)
+    expected = list(read_fasta(io.StringIO(FASTA)))
+
+    assert list(read_fasta(tmp_path / "seqs.fa")) == expected
+    assert list(read_fasta(io.BytesIO(compressed))) == expected
+
+    monkeypatch.setattr("sys.stdin", io.TextIOWrapper(io.BytesIO(compressed)))
+    assert list(read_fasta("-")) == expected
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_read_fasta_leaves_the_caller_stream_open(tmp_path, compress):
+    content = gzip.compress(FASTA.encode()) if compress else FASTA.encode()
+    expected = list(read_fasta(io.StringIO(FASTA)))
+    (tmp_path / "seqs.fa").write_bytes(content)
+
+    stream = io.BytesIO(content)
+    assert list(read_fasta(stream)) == expected
+    gc.collect()
+    assert not stream.closed
+    stream.seek(0)
+    assert stream.read() == content
+
+    with open(tmp_path / "seqs.fa", "rb") as file:
+        assert list(read_fasta(file)) == expected
+        gc.collect()
+        assert not file.closed
+        file.seek(0)
+        assert list(read_fasta(file)) == expected
+
+
+def test_read_fasta_batches():
+    batches = list(read_fasta_batches(io.StringIO(FASTA), batch_size=3))
+
+    assert [len(batch) for batch in batches] == [3, 1]
+
+
+def test_write_fasta_round_trip(tmp_path):
+    records = [(f"R{i}", sequence) for i, sequence in enumerate(random_sequences(50))]
+    records = [(record_id, sequence.upper()) for record_id, sequence in records]
+
+    assert write_fasta(iter(records), tmp_path / "seqs.fasta.gz", line_width=20) == 50
+
+    assert list(read_fasta(tmp_path / "seqs.fasta.gz")) == records
+    with gzip.open(tmp_path / "seqs.fasta.gz", "rt") as handle:
+        assert max(len(line.rstrip()) for line in handle) <= 20
+
+
+def test_write_fasta_shards(tmp_path):
+    records = [(f"R{i}", "ACGU" * i) for i in range(25)]
+
+    shards = write_fasta_shards(records, tmp_path / "shards", shard_size=10)
+
+    assert [shard.name for shard in shards] == [
+        "shard-00000.fasta",
+        "shard-00001.fasta",
+        "shard-00002.fasta",
+    ]
+    assert [record for shard in shards for record in read_fasta(shard)] == records
+
+
+def test_write_fasta_files(tmp_path):
+    count = write_fasta_files([("R1", "A" * 100), ("R2", "")], tmp_path)
+
+    assert count == 2
+    assert (tmp_path / "R1.fasta").read_text() == f">R1\n{'A' * 80}\n{'A' * 20}\n"
+    assert (tmp_path / "R2.fasta").read_text() == ">R2\n"
+
+
+def test_process_csv(tmp_path):
+    sequences = pd.DataFrame({"target_id": ["T1", "T2"], "sequence": ["ACGU", "GG"]})
+
+    process_csv(sequences, tmp_path / "fastas")
+
+    assert (tmp_path / "fastas" / "T2.fasta").read_text() == format_record("T2", "GG")
+
+
+def test_shard_command(tmp_path):
+    (tmp_path / "seqs.fasta").write_text(FASTA)
+
+    result = CliRunner().invoke(
+        app,
+        [
+            str(tmp_path / "seqs.fasta"),
+            str(tmp_path / "shards"),
+            "--shard-size",
+            "2",
+            "--compress",
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    shards = sorted((tmp_path / "shards").glob("*.fasta.gz"))
+    assert len(shards) == 2
+    assert [record for shard in shards for record in read_fasta(shard)] == list(
+        read_fasta(io.StringIO(FASTA))
+    )
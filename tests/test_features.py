@@ -0,0 +1,101 @@
+from collections import Counter
+
+import pandas as pd
+import pytest
+from Bio.Seq import Seq
+from Bio.SeqUtils import gc_fraction
+
+from rnafold.dataset import load_sequences
+from rnafold.features import (
+    FEATURES,
+    EncodedSequences,
+    compute_features,
+    kmer_counts,
+    register_feature,
+)
+from tests.helpers import random_sequences
+
+
+@pytest.fixture
+def sequences():
+    return random_sequences(300) + ["", "NNN", "S", "gcGC"]
+
+
+def test_gc_content_matches_biopython(sequences):
+    features = compute_features(sequences, ["GC_Content"])
+
+    expected = [gc_fraction(Seq(sequence)) for sequence in sequences]
+    assert features["GC_Content"].tolist() == expected
+
+
+def test_sequence_length(sequences):
+    features = compute_features(sequences, ["sequence_length"])
+
+    assert features["sequence_length"].tolist() == [len(s) for s in sequences]
+
+
+def test_non_ascii_characters():
+    features = compute_features(["ACGUé", "G"], ["sequence_length", "GC_Content"])
+
+    assert features["sequence_length"].tolist() == [5, 1]
+    assert features["GC_Content"].tolist() == [0.5, 1.0]
+
+
+def test_composition_and_ambiguous_count(sequences):
+    features = compute_features(sequences, ["composition", "ambiguous_count"])
+
+    for sequence, row in zip(sequences, features.itertuples()):
+        upper = sequence.upper()
+        length = max(len(sequence), 1)
+        assert row.A_Content == upper.count("A") / length
+        assert row.U_Content == upper.count("U") / length
+        assert row.ambiguous_count == sum(upper.count(c) for c in "RYSWKMBDHVN")
+
+
+@pytest.mark.parametrize("k", [1, 2, 3])
+def test_kmer_counts(sequences, k):
+    counts = kmer_counts(EncodedSequences.from_sequences(sequences), k)
+
+    for i, sequence in enumerate(sequences):
+        upper = sequence.upper()
+        expected = Counter(
+            upper[j : j + k]
+            for j in range(len(upper) - k + 1)
+            if set(upper[j : j + k]) <= set("ACGU")
+        )
+        assert {
+            name[len("kmer_") :]: int(column[i])
+            for name, column in counts.items()
+            if column[i]
+        } == dict(expected)
+
+
+def test_register_feature():
+    @register_feature("purine_count")
+    def purine_count(encoded):
+        return {"purine_count": encoded.count("AGag")}
+
+    try:
+        features = compute_features(["AGCU", "gg", ""], ["purine_count"])
+        assert features["purine_count"].tolist() == [2, 2, 0]
+    finally:
+        del FEATURES["purine_count"]
+
+    with pytest.raises(ValueError, match="Unknown feature"):
+        compute_features(["A"], ["purine_count"])
+
+
+def test_load_sequences_features(tmp_path, sequences):
+    table = pd.DataFrame(
+        {"target_id": [f"T{i}" for i in range(len(sequences))], "sequence": sequences}
+    )
+    table.to_csv(tmp_path / "sequences.csv", index=False)
+
+    loaded = load_sequences(tmp_path / "sequences.csv", targets=["T3", "T1"])
+
+    # Same values as the former per-row computation
+    rows = table.iloc[[1, 3]]
+    assert loaded["sequence_length"].tolist() == rows["sequence"].str.len().tolist()
+    assert loaded["GC_Content"].tolist() == [
+        gc_fraction(Seq(sequence)) for sequence in rows["sequence"]
+    ]
@@ -0,0 +1,136 @@
+import os
+import tarfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rnafold.dataset import read_table
+from rnafold.ingest import (
+    LABEL_COLUMNS,
+    ingest_structures,
+    list_sources,
+    load_manifest,
+    structure_id,
+)
+from rnafold.metrics import Engine, score_targets
+from rnafold.pdb import parse_pdb_to_df
+
+pytestmark = pytest.mark.filterwarnings(
+    "ignore::Bio.PDB.PDBExceptions.PDBConstructionWarning"
+)
+
+
+def test_structure_id():
+    assert structure_id("ab/1abc.cif.gz") == "1abc"
+    assert structure_id("pdb1abc.ent") == "pdb1abc"
+
+
+def test_ingest_structures_deduplicates_chains(structures, tmp_path):
+    destination = tmp_path / "labels.parquet"
+
+    stats = ingest_structures(structures, destination)
+
+    assert stats == {"sources": 3, "parsed": 3, "errors": 0, "chains": 6, "kept": 3}
+    labels = read_table(destination)
+    assert list(labels.columns) == LABEL_COLUMNS + ["target_id"]
+    assert labels["target_id"].unique().tolist() == ["3abc_A", "3abc_B", "1abc_B"]
+
+    # First model of each chain, as parsed by parse_pdb_to_df, residues numbered from 1
+    expected = parse_pdb_to_df(structures / "ab" / "1abc.pdb", "1abc_B")[1]
+    # Residues 11 and 11A of the chain would have the same ID
+    assert expected["ID"].duplicated().any()
+    expected["resid"] = np.arange(1, len(expected) + 1)
+    expected["ID"] = [f"1abc_B_{resid}" for resid in expected["resid"]]
+    assert labels["ID"].is_unique
+    chain = labels[labels["target_id"] == "1abc_B"].reset_index(drop=True)
+    pd.testing.assert_frame_equal(
+        chain[LABEL_COLUMNS], expected, check_dtype=False, check_exact=True
+    )
+
+    manifest = load_manifest(destination)
+    assert [chain["kept"] for chain in manifest["ab/1abc.pdb"]["chains"]] == [
+        False,
+        True,
+    ]
+
+
+def test_ingested_labels_can_be_evaluated(structures, tmp_path):
+    destination = tmp_path / "labels.parquet"
+    ingest_structures(structures, destination)
+    labels = read_table(destination, columns=LABEL_COLUMNS)
+    # The native structures as the 5 predictions
+    submission = labels[["ID", "resname", "resid"]].assign(
+        **{f"{axis}_{i}": labels[f"{axis}_1"] for i in range(1, 6) for axis in "xyz"}
+    )
+
+    results = score_targets(labels, submission, engine=Engine.NUMPY)
+
+    # Chains of a structure are distinct targets
+    assert sorted(results["target_id"]) == ["1abc_B", "3abc_A", "3abc_B"]
+    np.testing.assert_allclose(results["tm_score"], 1.0)
+
+
+def test_ingest_structures_only_parses_changed_files(structures, tmp_path):
+    destination = tmp_path / "labels.parquet"
+    ingest_structures(structures, destination)
+    expected = read_table(destination)
+
+    assert ingest_structures(structures, destination)["parsed"] == 0
+    pd.testing.assert_frame_equal(read_table(destination), expected)
+
+    # Same content, new modification time
+    os.utime(structures / "ab" / "2abc.pdb", ns=(0, 0))
+    assert ingest_structures(structures, destination)["parsed"] == 1
+    pd.testing.assert_frame_equal(
+        read_table(destination).sort_values("ID", ignore_index=True),
+        expected.sort_values("ID", ignore_index=True),
+    )
+
+
+def test_ingest_structures_keeps_duplicates_of_removed_files(structures, tmp_path):
+    destination = tmp_path / "labels.parquet"
+    ingest_structures(structures, destination)
+
+    (structures / "ab" / "1abc.pdb").unlink()
+    stats = ingest_structures(structures, destination)
+
+    # 2abc is parsed again, its chain B is now the only copy
+    assert stats["parsed"] == 1
+    assert sorted(read_table(destination)["target_id"].unique()) == [
+        "2abc_B",
+        "3abc_A",
+        "3abc_B",
+    ]
+    assert "ab/1abc.pdb" not in load_manifest(destination)
+
+
+def test_ingest_structures_reads_tarballs(structures, tmp_path):
+    archive = tmp_path / "structures.tar.gz"
+    with tarfile.open(archive, "w:gz") as tar:
+        for file in sorted(structures.rglob("*.*")):
+            tar.add(file, arcname=file.relative_to(structures).as_posix())
+
+    assert [source.key for source in list_sources(archive)] == [
+        "3abc.cif",
+        "ab/1abc.pdb",
+        "ab/2abc.pdb",
+    ]
+    ingest_structures(archive, tmp_path / "archive.parquet", workers=2)
+    ingest_structures(structures, tmp_path / "directory.parquet")
+    pd.testing.assert_frame_equal(
+        read_table(tmp_path / "archive.parquet"),
+        read_table(tmp_path / "directory.parquet"),
+    )
+
+
+def test_ingest_structures_records_errors(tmp_path):
+    root = tmp_path / "structures"
+    root.mkdir()
+    (root / "bad.cif").write_text("loop_\n_atom_site.group_PDB\nATOM\n")
+
+    stats = ingest_structures(root, tmp_path / "labels.parquet")
+
+    assert stats["errors"] == 1
+    assert load_manifest(tmp_path / "labels.parquet")["bad.cif"]["error"]
+    assert read_table(tmp_path / "labels.parquet").empty
@@ -1,33 +1,214 @@
+import json
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pandas as pd
+import typer
 from typer.testing import CliRunner
 
-from rnafold.main import app
+from rnafold import config
+from rnafold.main import COMMANDS, app
+from tests.helpers import make_labels
 
 runner = CliRunner()
 
+# Modules `rnafold --help` must not import
+HEAVY_MODULES = [
+    "numpy",
+    "pandas",
+    "pyarrow",
+    "Bio",
+    "matplotlib",
+    "seaborn",
+    "tqdm",
+    "torch",
+    "yaml",
+    "pydantic",
+    "rnafold.config",
+]
+# Import time of the rnafold modules of `rnafold --help`, in seconds, typer excluded. Far
+# above the actual time, to only catch a heavy import; tighter with, e.g.,
+# RNAFOLD_IMPORT_TIME_BUDGET=0.05 pytest
+IMPORT_TIME_BUDGET = float(os.environ.get("RNAFOLD_IMPORT_TIME_BUDGET", 2.0))
 
-def test_hello_command():
-    result = runner.invoke(app, ["hello", "Alice"])
-    assert result.exit_code == 0
-    assert "Hello Alice" in result.output
 
+def import_times(*args: str) -> dict[str, int]:
+    """Cumulative import time of each module, in microseconds, of a Python command."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # "import time: self [us] | cumulative | imported package" lines, after a header
+    lines = [line for line in process.stderr.splitlines() if "import time:" in line]
+    return {
+        name.strip(): int(cumulative)
+        for _, cumulative, name in (line.split("|") for line in lines[1:])
+    }
 
-def test_goodbye_command():
-    result = runner.invoke(app, ["goodbye", "Bob"])
-    assert result.exit_code == 0
-    assert "Bye Bob!" in result.output
 
+def test_help_lists_the_commands():
+    result = runner.invoke(app, ["--help"])
 
-def test_goodbye_command_formal():
-    result = runner.invoke(app, ["goodbye", "--formal", "Emily"])
     assert result.exit_code == 0
-    assert "Goodbye Ms. Emily. Have a good day." in result.output
+    for command in COMMANDS:
+        assert command in result.output
 
 
-def test_hello_command_missing_argument():
-    result = runner.invoke(app, ["hello"])
-    assert result.exit_code != 0
+def test_help_imports_no_heavy_module():
+    modules = import_times("-m", "rnafold.main", "--help")
+
+    assert not [
+        module
+        for module in modules
+        for heavy in HEAVY_MODULES
+        if module == heavy or module.startswith(f"{heavy}.")
+    ]
+
+
+def test_help_import_time():
+    # Typer, and the click and rich it imports, are loaded first and do not count
+    cumulative = import_times("-c", "import typer, rnafold.main")
+
+    total = cumulative["rnafold"] + cumulative["rnafold.main"]
+    assert total / 1e6 < IMPORT_TIME_BUDGET
+
 
+def test_unknown_command():
+    result = runner.invoke(app, ["hello", "Alice"])
 
-def test_goodbye_command_missing_argument():
-    result = runner.invoke(app, ["goodbye"])
     assert result.exit_code != 0
+    assert "No such command" in result.output
+
+
+def test_unknown_command_while_completing():
+    group = typer.main.get_command(app)
+    ctx = group.make_context("rnafold", ["hello"], resilient_parsing=True)
+
+    assert group.resolve_command(ctx, ["hello"]) == (None, None, [])
+
+
+def test_evaluate(tmp_path):
+    make_labels(3, 1, seed=0).to_csv(tmp_path / "solution.csv", index=False)
+    make_labels(3, 5, seed=1).to_csv(tmp_path / "submission.csv", index=False)
+
+    result = runner.invoke(
+        app,
+        [
+            "evaluate",
+            "--solution",
+            str(tmp_path / "solution.csv"),
+            "--submission",
+            str(tmp_path / "submission.csv"),
+            "--engine",
+            "numpy",
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Submission TM-score" in result.output
+
+
+def test_evaluate_profile(tmp_path):
+    make_labels(3, 1, seed=0).to_csv(tmp_path / "solution.csv", index=False)
+    make_labels(3, 5, seed=1).to_csv(tmp_path / "submission.csv", index=False)
+
+    result = runner.invoke(
+        app,
+        [
+            "evaluate",
+            "--solution",
+            str(tmp_path / "solution.csv"),
+            "--submission",
+            str(tmp_path / "submission.csv"),
+            "--engine",
+            "numpy",
+            "--profile",
+            str(tmp_path / "profile.json"),
+            "--profile-stats",
+            str(tmp_path / "evaluate.prof"),
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    profile = json.loads((tmp_path / "profile.json").read_text())
+    assert [target["target_id"] for target in profile["targets"]] == ["T0", "T1", "T2"]
+    assert {stage["stage"] for stage in profile["stages"]} == {
+        "dedupe",
+        "select",
+        "tm_score",
+    }
+    assert (tmp_path / "evaluate.prof").stat().st_size > 0
+
+
+def test_benchmark(tmp_path):
+    make_labels(3, 1, seed=0).to_csv(tmp_path / "solution.csv", index=False)
+    make_labels(3, 5, seed=1).to_csv(tmp_path / "submission.csv", index=False)
+
+    result = runner.invoke(
+        app,
+        [
+            "benchmark",
+            str(tmp_path / "solution.csv"),
+            str(tmp_path / "submission.csv"),
+            "--engine",
+            "numpy",
+            "--output",
+            str(tmp_path / "benchmark.csv"),
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert len(pd.read_csv(tmp_path / "benchmark.csv")) == 3
+
+
+def test_submit(tmp_path):
+    sequences = pd.DataFrame({"target_id": ["T1", "T2"], "sequence": ["ACGU", "GG"]})
+    sequences.to_csv(tmp_path / "sequences.csv", index=False)
+
+    result = runner.invoke(
+        app,
+        [
+            "submit",
+            "--sequences",
+            str(tmp_path / "sequences.csv"),
+            "--destination",
+            str(tmp_path / "submission.csv"),
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert len(pd.read_csv(tmp_path / "submission.csv")) == 6
+
+
+def test_report(tmp_path, mocker):
+    sequences = pd.DataFrame({"target_id": ["T1", "T2"], "sequence": ["ACGU", "GG"]})
+    sequences.to_csv(tmp_path / "sequences.csv", index=False)
+    files = SimpleNamespace(
+        **dict.fromkeys(["train", "val", "test"], tmp_path / "sequences.csv")
+    )
+    mocker.patch(
+        "rnafold.report.get_settings", return_value=SimpleNamespace(sequences=files)
+    )
+
+    result = runner.invoke(app, ["report"])
+
+    assert result.exit_code == 0, result.output
+    assert "# LEAKAGE" in result.output
+
+
+def test_ingest(tmp_path, structures):
+    result = runner.invoke(
+        app, ["ingest", str(structures), str(tmp_path / "labels.parquet")]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "3 of 6 chains kept" in result.output
+
+
+def test_settings_are_loaded_once():
+    assert config.get_settings() is config.get_settings()
+    assert config.Settings is config.get_settings()
@@ -0,0 +1,387 @@
+import shutil
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rnafold.cache import TMScoreCache
+from rnafold.config import get_settings
+from rnafold.metrics import (
+    CachedBackend,
+    DistinctNativesBackend,
+    Engine,
+    NumpyBackend,
+    USalignBackend,
+    benchmark_backends,
+    distinct_conformers,
+    get_backend,
+    get_structures,
+    iter_targets,
+    parse_usalign_table,
+    run_usalign,
+    score_targets,
+    score_targets_streaming,
+    select_structures,
+    summarize_target,
+    target_tm_scores_numpy,
+    target_tm_scores_usalign,
+    write2pdb,
+    write_structures,
+    write_target_line,
+)
+from rnafold.profiling import Profile
+from tests.helpers import make_frame, make_labels, make_structure
+
+
+def write2pdb_reference(df, xyz_id, target_path):
+    """Row by row implementation, as originally written."""
+    resolved_cnt = 0
+    with open(target_path, "w") as target_file:
+        for _, row in df.iterrows():
+            x, y, z = row[f"x_{xyz_id}"], row[f"y_{xyz_id}"], row[f"z_{xyz_id}"]
+            if x > -1e17 and y > -1e17 and z > -1e17:
+                resolved_cnt += 1
+                target_file.write(
+                    write_target_line(
+                        atom_name="C1'",
+                        atom_serial=int(row["resid"]),
+                        residue_name=row["resname"],
+                        chain_id="0",
+                        residue_num=int(row["resid"]),
+                        x_coord=x,
+                        y_coord=y,
+                        z_coord=z,
+                        atom_type="C",
+                    )
+                )
+    return resolved_cnt
+
+
+def test_write2pdb_is_byte_identical_to_write_target_line(tmp_path):
+    coords = make_structure(120) * 20
+    coords[3, 0] = -1e18
+    coords[8, 1] = np.nan
+    coords[11, 2] = -0.0001
+    df = make_frame("T1", [coords])
+    df["resname"] = list("AUGC" * 30)
+
+    expected_cnt = write2pdb_reference(df, 1, tmp_path / "expected.pdb")
+    resolved_cnt = write2pdb(df, 1, str(tmp_path / "actual.pdb"))
+
+    assert resolved_cnt == expected_cnt == 118
+    assert (tmp_path / "actual.pdb").read_bytes() == (
+        tmp_path / "expected.pdb"
+    ).read_bytes()
+
+
+def test_write_structures_writes_each_structure_once(tmp_path):
+    native = make_structure(20)
+    df = make_frame("T1", [native, np.full((20, 3), -1e18), native])
+
+    pdbs = write_structures(df, tmp_path, "native")
+
+    assert [(pdb.name, cnt) for pdb, cnt in pdbs] == [
+        ("native_1.pdb", 20),
+        ("native_2.pdb", 0),
+        ("native_3.pdb", 20),
+    ]
+    write2pdb(df, 3, str(tmp_path / "expected.pdb"))
+    assert pdbs[2][0].read_bytes() == (tmp_path / "expected.pdb").read_bytes()
+
+
+def test_get_structures():
+    a, b = make_structure(10, seed=1), make_structure(10, seed=2)
+    np.testing.assert_array_equal(get_structures(make_frame("T1", [a, b])), [a, b])
+
+
+def test_iter_targets_across_chunks(tmp_path):
+    labels = make_labels(4, 1)
+    labels.to_csv(tmp_path / "labels.csv", index=False)
+
+    targets = list(iter_targets(tmp_path / "labels.csv", chunksize=7))
+
+    assert [target_id for target_id, _ in targets] == ["T0", "T1", "T2", "T3"]
+    for target_id, rows in targets:
+        expected = labels[labels["ID"].str.startswith(f"{target_id}_")]
+        np.testing.assert_allclose(rows["x_1"], expected["x_1"])
+
+
+def test_iter_targets_rejects_non_contiguous_targets(tmp_path):
+    labels = make_labels(2, 1)
+    pd.concat([labels, labels.iloc[:1]]).to_csv(tmp_path / "labels.csv", index=False)
+
+    with pytest.raises(ValueError, match="not contiguous"):
+        list(iter_targets(tmp_path / "labels.csv", chunksize=5))
+
+
+def test_score_targets_streaming_matches_in_memory(tmp_path):
+    solution, submission = make_labels(5, 3, seed=0), make_labels(5, 5, seed=1)
+    solution.to_csv(tmp_path / "solution.csv", index=False)
+    # Submission targets in another order
+    submission.iloc[::-1].to_csv(tmp_path / "submission.csv", index=False)
+
+    expected = score_targets(solution, submission, engine=Engine.NUMPY)
+    results = score_targets_streaming(
+        tmp_path / "solution.csv",
+        tmp_path / "submission.csv",
+        engine=Engine.NUMPY,
+        chunksize=9,
+    )
+    pd.testing.assert_frame_equal(results, expected)
+
+
+def test_get_backend(tmp_path):
+    backend = get_backend(Engine.NUMPY)
+    assert isinstance(backend, DistinctNativesBackend)
+    assert isinstance(backend.backend, NumpyBackend)
+    cached = get_backend(Engine.NUMPY, TMScoreCache(tmp_path / "cache.db")).backend
+    assert isinstance(cached, CachedBackend)
+    assert isinstance(cached.backend, NumpyBackend)
+
+
+def test_cached_backend_computes_missing_pairs_only(tmp_path):
+    labels = make_labels(1, 3, seed=0)
+    native, predicted = labels[["ID", "resname", "resid", "x_1", "y_1", "z_1"]], labels
+    backend = CachedBackend(
+        NumpyBackend(), TMScoreCache(tmp_path / "cache.db"), "numpy"
+    )
+    pairs = np.array([[True], [False], [True]])
+
+    expected = NumpyBackend().tm_scores(native, predicted)
+    np.testing.assert_allclose(
+        backend.tm_scores(native, predicted, pairs), np.where(pairs, expected, np.nan)
+    )
+    np.testing.assert_allclose(backend.tm_scores(native, predicted), expected)
+    assert (backend.cache.stats.hits, backend.cache.stats.misses) == (2, 3)
+
+
+def test_score_targets_profile():
+    solution, submission = make_labels(3, 2, seed=0), make_labels(3, 5, seed=1)
+    profile = Profile()
+
+    results = score_targets(solution, submission, engine=Engine.NUMPY, profile=profile)
+
+    timings = profile.to_frame()
+    assert timings["target_id"].tolist() == results["target_id"].tolist()
+    assert (timings[["select", "tm_score"]] > 0).all(axis=None)
+    assert (timings["tm_score"] <= timings["total"]).all()
+    assert timings["tm_score_calls"].tolist() == [1, 1, 1]
+
+
+def test_benchmark_backends():
+    solution, submission = make_labels(3, 2, seed=0), make_labels(3, 5, seed=1)
+
+    results = benchmark_backends(solution, submission, engines=[Engine.NUMPY])
+
+    assert results["backend"].tolist() == [
+        "numpy",
+        "numpy+cache (cold)",
+        "numpy+cache (warm)",
+    ]
+    np.testing.assert_allclose(results["tm_score"], results["tm_score"].iloc[0])
+    # The warm cache has every score, nothing is computed
+    assert results.loc[1, "tm_score_seconds"] > 0
+    assert results.loc[2, "tm_score_seconds"] == 0
+    assert results.loc[2, "cache_lookup_seconds"] > 0
+    # The structures selected for the cache keys are not counted as scoring ones
+    assert results.loc[2, "cache_select_seconds"] > 0
+    assert results.loc[2, "select_seconds"] == 0
+
+
+def test_parse_usalign_table():
+    output = (
+        "#PDBchain1\tPDBchain2\tTM1\tTM2\tRMSD\tID1\tID2\tIDali\tL1\tL2\tLali\n"
+        "/tmp/x/predicted_1.pdb:A\t/tmp/x/native_2.pdb:A\t0.5\t0.25\t3.1\t1\t1\t1\t9\t9\t9\n"
+        "/tmp/x/predicted_2.pdb\t/tmp/x/native_1.pdb\t0.7\t0.75\t1.2\t1\t1\t1\t9\t9\t9\n"
+    )
+
+    assert parse_usalign_table(output) == {
+        ("predicted_1.pdb", "native_2.pdb"): 0.25,
+        ("predicted_2.pdb", "native_1.pdb"): 0.75,
+    }
+
+
+# Scores each pair of the -dir1/-dir2 lists (i, j) with (10 * i + j) / 1000, and logs its calls
+FAKE_USALIGN = """#!{python}
+import sys
+from pathlib import Path
+
+args = sys.argv[1:]
+folder1, list1 = args[args.index("-dir1") + 1 : args.index("-dir1") + 3]
+folder2, list2 = args[args.index("-dir2") + 1 : args.index("-dir2") + 3]
+with open("{calls}", "a") as calls:
+    calls.write(" ".join(args) + "\\n")
+print("#PDBchain1\\tPDBchain2\\tTM1\\tTM2")
+for first in Path(list1).read_text().split():
+    for second in Path(list2).read_text().split():
+        i, j = (int(name.split("_")[1].split(".")[0]) for name in (first, second))
+        print(f"{{folder1}}{{first}}:A\\t{{folder2}}{{second}}:A\\t0\\t{{(10 * i + j) / 1000}}")
+"""
+
+
+@pytest.fixture
+def fake_usalign(tmp_path, mocker):
+    usalign = tmp_path / "usalign"
+    usalign.write_text(
+        FAKE_USALIGN.format(python=sys.executable, calls=tmp_path / "calls.txt")
+    )
+    usalign.chmod(0o755)
+    mocker.patch(
+        "rnafold.metrics.get_settings",
+        return_value=SimpleNamespace(tools=SimpleNamespace(usalign=str(usalign))),
+    )
+    return tmp_path / "calls.txt"
+
+
+@pytest.mark.parametrize("threads", [1, 3])
+def test_target_tm_scores_usalign_scores_the_grid_in_list_mode(
+    tmp_path, fake_usalign, threads
+):
+    natives = [make_structure(20, seed=j) for j in range(4)]
+    natives[2][:] = np.nan
+    predictions = [make_structure(20, seed=10 + i) for i in range(3)]
+    predictions[1][:] = -1e18
+    pairs = np.ones((3, 4), dtype=bool)
+    pairs[0, 3] = False
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+
+    tm_scores = target_tm_scores_usalign(
+        make_frame("T", natives),
+        make_frame("T", predictions),
+        workdir,
+        pairs,
+        threads=threads,
+    )
+
+    i, j = np.indices((3, 4)) + 1
+    expected = (10 * i + j) / 1000
+    expected[1] = 0.0  # Unresolved prediction
+    expected[:, 2] = np.nan  # Unresolved native
+    expected[0, 3] = np.nan  # Pair not requested
+    np.testing.assert_array_equal(tm_scores, expected)
+    # A process per chunk of natives, the unresolved ones left out
+    calls = fake_usalign.read_text().splitlines()
+    assert len(calls) == threads
+    assert all(" C1'" in call and "-outfmt 2" in call for call in calls)
+
+
+def test_usalign_fingerprint_follows_the_binary(tmp_path, fake_usalign):
+    usalign = tmp_path / "usalign"
+    fingerprint = USalignBackend().fingerprint()
+    assert fingerprint == USalignBackend(threads=4).fingerprint()
+    assert fingerprint["flags"] == ["-atom", " C1'"]
+
+    # An upgraded binary does not reuse the scores of the previous one
+    usalign.write_text(usalign.read_text() + "# 2.0\n")
+    assert USalignBackend().fingerprint() != fingerprint
+
+
+@pytest.mark.skipif(
+    not shutil.which(get_settings().tools.usalign), reason="USalign is not installed"
+)
+def test_usalign_list_mode_matches_pair_runs(tmp_path):
+    natives = [make_structure(30, seed=j) for j in range(2)]
+    predictions = [
+        natives[i % 2] + np.random.default_rng(i).normal(scale=1 + i, size=(30, 3))
+        for i in range(3)
+    ]
+    native, predicted = make_frame("T", natives), make_frame("T", predictions)
+    workdir = tmp_path / "lists"
+    workdir.mkdir()
+
+    tm_scores = target_tm_scores_usalign(native, predicted, workdir, threads=2)
+
+    expected = np.zeros((3, 2))
+    for i, j in np.ndindex(expected.shape):
+        predicted_pdb, native_pdb = tmp_path / f"p{i}.pdb", tmp_path / f"n{j}.pdb"
+        write2pdb(predicted, i + 1, str(predicted_pdb))
+        write2pdb(native, j + 1, str(native_pdb))
+        expected[i, j] = run_usalign(str(predicted_pdb), str(native_pdb))
+    np.testing.assert_allclose(tm_scores, expected)
+
+
+def test_score_targets_pruning_matches_exhaustive(tmp_path):
+    solution, submission = make_labels(3, 6, seed=0), make_labels(3, 5, seed=1)
+    expected = score_targets(solution, submission, engine=Engine.NUMPY)
+
+    results = score_targets(
+        solution, submission, engine=Engine.NUMPY, prune_tolerance=0
+    )
+    cache = TMScoreCache(tmp_path / "cache.db")
+    cached = score_targets(
+        solution, submission, engine=Engine.NUMPY, cache=cache, prune_tolerance=0
+    )
+
+    pd.testing.assert_series_equal(results["tm_score"], expected["tm_score"])
+    pd.testing.assert_series_equal(cached["tm_score"], expected["tm_score"])
+    assert results["pruned"].sum() > 0
+    # Pruned pairs are not cached
+    assert len(cache) == 3 * 6 * 5 - cached["pruned"].sum()
+
+
+def test_pruning_needs_the_numpy_engine():
+    with pytest.raises(ValueError, match="numpy engine"):
+        get_backend(Engine.USALIGN, prune_tolerance=0.0)
+
+
+def test_distinct_conformers():
+    native = make_structure(20)
+    partial = native.copy()
+    partial[:5] = -1e18
+    conformers = np.stack(
+        [
+            np.full((20, 3), -1e18),
+            native,
+            partial,
+            native.copy(),
+            np.where(np.arange(20)[:, None] < 5, np.nan, native),
+            native + 0.05,
+        ]
+    )
+
+    # Unresolved residues are duplicates whatever their sentinel value
+    np.testing.assert_array_equal(distinct_conformers(conformers), [-1, 1, 2, 1, 2, 5])
+    np.testing.assert_array_equal(
+        distinct_conformers(conformers, tolerance=0.1), [-1, 1, 2, 1, 2, 1]
+    )
+
+
+def test_select_structures():
+    a, b, c = (make_structure(10, seed=seed) for seed in range(3))
+    df = make_frame("T1", [a, b, c])
+
+    selected = select_structures(df, [2, 0])
+
+    assert list(selected.columns) == ["ID", "resname", "resid"] + [
+        f"{axis}_{i}" for i in (1, 2) for axis in "xyz"
+    ]
+    np.testing.assert_array_equal(get_structures(selected), [c, a])
+
+
+def test_score_targets_scores_distinct_natives_once():
+    rng = np.random.default_rng(0)
+    frames = []
+    for t, n_distinct in enumerate([1, 3]):
+        native = make_structure(30, seed=t)
+        distinct = [native + rng.normal(size=native.shape) for _ in range(n_distinct)]
+        unresolved = np.full(native.shape, -1e18)
+        # Padded to 40 conformers with duplicates and unresolved ones
+        natives = (distinct * 13)[:20] + [unresolved] * 20
+        predictions = [native + rng.normal(scale=s, size=native.shape) for s in (1, 3)]
+        frames.append((make_frame(f"T{t}", natives), make_frame(f"T{t}", predictions)))
+    solution = pd.concat([native for native, _ in frames], ignore_index=True)
+    submission = pd.concat([predicted for _, predicted in frames], ignore_index=True)
+    profile = Profile()
+
+    results = score_targets(solution, submission, engine=Engine.NUMPY, profile=profile)
+
+    assert results["conformers"].tolist() == [1, 3]
+    assert profile.to_frame()["dedupe_calls"].tolist() == [1, 1]
+    for (native, predicted), (_, row) in zip(frames, results.iterrows()):
+        tm_scores = target_tm_scores_numpy(native, predicted)
+        assert row.drop("conformers").to_dict() == pytest.approx(
+            summarize_target(row["target_id"], tm_scores)
+        )
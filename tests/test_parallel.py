@@ -0,0 +1,25 @@
+import pytest
+
+from rnafold.parallel import imap_ordered
+
+
+def square(x: int) -> int:
+    return x * x
+
+
+def fail_on_three(x: int) -> int:
+    if x == 3:
+        raise ValueError("three")
+    return x
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_imap_ordered_keeps_input_order(workers):
+    assert list(imap_ordered(square, range(20), workers=workers)) == [
+        x * x for x in range(20)
+    ]
+
+
+def test_imap_ordered_propagates_worker_errors():
+    with pytest.raises(ValueError, match="three"):
+        list(imap_ordered(fail_on_three, range(10), workers=2))
@@ -0,0 +1,110 @@
+import gzip
+
+import pandas as pd
+import pytest
+from typer.testing import CliRunner
+
+from rnafold.pdb import (
+    _split_mmcif_row,
+    app,
+    parse_pdb_to_df,
+    parse_structure_to_df,
+    read_pdb,
+    scan_c1_atoms,
+)
+from tests.helpers import MMCIF_COLUMNS, write_mmcif, write_pdb
+
+pytestmark = pytest.mark.filterwarnings(
+    "ignore::Bio.PDB.PDBExceptions.PDBConstructionWarning"
+)
+
+
+def assert_frames_equal(frames, expected):
+    assert len(frames) == len(expected)
+    for frame, reference in zip(frames, expected):
+        pd.testing.assert_frame_equal(frame, reference)
+
+
+@pytest.mark.parametrize("models", [1, 2])
+def test_parse_pdb_to_df_matches_biopython(tmp_path, models):
+    pdb_file = write_pdb(tmp_path / "rna.pdb", models)
+
+    frames = parse_pdb_to_df(pdb_file, "T")
+
+    # Chains A and B of each model, the protein has no C1'
+    assert len(frames) == 2 * models
+    assert frames[0]["resname"].tolist() == list("GGACUUCA")
+    assert frames[1]["resid"].tolist() == [5, 6, 7, 8, 10, 11, 11, 12]
+    assert frames[1][["x_1", "y_1", "z_1"]].iloc[4].tolist() == [4, 5, 6]
+    assert frames[1][["x_1", "y_1", "z_1"]].iloc[5].tolist() == [7, 8, 9]
+    assert_frames_equal(frames, parse_structure_to_df(read_pdb("T", pdb_file), "T"))
+
+
+def test_parse_pdb_to_df_reads_mmcif(tmp_path):
+    cif_file = write_mmcif(tmp_path / "rna.cif")
+
+    frames = parse_pdb_to_df(cif_file, "T")
+
+    assert len(frames) == 4
+    # Author residue numbers
+    assert frames[0]["ID"].tolist()[:2] == ["T_11", "T_12"]
+    assert_frames_equal(frames, parse_structure_to_df(read_pdb("T", cif_file), "T"))
+
+
+def test_parse_pdb_to_df_reads_mmcif_without_optional_columns(tmp_path):
+    optional = {"group_PDB", "label_alt_id", "pdbx_PDB_ins_code", "auth_seq_id"}
+    columns = [column for column in MMCIF_COLUMNS if column not in optional]
+    cif_file = write_mmcif(tmp_path / "rna.cif", models=1, columns=columns)
+
+    frames = parse_pdb_to_df(cif_file, "T")
+
+    assert len(frames) == 2
+    # Label residue numbers, without auth_seq_id
+    assert frames[0]["ID"].tolist()[:2] == ["T_1", "T_2"]
+    # Without alternate location ids, the first C1' of a residue
+    assert frames[1]["resid"].tolist() == [5, 6, 7, 8, 10, 11]
+    assert frames[1][["x_1", "y_1", "z_1"]].iloc[4].tolist() == [1, 2, 3]
+
+
+def test_split_mmcif_row():
+    row = """ATOM 1 C "C1'" 'a b' "x 'y' z" '' O5'\n"""
+    assert _split_mmcif_row(row) == [
+        "ATOM",
+        "1",
+        "C",
+        "C1'",
+        "a b",
+        "x 'y' z",
+        "",
+        "O5'",
+    ]
+
+
+def test_parse_pdb_to_df_reads_gzip(tmp_path):
+    pdb_file = write_pdb(tmp_path / "rna.pdb")
+    gz_file = tmp_path / "rna.pdb.gz"
+    gz_file.write_bytes(gzip.compress(pdb_file.read_bytes()))
+
+    assert_frames_equal(parse_pdb_to_df(gz_file, "T"), parse_pdb_to_df(pdb_file, "T"))
+
+
+def test_scan_c1_atoms(tmp_path):
+    chains = scan_c1_atoms(write_pdb(tmp_path / "rna.pdb", models=2))
+
+    assert [(chain.model, chain.chain) for chain in chains] == [
+        (0, "A"),
+        (0, "B"),
+        (1, "A"),
+        (1, "B"),
+    ]
+    assert chains[0].sequence == "GGACUUCA"
+    assert chains[1].coords.shape == (8, 3)
+
+
+def test_benchmark(tmp_path):
+    pdb_file = write_pdb(tmp_path / "rna.pdb")
+
+    result = CliRunner().invoke(app, [str(pdb_file), "--repeat", "1"])
+
+    assert result.exit_code == 0, result.output
+    assert "equal: True" in result.output
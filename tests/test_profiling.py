@@ -0,0 +1,103 @@
+import json
+import pstats
+
+import pandas as pd
+import pytest
+
+from rnafold.profiling import (
+    Profile,
+    StageTimings,
+    profile_calls,
+    record_stages,
+    stage,
+)
+
+
+def test_stages_are_recorded_only_within_record_stages():
+    with stage("ignored"):
+        pass
+
+    with record_stages() as timings:
+        for _ in range(3):
+            with stage("outer"), stage("inner"):
+                pass
+    with stage("after"):
+        pass
+
+    assert timings.calls == {"inner": 3, "outer": 3}
+    assert timings.seconds["outer"] >= timings.seconds["inner"] > 0
+
+
+def test_nested_record_stages_restore_the_outer_recording():
+    with record_stages() as outer:
+        with record_stages() as inner:
+            with stage("a"):
+                pass
+        with stage("b"):
+            pass
+
+    assert list(inner.calls) == ["a"]
+    assert list(outer.calls) == ["b"]
+
+
+def make_profile() -> Profile:
+    profile = Profile()
+    profile.add(
+        "T1",
+        3.0,
+        StageTimings(
+            {"write_pdb": 1.0, "usalign": 1.5}, {"write_pdb": 2, "usalign": 4}
+        ),
+    )
+    profile.add("T2", 1.0, StageTimings({"usalign": 0.5}, {"usalign": 1}))
+    return profile
+
+
+def test_profile_frames():
+    profile = make_profile()
+
+    expected = pd.DataFrame(
+        {
+            "target_id": ["T1", "T2"],
+            "total": [3.0, 1.0],
+            "write_pdb": [1.0, 0.0],
+            "usalign": [1.5, 0.5],
+            "write_pdb_calls": [2, 0],
+            "usalign_calls": [4, 1],
+        }
+    )
+    pd.testing.assert_frame_equal(profile.to_frame(), expected)
+
+    summary = profile.summary()
+    assert summary["stage"].tolist() == ["usalign", "write_pdb"]
+    assert summary["calls"].tolist() == [5, 2]
+    assert summary["share"].tolist() == [0.5, 0.25]
+
+
+def test_profile_save(tmp_path):
+    profile = make_profile()
+
+    profile.save(tmp_path / "profile.csv")
+    profile.save(tmp_path / "profile.json")
+
+    pd.testing.assert_frame_equal(
+        pd.read_csv(tmp_path / "profile.csv"), profile.to_frame()
+    )
+    saved = json.loads((tmp_path / "profile.json").read_text())
+    assert [target["target_id"] for target in saved["targets"]] == ["T1", "T2"]
+    assert saved["stages"][0] == {
+        "stage": "usalign",
+        "seconds": 2.0,
+        "calls": 5,
+        "share": 0.5,
+    }
+    with pytest.raises(ValueError, match="Unknown profile format"):
+        profile.save(tmp_path / "profile.txt")
+
+
+def test_profile_calls(tmp_path):
+    with profile_calls(tmp_path / "stats.prof"):
+        make_profile().summary()
+
+    stats = pstats.Stats(str(tmp_path / "stats.prof"))
+    assert any(function == "summary" for _, _, function in stats.stats)
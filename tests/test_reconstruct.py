@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+from typer.testing import CliRunner
+
+from rnafold.rhofold.distogram import bin_edges
+from rnafold.rhofold.reconstruct import (
+    app,
+    classical_mds,
+    distance_weights,
+    reconstruct,
+    refine,
+    stress,
+)
+from rnafold.tmscore import tm_score
+from tests.helpers import make_structure
+
+runner = CliRunner()
+
+
+def pairwise_distances(coords: np.ndarray) -> np.ndarray:
+    return np.linalg.norm(coords[:, None] - coords[None], axis=-1)
+
+
+def make_distogram(coords: np.ndarray, bins: int = 38, sigma: float = 1.5):
+    """Gaussian distogram around the distances of a structure, with noise."""
+    edges = bin_edges(bins)
+    centers = (edges[:-1] + edges[1:]) / 2
+    noise = np.random.default_rng(0).normal(0, 1.5, (len(coords), len(coords)))
+    distances = pairwise_distances(coords) + (noise + noise.T) / 2
+    logits = -np.square(centers[:, None, None] - distances[None]) / (2 * sigma**2)
+    dist = np.exp(logits - logits.max(axis=0))
+    return (dist / dist.sum(axis=0)).astype(np.float32)
+
+
+def test_classical_mds_recovers_distances():
+    coords = make_structure(30)
+
+    embedded = classical_mds(pairwise_distances(coords))
+
+    np.testing.assert_allclose(
+        pairwise_distances(embedded), pairwise_distances(coords), atol=1e-6
+    )
+
+
+def test_refine_decreases_the_stress():
+    coords = make_structure(40)
+    dist = make_distogram(coords)
+    edges = bin_edges(len(dist))
+    centers = (edges[:-1] + edges[1:]) / 2
+    distances = np.tensordot(centers, dist, axes=1)
+    distances = (distances + distances.T) / 2
+    weights = distance_weights(dist, centers)
+    start = classical_mds(distances)
+
+    stresses = [
+        stress(refine(start, distances, weights, steps=steps), distances, weights)
+        for steps in [0, 10, 50]
+    ]
+
+    assert stresses[0] > stresses[1] > stresses[2]
+
+
+def test_reconstruct_diverse_candidates():
+    coords = make_structure(120)
+
+    candidates = reconstruct(make_distogram(coords))
+
+    assert candidates.shape == (5, 120, 3)
+    scores = [tm_score(candidate, coords) for candidate in candidates]
+    assert max(scores[:2]) > 0.9
+    # The mirror image, and candidates from sampled distances
+    np.testing.assert_allclose(candidates[1], candidates[0] * [1, 1, -1])
+    for i in range(2, 5):
+        assert not np.allclose(candidates[i], candidates[0])
+
+
+def test_reconstruct_submission(tmp_path):
+    coords = make_structure(20)
+    (tmp_path / "outputs" / "R1").mkdir(parents=True)
+    dist = make_distogram(coords)
+    np.savez(tmp_path / "outputs" / "R1" / "results.npz", dist_c=dist)
+    pd.DataFrame({"target_id": ["R1", "R2"], "sequence": ["A" * 20, "GC"]}).to_csv(
+        tmp_path / "sequences.csv", index=False
+    )
+
+    result = runner.invoke(
+        app,
+        [
+            str(tmp_path / "outputs"),
+            str(tmp_path / "sequences.csv"),
+            "--destination",
+            str(tmp_path / "submission.csv"),
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    submission = pd.read_csv(tmp_path / "submission.csv")
+    assert len(submission) == 22
+    r1 = submission.iloc[:20]
+    predictions = [r1[[f"x_{i}", f"y_{i}", f"z_{i}"]].to_numpy() for i in range(1, 6)]
+    np.testing.assert_allclose(predictions[0], reconstruct(dist)[0], atol=1e-3)
+    assert len({prediction.round(3).tobytes() for prediction in predictions}) == 5
+    assert (submission.iloc[20:, 3:] == 0).all().all()
@@ -0,0 +1,147 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from rnafold.rhofold import runner
+from rnafold.rhofold.main import predict_rna_structures, process_csv
+from rnafold.rhofold.runner import THREAD_VARIABLES, read_done_marker, run_batch
+from rnafold.rhofold.scheduler import next_task, plan_tasks, run_scheduled
+
+
+class StubPredictor:
+    """Stands in for RhoFold: writes the process id, and counts the model loads."""
+
+    loads = 0
+
+    def __init__(self, tag: str = "stub"):
+        StubPredictor.loads += 1
+        self.tag = tag
+
+    def __call__(self, fasta_file: Path, output_dir: Path) -> None:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        (output_dir / "unrelaxed_model.pdb").write_text(f"{self.tag} {os.getpid()}")
+
+
+@pytest.fixture
+def fasta_dir(tmp_path):
+    sequences = pd.DataFrame(
+        {"target_id": ["R1", "R2", "R3"], "sequence": ["ACGU", "G" * 100, "UUA"]}
+    )
+    process_csv(sequences, tmp_path / "fastas")
+    return tmp_path / "fastas"
+
+
+def test_run_batch_loads_the_model_once(fasta_dir, tmp_path):
+    StubPredictor.loads = 0
+    files = sorted(fasta_dir.glob("*.fasta"))
+
+    results = run_batch(
+        files, tmp_path / "outputs", predictor_factory=StubPredictor, tag="test"
+    )
+
+    assert StubPredictor.loads == 1
+    assert results.columns.tolist() == [
+        "target_id",
+        "execution_time",
+        "sequence_length",
+        "cpu_time",
+        "peak_rss",
+    ]
+    assert (results["peak_rss"] > 0).all()
+    assert results["target_id"].tolist() == ["R1", "R2", "R3"]
+    assert results["sequence_length"].tolist() == [4, 100, 3]
+    for target_id in ["R1", "R2", "R3"]:
+        output = tmp_path / "outputs" / target_id / "unrelaxed_model.pdb"
+        assert output.read_text().startswith("test ")
+
+
+def test_predict_without_a_loaded_predictor(fasta_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(runner, "_predictor", None)
+    with pytest.raises(RuntimeError, match="No predictor"):
+        runner._predict((fasta_dir / "R1.fasta", tmp_path / "outputs" / "R1"))
+
+
+def test_predict_rna_structures_with_workers(fasta_dir, tmp_path):
+    results = predict_rna_structures(
+        fasta_dir, tmp_path / "outputs", workers=2, predictor_factory=StubPredictor
+    )
+
+    assert sorted(results["target_id"]) == ["R1", "R2", "R3"]
+    pids = {
+        (tmp_path / "outputs" / target_id / "unrelaxed_model.pdb")
+        .read_text()
+        .split()[1]
+        for target_id in results["target_id"]
+    }
+    assert str(os.getpid()) not in pids
+    assert len(pids) <= 2
+
+
+class CountingPredictor(StubPredictor):
+    """Stub counting the predictions, in a file shared by the workers."""
+
+    def __call__(self, fasta_file: Path, output_dir: Path) -> None:
+        super().__call__(fasta_file, output_dir)
+        with open(output_dir.parent / "calls.txt", "a") as calls:
+            calls.write(f"{fasta_file.stem}\n")
+
+
+def read_calls(output_dir: Path) -> list[str]:
+    calls = output_dir / "calls.txt"
+    return calls.read_text().split() if calls.exists() else []
+
+
+def test_plan_tasks_longest_first(fasta_dir, tmp_path):
+    tasks = plan_tasks(fasta_dir.glob("*.fasta"), tmp_path / "outputs")
+
+    assert [task.fasta_file.stem for task in tasks] == ["R2", "R1", "R3"]
+    assert [task.output_dir for task in tasks] == [
+        tmp_path / "outputs" / target_id for target_id in ["R2", "R1", "R3"]
+    ]
+
+
+def test_next_task_respects_the_memory_limit(fasta_dir, tmp_path):
+    tasks = plan_tasks(
+        fasta_dir.glob("*.fasta"), tmp_path, memory=lambda lengths: lengths * 1.0
+    )
+
+    # R2 (100) runs alone: R1 (4) does not fit next to it, but it fits alone
+    assert next_task(tasks, 0, memory_limit=50).fasta_file.stem == "R2"
+    assert next_task(tasks, 100, memory_limit=50) is None
+    assert next_task(tasks, 45, memory_limit=50).fasta_file.stem == "R1"
+    assert next_task(tasks, 4, memory_limit=None).fasta_file.stem == "R3"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_scheduled_resumes_completed_sequences(fasta_dir, tmp_path, workers):
+    output_dir = tmp_path / "outputs"
+    run_scheduled(
+        [fasta_dir / "R1.fasta", fasta_dir / "R2.fasta"],
+        output_dir,
+        predictor_factory=CountingPredictor,
+    )
+    assert sorted(read_calls(output_dir)) == ["R1", "R2"]
+
+    # A crash before the marker: R3 outputs are incomplete, and predicted again
+    (output_dir / "R3").mkdir()
+    (output_dir / "R3" / "unrelaxed_model.pdb").write_text("partial")
+
+    environment = {variable: os.environ.get(variable) for variable in THREAD_VARIABLES}
+    results = run_scheduled(
+        fasta_dir.glob("*.fasta"),
+        output_dir,
+        workers=workers,
+        threads_per_worker=1,
+        predictor_factory=CountingPredictor,
+    )
+
+    # The thread settings of the workers do not leak into the calling process
+    assert {variable: os.environ.get(variable) for variable in THREAD_VARIABLES} == (
+        environment
+    )
+    assert sorted(read_calls(output_dir)) == ["R1", "R2", "R3"]
+    assert results["target_id"].tolist() == ["R1", "R2", "R3"]
+    assert results["sequence_length"].tolist() == [4, 100, 3]
+    assert read_done_marker(output_dir / "R3")["sequence_length"] == 3
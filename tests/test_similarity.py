@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rnafold import similarity
+from rnafold.report import _print_leakage
+from rnafold.similarity import (
+    SimilarityIndex,
+    find_templates,
+    max_identities,
+    minimizers,
+    sequence_identity,
+)
+
+
+def random_rna(length: int, rng: np.random.Generator) -> str:
+    return "".join(rng.choice(list("ACGU"), size=length))
+
+
+def mutate(sequence: str, rate: float, rng: np.random.Generator) -> str:
+    """Substitutes a fraction of the positions."""
+    letters = list(sequence)
+    for i in rng.choice(len(letters), size=int(rate * len(letters)), replace=False):
+        letters[i] = "ACGU"[("ACGU".index(letters[i]) + 1) % 4]
+    return "".join(letters)
+
+
+@pytest.fixture
+def train() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(30, 300, size=200)
+    return pd.DataFrame(
+        {
+            "target_id": [f"T{i}" for i in range(len(lengths))],
+            "sequence": [random_rna(length, rng) for length in lengths],
+        }
+    )
+
+
+@pytest.fixture
+def index(train) -> SimilarityIndex:
+    return SimilarityIndex.build(train["target_id"], train["sequence"])
+
+
+def test_minimizers():
+    rng = np.random.default_rng(1)
+    sequence = random_rna(100, rng)
+
+    assert set(minimizers(sequence[20:80])) <= set(minimizers(sequence))
+    np.testing.assert_array_equal(
+        minimizers(sequence.lower().replace("u", "t")), minimizers(sequence)
+    )
+    assert len(minimizers("ACGUACGU")) == 0
+    # K-mers with other characters are skipped
+    assert len(minimizers("ACGUACGUACNGUACGUACG")) == 0
+
+
+def test_sequence_identity():
+    assert sequence_identity("ACGUACGU", "ACGUACGU") == 1.0
+    # Free end gaps: a query included in the target is identical
+    assert sequence_identity("GUACG", "AAACGUACGUUU") == 1.0
+    assert sequence_identity("ACGUACGUAC", "ACGUUCGUAC") == 0.9
+    assert sequence_identity("", "ACGU") == 0.0
+
+
+def test_search_finds_similar_sequences(train, index):
+    rng = np.random.default_rng(2)
+    for i in [0, 50, 199]:
+        query = mutate(train["sequence"][i], 0.05, rng)
+
+        hits = index.search(query, top=3)
+
+        assert hits[0].target_id == f"T{i}"
+        assert hits[0].identity >= 0.95 - 1e-9
+        # The best hit is the best of all training sequences
+        best = max(sequence_identity(query, sequence) for sequence in train["sequence"])
+        assert hits[0].identity == best
+
+
+def test_search_without_hits(index):
+    assert index.search("ACGU") == []
+    hits = index.search(random_rna(100, np.random.default_rng(3)), top=5)
+    assert all(hit.identity < 0.8 for hit in hits)
+
+
+def test_save_and_load(tmp_path, train, index):
+    index.save(tmp_path / "index.npz")
+    loaded = SimilarityIndex.load(tmp_path / "index.npz")
+
+    assert len(loaded) == len(index)
+    assert loaded.sequence(7) == train["sequence"][7]
+    query = train["sequence"][7][10:]
+    assert loaded.search(query, top=2) == index.search(query, top=2)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_max_identities(train, index, workers):
+    rng = np.random.default_rng(4)
+    queries = pd.DataFrame(
+        {
+            "target_id": ["Q1", "Q2", "Q3"],
+            "sequence": [
+                train["sequence"][3],
+                mutate(train["sequence"][9], 0.1, rng),
+                "GG",
+            ],
+        }
+    )
+
+    identities = max_identities(index, queries, workers=workers)
+
+    assert identities["target_id"].tolist() == ["Q1", "Q2", "Q3"]
+    assert identities["nearest_target_id"].tolist()[:2] == ["T3", "T9"]
+    assert identities["identity"].tolist()[0] == 1.0
+    assert identities["identity"].tolist()[2] == 0.0
+    # The index is not kept alive by this process
+    assert similarity._index is None
+
+
+def test_print_leakage(train, index, capsys):
+    val = pd.DataFrame(
+        {"target_id": ["V1", "V2"], "sequence": [train["sequence"][5], "GG"]}
+    )
+
+    identities = _print_leakage(train, val, index)
+
+    assert identities["identity"].tolist() == [1.0, 0.0]
+    output = capsys.readouterr().out
+    assert "Val targets with identity >= 95% to train: 1" in output
+
+
+def test_find_templates(labels, labels_parquet):
+    sequences = labels.groupby(labels["ID"].str.rsplit("_", n=1).str[0], sort=False)[
+        "resname"
+    ].agg("".join)
+    # Long enough sequences for the minimizers
+    sequences = sequences.map(lambda sequence: sequence * 3)
+    index = SimilarityIndex.build(sequences.index, sequences, k=5, w=2)
+
+    templates = find_templates(index, sequences["2XYZ_A"], labels_parquet, top=1)
+
+    assert [template.target_id for template in templates] == ["2XYZ_A"]
+    assert templates[0].identity == 1.0
+    assert templates[0].labels["ID"].tolist() == [f"2XYZ_A_{i}" for i in range(1, 16)]
+    assert find_templates(index, "GG", labels_parquet) == []
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rnafold.coords import CoordinateStore
+from rnafold.submit import (
+    build_submission,
+    create_random_submission,
+    duplicate_xyz_columns,
+    write_submission,
+)
+
+
+def create_random_submission_reference(sequences: pd.DataFrame) -> pd.DataFrame:
+    """Row by row implementation, as originally written."""
+    data_submission = []
+    for _, row in sequences.iterrows():
+        for i, resname in enumerate(row["sequence"]):
+            data_submission.append(
+                {"ID": f"{row['target_id']}_{i+1}", "resname": resname, "resid": i + 1}
+            )
+    submission = pd.DataFrame.from_records(data_submission)
+    for i in range(1, 6):
+        submission[f"x_{i}"] = 0.0
+        submission[f"y_{i}"] = 0.0
+        submission[f"z_{i}"] = 0.0
+    return submission
+
+
+@pytest.fixture
+def sequences() -> pd.DataFrame:
+    return pd.DataFrame(
+        {"target_id": ["R1107", "R1108", "R1116"], "sequence": ["GGGA", "AC", "UUCGA"]}
+    )
+
+
+def test_create_random_submission_matches_reference(sequences):
+    expected = create_random_submission_reference(sequences)
+    pd.testing.assert_frame_equal(create_random_submission(sequences), expected)
+
+
+def test_build_submission_with_predictions(sequences):
+    prediction = np.arange(5 * 2 * 3, dtype=float).reshape(5, 2, 3)
+
+    submission = build_submission(sequences, {"R1108": prediction})
+
+    rows = submission[submission["ID"].str.startswith("R1108_")]
+    for i in range(5):
+        np.testing.assert_array_equal(
+            rows[[f"x_{i + 1}", f"y_{i + 1}", f"z_{i + 1}"]], prediction[i]
+        )
+    assert (submission.loc[~submission.index.isin(rows.index), "x_1":] == 0).all().all()
+
+
+def test_build_submission_with_duplicated_predictions(sequences):
+    single = build_submission(
+        sequences, {"R1107": np.ones((1, 4, 3))}, num_predictions=1
+    )
+    duplicated = build_submission(sequences, {"R1107": np.ones((5, 4, 3))})
+    pd.testing.assert_frame_equal(
+        duplicate_xyz_columns(single)[duplicated.columns], duplicated
+    )
+
+
+def test_write_submission_by_chunks(tmp_path, sequences):
+    predictions = {"R1116": np.random.default_rng(0).normal(size=(5, 5, 3))}
+
+    write_submission(sequences, tmp_path / "submission.csv", predictions, chunksize=2)
+
+    expected = build_submission(sequences, predictions)
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "submission.csv"), expected)
+
+
+def test_write_submission_to_store(tmp_path, sequences):
+    write_submission(sequences, tmp_path / "submission.coords", chunksize=2)
+
+    store = CoordinateStore(tmp_path / "submission.coords")
+    assert store.target_ids == ["R1107", "R1108", "R1116"]
+    assert store["R1116"].coords.shape == (5, 5, 3)
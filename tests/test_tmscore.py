@@ -0,0 +1,260 @@
+import shutil
+import subprocess
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rnafold.config import get_settings
+from rnafold.metrics import (
+    Engine,
+    parse_tmscore_output,
+    score,
+    score_targets,
+    write2pdb,
+)
+from rnafold.tmscore import (
+    d0_rna,
+    fragment_lengths,
+    fragment_starts,
+    tm_score,
+    tm_score_matrix,
+    tm_score_matrix_pruned,
+    tm_score_pairs,
+    tm_score_upper_bounds,
+)
+from tests.helpers import make_frame, make_structure
+
+
+def random_rotation(seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    q, r = np.linalg.qr(rng.normal(size=(3, 3)))
+    q *= np.sign(np.diag(r))
+    if np.linalg.det(q) < 0:
+        q[:, 0] *= -1
+    return q
+
+
+def test_d0_rna():
+    assert d0_rna(10) == 0.3
+    assert d0_rna(25) == 0.7
+    assert d0_rna(100) == pytest.approx(0.6 * np.sqrt(99.5) - 2.5)
+
+
+def test_fragment_lengths():
+    assert fragment_lengths(100) == [100, 50, 25, 12, 6, 4]
+    assert fragment_lengths(10) == [10, 5, 4]
+    assert fragment_lengths(2) == [2]
+
+
+def test_fragment_starts_include_last_position():
+    assert fragment_starts(10, 5, step=2) == [0, 2, 4, 5]
+    assert fragment_starts(4, 4) == [0]
+
+
+def test_tm_score_identical_structures():
+    native = make_structure(50)
+    assert tm_score(native, native) == pytest.approx(1.0)
+
+
+def test_tm_score_invariant_to_rigid_transform():
+    native = make_structure(60)
+    predicted = native + np.random.default_rng(1).normal(scale=1.5, size=native.shape)
+    moved = predicted @ random_rotation(2).T + np.array([10.0, -5.0, 3.0])
+    assert tm_score(moved, native) == pytest.approx(tm_score(predicted, native))
+
+
+def test_tm_score_unrelated_structures_is_low():
+    assert tm_score(make_structure(80, seed=1), make_structure(80, seed=2)) < 0.3
+
+
+def test_tm_score_ignores_unresolved_residues():
+    native = make_structure(40)
+    predicted = native.copy()
+    native[:10] = -1e18
+    predicted[30:] = np.nan
+    # 20 aligned residues out of 30 resolved native residues
+    assert tm_score(predicted, native) == pytest.approx(20 / 30)
+
+
+def test_score_numpy_engine():
+    native = make_structure(40)
+    solution = make_frame("T1", [native] * 40)
+    submission = make_frame("T1", [native] * 5)
+    assert score(solution, submission, "", engine=Engine.NUMPY) == pytest.approx(1.0)
+
+
+def test_tm_score_matrix_matches_pairwise_tm_score():
+    rng = np.random.default_rng(0)
+    natives = np.stack([make_structure(45, seed=seed) for seed in range(3)])
+    natives[1, :6] = -1e18
+    predicted = np.stack(
+        [natives[0] + rng.normal(scale=s, size=(45, 3)) for s in (0.5, 3.0)]
+    )
+    predicted[1, 10:14] = np.nan
+
+    expected = [[tm_score(p, n) for n in natives] for p in predicted]
+    np.testing.assert_allclose(tm_score_matrix(predicted, natives), expected, atol=1e-9)
+
+
+def test_tm_score_matrix_small_batches():
+    natives = np.stack([make_structure(30, seed=seed) for seed in range(2)])
+    np.testing.assert_allclose(
+        tm_score_matrix(natives, natives, batch_size=7),
+        tm_score_matrix(natives, natives),
+    )
+
+
+def make_conformers(length: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Natives, partly resolved, and predictions of increasing noise, one unrelated."""
+    rng = np.random.default_rng(seed)
+    native = make_structure(length, seed=seed)
+    natives = np.stack(
+        [
+            native + rng.normal(scale=s, size=native.shape)
+            for s in np.linspace(0.5, 6, 8)
+        ]
+    )
+    natives[3, : length // 3] = np.nan
+    predicted = np.stack(
+        [native + rng.normal(scale=s, size=native.shape) for s in (1, 3, 8)]
+        + [make_structure(length, seed=seed + 100)]
+    )
+    predicted[1, -length // 4 :] = -1e18
+    return predicted, natives
+
+
+def test_tm_score_pairs_matches_matrix():
+    predicted, natives = make_conformers(30)
+    expected = tm_score_matrix(predicted, natives)
+
+    scores = tm_score_pairs(
+        predicted, natives, np.array([3, 0, 1]), np.array([0, 7, 3])
+    )
+    np.testing.assert_allclose(scores, expected[[3, 0, 1], [0, 7, 3]])
+
+
+@pytest.mark.parametrize("length", [12, 40, 90])
+def test_tm_score_upper_bounds_are_valid(length):
+    predicted, natives = make_conformers(length, seed=length)
+    predicted[2] = predicted[2] @ random_rotation(length).T
+
+    bounds = tm_score_upper_bounds(predicted, natives)
+
+    assert np.all(bounds >= tm_score_matrix(predicted, natives))
+    assert np.all(bounds <= 1.0 + 1e-9)
+    # Unrelated structures are far from their bound of 1
+    assert bounds[3].max() < 0.6
+
+
+def test_tm_score_upper_bounds_of_identical_structures():
+    native = make_structure(50)[None]
+    np.testing.assert_allclose(tm_score_upper_bounds(native, native), [[1.0]])
+
+
+def test_tm_score_matrix_pruned_matches_exhaustive():
+    predicted, natives = make_conformers(80)
+    expected = tm_score_matrix(predicted, natives)
+
+    scores, pruned = tm_score_matrix_pruned(predicted, natives)
+
+    assert np.nanmax(scores) == expected.max()
+    assert pruned == np.isnan(scores).sum() > 0
+    computed = ~np.isnan(scores)
+    np.testing.assert_allclose(scores[computed], expected[computed])
+
+
+def test_tm_score_matrix_pruned_with_tolerance_and_pairs():
+    predicted, natives = make_conformers(80)
+    expected = tm_score_matrix(predicted, natives)
+    pairs = np.ones(expected.shape, dtype=bool)
+    pairs[0, 0] = False
+
+    scores, pruned = tm_score_matrix_pruned(predicted, natives, pairs, tolerance=0.1)
+
+    assert np.isnan(scores[0, 0])
+    assert np.nanmax(scores) >= expected[pairs].max() - 0.1
+    assert pruned >= tm_score_matrix_pruned(predicted, natives, pairs)[1]
+
+
+def test_tm_score_matrix_pruned_stops_at_a_perfect_score():
+    native = make_structure(40)
+    noise = np.random.default_rng(0).normal(size=(2, 40, 3))
+    natives = np.stack([native, native + noise[0], native + 2 * noise[1]])
+    predicted = np.stack([native, make_structure(40, seed=5)])
+
+    scores, pruned = tm_score_matrix_pruned(predicted, natives, batch_size=1)
+
+    assert scores[0, 0] == pytest.approx(1.0)
+    assert pruned == 5
+
+
+def test_score_targets_diagnostics():
+    native = make_structure(40)
+    unrelated = make_structure(40, seed=3)
+    solution = make_frame("T1", [unrelated, native] + [np.full((40, 3), -1e18)] * 38)
+    submission = make_frame(
+        "T1", [unrelated * 2, native, unrelated * 2, unrelated * 2, unrelated * 2]
+    )
+
+    results = score_targets(solution, submission, engine=Engine.NUMPY)
+
+    row = results.iloc[0]
+    assert row["target_id"] == "T1"
+    assert row["tm_score"] == pytest.approx(1.0)
+    assert (row["best_prediction"], row["best_native"]) == (2, 2)
+    assert row["tm_score_1"] < 1.0
+    assert row["tm_score_2"] == pytest.approx(1.0)
+
+
+def test_score_targets_workers_match_serial():
+    rng = np.random.default_rng(0)
+    solution, submission = [], []
+    for t in range(4):
+        native = make_structure(30, seed=t)
+        predictions = [
+            native + rng.normal(scale=s, size=native.shape) for s in (1, 2, 3, 4, 5)
+        ]
+        solution.append(make_frame(f"T{t}", [native, native[::-1]]))
+        submission.append(make_frame(f"T{t}", predictions))
+    solution, submission = pd.concat(solution), pd.concat(submission)
+
+    serial = score_targets(solution.copy(), submission.copy(), engine=Engine.NUMPY)
+    parallel = score_targets(solution, submission, engine=Engine.NUMPY, workers=2)
+    pd.testing.assert_frame_equal(serial, parallel)
+
+
+@pytest.mark.skipif(
+    not shutil.which(get_settings().tools.usalign), reason="USalign is not installed"
+)
+@pytest.mark.parametrize("seed", range(5))
+def test_tm_score_matches_usalign(tmp_path, seed):
+    native = make_structure(30 + 20 * seed, seed=seed)
+    noise = np.random.default_rng(seed + 100).normal(
+        scale=0.5 + seed, size=native.shape
+    )
+    predicted = (native + noise) @ random_rotation(seed).T
+
+    native_pdb, predicted_pdb = tmp_path / "native.pdb", tmp_path / "predicted.pdb"
+    write2pdb(make_frame("T", [native]), 1, str(native_pdb))
+    write2pdb(make_frame("T", [predicted]), 1, str(predicted_pdb))
+
+    # Residues are aligned by residue number, like the NumPy engine; the default
+    # sequence-independent alignment of USalign can only score higher
+    command = [get_settings().tools.usalign, str(predicted_pdb), str(native_pdb)]
+    output = subprocess.run(
+        [*command, "-atom", " C1'", "-TMscore", "1"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    expected = parse_tmscore_output(output)
+    # USalign reads coordinates rounded to 3 decimals
+    assert tm_score(predicted.round(3), native.round(3)) == pytest.approx(
+        expected, abs=1e-3
+    )
+
+
+def test_parse_tmscore_output():
+    output = "TM-score= 0.51234 (normalized by length of Structure_1)\nTM-score= 0.61234 (normalized by length of Structure_2)"
+    assert parse_tmscore_output(output) == 0.61234